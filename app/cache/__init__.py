@@ -1,24 +1,79 @@
 import os
 from functools import lru_cache
+from typing import Optional
 
 from app.config.logging import setup_logger
 
 from .base import Cache
 from .memory_cache import InMemoryCache
 from .redis_cache import RedisCache
+from .shared_memory_cache import SharedMemoryCache
+from .sqlite_cache import SqliteCache
+from .tiered_cache import TieredCache
 
 logger = setup_logger(__name__)
 
 
-@lru_cache()
-def get_cache() -> Cache:
-    """Factory function to get the appropriate cache implementation."""
+def _optional_float(value: Optional[str]) -> Optional[float]:
+    return float(value) if value else None
+
+
+def _optional_int(value: Optional[str]) -> Optional[int]:
+    return int(value) if value else None
+
+
+def _get_shared_cache() -> Optional[Cache]:
+    """Build the cache backend shared between workers, if one is configured."""
     redis_url = os.getenv("REDIS_URL")
     if redis_url:
         logger.info("Redis URL found. Will use Redis cache")
-        return RedisCache(redis_url)
-    # If REDIS_URL is not set fall back to default in-memory cache implementation
+        return RedisCache(
+            redis_url,
+            max_connections=int(os.getenv("REDIS_MAX_CONNECTIONS", "50")),
+            socket_timeout=float(os.getenv("REDIS_SOCKET_TIMEOUT", "0.5")),
+            socket_connect_timeout=float(os.getenv("REDIS_CONNECT_TIMEOUT", "0.5")),
+            default_ttl=_optional_float(os.getenv("CACHE_TTL")),
+        )
+    sqlite_path = os.getenv("CACHE_SQLITE_PATH")
+    if sqlite_path:
+        logger.info(f"SQLite cache path found. Will use persistent SQLite cache at {sqlite_path}")
+        return SqliteCache(
+            sqlite_path,
+            max_entries=int(os.getenv("CACHE_SQLITE_MAX_ENTRIES", "1000000")),
+            default_ttl=_optional_float(os.getenv("CACHE_TTL")),
+        )
+    shared_memory_path = os.getenv("CACHE_SHARED_MEMORY_PATH")
+    if shared_memory_path:
+        logger.info(f"Shared memory cache path found. Will share the cache between workers at {shared_memory_path}")
+        return SharedMemoryCache(
+            shared_memory_path,
+            max_entries=int(os.getenv("CACHE_SHARED_MEMORY_MAX_ENTRIES", "16384")),
+            slot_bytes=int(os.getenv("CACHE_SHARED_MEMORY_SLOT_BYTES", "4096")),
+            default_ttl=_optional_float(os.getenv("CACHE_TTL")),
+        )
+    return None
+
+
+@lru_cache()
+def get_cache() -> Cache:
+    """Factory function to get the appropriate cache implementation."""
+    shared_cache = _get_shared_cache()
+    if shared_cache is not None:
+        if os.getenv("CACHE_L1_ENABLED", "false").lower() == "true":
+            logger.info("L1 cache enabled. Will use in-memory cache in front of the shared cache")
+            return TieredCache(
+                shared_cache,
+                l1=InMemoryCache(maxsize=int(os.getenv("CACHE_L1_MAXSIZE", "1000")), name="l1"),
+                l1_ttl=float(os.getenv("CACHE_L1_TTL", "5")),
+            )
+        return shared_cache
+    # If no shared cache backend is configured fall back to default in-memory cache implementation
     logger.info(
-        "No Redis URL found. Will use in-memory cache instead. To use Redis instead setup REDIS_URL env variable"
+        "No Redis URL or SQLite cache path found. Will use in-memory cache instead. To use Redis instead setup REDIS_URL env variable"
+    )
+    return InMemoryCache(
+        maxsize=int(os.getenv("CACHE_MAXSIZE", "1000")),
+        default_ttl=_optional_float(os.getenv("CACHE_TTL")),
+        max_bytes=_optional_int(os.getenv("CACHE_MAX_BYTES")),
+        compress_threshold=_optional_int(os.getenv("CACHE_COMPRESS_THRESHOLD")),
     )
-    return InMemoryCache()
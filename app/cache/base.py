@@ -1,9 +1,14 @@
 import hashlib
+import time
 from abc import ABC, abstractmethod
-from typing import Optional
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 
 from app.model.enums import StyleEnum
 
+# Keys of state that must outlive cache pressure, such as rewrite jobs. Bounded
+# backends never evict them to make room for other entries, they only expire
+PINNED_PREFIXES = ("job:",)
+
 
 class Cache(ABC):
     """Abstract base class for cache implementations."""
@@ -23,6 +28,79 @@ class Cache(ABC):
         pass
 
     @abstractmethod
-    async def set(self, key: str, value: str) -> None:
-        """Set a value in the cache."""
+    async def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        """Set a value in the cache, optionally expiring after `ttl` seconds."""
         pass
+
+    async def get_many(self, keys: List[str]) -> List[Optional[str]]:
+        """Get several values from the cache, in the order of `keys`."""
+        return [await self.get(key) for key in keys]
+
+    async def set_many(self, items: Dict[str, str], ttl: Optional[float] = None) -> None:
+        """Set several values in the cache."""
+        for key, value in items.items():
+            await self.set(key, value, ttl=ttl)
+
+    async def get_entries(self, keys: List[str]) -> List[Tuple[Optional[str], bool]]:
+        """Get several values together with whether each is still fresh.
+
+        A value turns stale once its soft TTL has passed, and is fresh if it
+        was set without one. The default implementation keeps the soft expiry
+        time of a value in a separate `stale_at:` entry.
+        """
+        if not keys:
+            return []
+        values = await self.get_many(keys + [_stale_at_key(key) for key in keys])
+        now = time.time()
+        return [
+            (value, stale_at is None or now < float(stale_at))
+            for value, stale_at in zip(values[: len(keys)], values[len(keys) :])
+        ]
+
+    async def set_entry(
+        self, key: str, value: str, ttl: Optional[float] = None, soft_ttl: Optional[float] = None
+    ) -> None:
+        """Set a value that turns stale after `soft_ttl` seconds and expires after `ttl` seconds."""
+        await self.set(key, value, ttl=ttl)
+        if soft_ttl is not None:
+            await self.set(_stale_at_key(key), str(time.time() + soft_ttl), ttl=ttl)
+
+    async def add(self, key: str, value: str, ttl: Optional[float] = None) -> bool:
+        """Set a value only if the key is absent. Returns True if it was set."""
+        raise NotImplementedError(f"{type(self).__name__} does not support add")
+
+    async def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        """Atomically increment a counter, returning its new value.
+
+        The `ttl` is applied when the counter is created.
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support incr")
+
+    async def delete(self, key: str) -> None:
+        """Remove a value from the cache."""
+        raise NotImplementedError(f"{type(self).__name__} does not support delete")
+
+    @property
+    def capacity(self) -> Optional[int]:
+        """Maximum number of entries the cache holds, or None if unbounded or unknown."""
+        return None
+
+    async def scan(self) -> AsyncIterator[Tuple[str, str, int]]:
+        """Iterate over the cached (key, value, hits) entries, hottest first where known.
+
+        Backends that don't track hits report 0.
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support scan")
+        yield
+
+    async def close(self) -> None:
+        """Release any resources held by the cache."""
+        pass
+
+
+def is_pinned(key: str) -> bool:
+    return key.startswith(PINNED_PREFIXES)
+
+
+def _stale_at_key(key: str) -> str:
+    return f"stale_at:{key}"
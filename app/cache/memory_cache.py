@@ -1,20 +1,156 @@
-from typing import Optional
+import math
+import time
+import zlib
+from typing import AsyncIterator, List, Optional, Tuple, Union
 
-from cachetools import LRUCache
+from cachetools import TLRUCache
 
-from .base import Cache
+from app.metrics.prometheus_metrics import CACHE_BYTES, CACHE_ENTRIES
+
+from .base import Cache, is_pinned
+
+# Approximate per-entry cost of the key (a hex digest), the cache bookkeeping and the stored objects
+_ENTRY_OVERHEAD = 256
+
+
+def _time_to_use(key: str, entry: list, now: float) -> float:
+    """Expiry time of an entry stored as a [value, ttl, hits, stale_at] list."""
+    ttl = entry[1]
+    return now + ttl if ttl is not None else math.inf
+
+
+def _entry_size(entry: list) -> int:
+    """Weight of an entry in bytes, for the byte-bounded mode."""
+    value = entry[0]
+    value_size = len(value) if isinstance(value, bytes) else len(value.encode("utf-8"))
+    return value_size + _ENTRY_OVERHEAD
 
 
 class InMemoryCache(Cache):
-    """In-memory cache implementation using cachetools LRUCache."""
+    """In-memory cache implementation using cachetools TLRUCache.
+
+    By default the cache holds at most `maxsize` entries. If `max_bytes` is
+    set, entries are instead weighed by their encoded size and the least
+    recently used ones are evicted once the total exceeds `max_bytes`. If
+    `compress_threshold` is set, values of at least that many characters are
+    stored zlib-compressed, trading some CPU on hits for more entries within
+    the same memory. Pinned keys, such as rewrite jobs, are held apart and
+    only leave the cache when they expire; they are not part of `scan`.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 1000,
+        default_ttl: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+        compress_threshold: Optional[int] = None,
+        name: str = "memory",
+    ):
+        if max_bytes is not None:
+            self._cache = TLRUCache(maxsize=max_bytes, ttu=_time_to_use, getsizeof=_entry_size)
+        else:
+            self._cache = TLRUCache(maxsize=maxsize, ttu=_time_to_use)
+        self._pinned = TLRUCache(maxsize=math.inf, ttu=_time_to_use)
+        self.default_ttl = default_ttl
+        self.max_bytes = max_bytes
+        self.compress_threshold = compress_threshold
+        self.name = name
 
-    def __init__(self, maxsize: int = 1000):
-        self._cache = LRUCache(maxsize=maxsize)
+    @property
+    def capacity(self) -> Optional[int]:
+        """Maximum number of entries, unknown in the byte-bounded mode."""
+        return self._cache.maxsize if self.max_bytes is None else None
+
+    @property
+    def currsize(self) -> int:
+        """Current size of the cache, in entries or in bytes if byte-bounded."""
+        return self._cache.currsize
 
     async def get(self, key: str) -> Optional[str]:
         """Get a value from the in-memory cache."""
-        return self._cache.get(key)
+        entry = self._store(key).get(key)
+        if entry is None:
+            return None
+        entry[2] += 1
+        return self._decode(entry[0])
+
+    async def get_entries(self, keys: List[str]) -> List[Tuple[Optional[str], bool]]:
+        """Get several values from the in-memory cache with whether each is still fresh."""
+        now = time.monotonic()
+        results = []
+        for key in keys:
+            entry = self._store(key).get(key)
+            if entry is None:
+                results.append((None, True))
+                continue
+            entry[2] += 1
+            results.append((self._decode(entry[0]), entry[3] is None or now < entry[3]))
+        return results
 
-    async def set(self, key: str, value: str) -> None:
+    async def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
         """Set a value in the in-memory cache."""
-        self._cache[key] = value
+        await self.set_entry(key, value, ttl=ttl)
+
+    async def set_entry(
+        self, key: str, value: str, ttl: Optional[float] = None, soft_ttl: Optional[float] = None
+    ) -> None:
+        """Set a value in the in-memory cache that turns stale after `soft_ttl` seconds."""
+        stored = self._encode(value)
+        stale_at = time.monotonic() + soft_ttl if soft_ttl is not None else None
+        entry = [stored, ttl if ttl is not None else self.default_ttl, 0, stale_at]
+        store = self._store(key)
+        too_large = self.max_bytes is not None and _entry_size(entry) > self.max_bytes
+        if store is self._cache and too_large:
+            # Too large to ever fit, cachetools would raise
+            return
+        store[key] = entry
+        self._update_metrics()
+
+    async def add(self, key: str, value: str, ttl: Optional[float] = None) -> bool:
+        """Set a value in the in-memory cache only if the key is absent."""
+        if key in self._store(key):
+            return False
+        await self.set(key, value, ttl=ttl)
+        return True
+
+    async def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        """Increment a counter in the in-memory cache."""
+        store = self._store(key)
+        entry = store.get(key)
+        if entry is None:
+            store[key] = [str(amount), ttl if ttl is not None else self.default_ttl, 0, None]
+            return amount
+        value = int(self._decode(entry[0])) + amount
+        # Updating in place keeps the expiry of the counter
+        entry[0] = str(value)
+        return value
+
+    async def delete(self, key: str) -> None:
+        """Remove a value from the in-memory cache."""
+        self._store(key).pop(key, None)
+        self._update_metrics()
+
+    async def scan(self) -> AsyncIterator[Tuple[str, str, int]]:
+        """Iterate over the cached entries, most hit first."""
+        entries = sorted(self._cache.items(), key=lambda item: item[1][2], reverse=True)
+        for key, (stored, _, hits, _) in entries:
+            yield key, self._decode(stored), hits
+
+    def _store(self, key: str) -> TLRUCache:
+        return self._pinned if is_pinned(key) else self._cache
+
+    def _encode(self, value: str) -> Union[str, bytes]:
+        if self.compress_threshold is None or len(value) < self.compress_threshold:
+            return value
+        encoded = value.encode("utf-8")
+        compressed = zlib.compress(encoded)
+        # Short or random-looking values may not shrink
+        return compressed if len(compressed) < len(encoded) else value
+
+    def _decode(self, stored: Union[str, bytes]) -> str:
+        return zlib.decompress(stored).decode("utf-8") if isinstance(stored, bytes) else stored
+
+    def _update_metrics(self) -> None:
+        CACHE_ENTRIES.labels(cache=self.name).set(len(self._cache))
+        if self.max_bytes is not None:
+            CACHE_BYTES.labels(cache=self.name).set(self._cache.currsize)
@@ -1,18 +1,159 @@
-from typing import Optional
+import asyncio
+import time
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+
+import redis.asyncio as redis
+from redis.exceptions import RedisError
+
+from app.config.logging import setup_logger
+from app.metrics.prometheus_metrics import CACHE_ERRORS
 
 from .base import Cache
 
+logger = setup_logger(__name__)
+
+T = TypeVar("T")
+
 
 class RedisCache(Cache):
-    """Redis cache implementation."""
+    """Redis cache implementation on top of redis.asyncio.
+
+    Connections come from a bounded, blocking pool, so a burst of requests
+    waits for a free connection instead of opening new ones. Every operation
+    fails open: if Redis errors out or does not answer within
+    `operation_timeout`, the call behaves like a cache miss (or a no-op for
+    writes) and Redis is skipped for `failure_backoff` seconds so requests
+    do not keep paying the timeout while it is down.
+    """
 
-    def __init__(self, redis_url: str):
-        pass
+    def __init__(
+        self,
+        redis_url: str,
+        max_connections: int = 50,
+        socket_timeout: float = 0.5,
+        socket_connect_timeout: float = 0.5,
+        pool_timeout: float = 0.5,
+        operation_timeout: float = 1.0,
+        failure_backoff: float = 5.0,
+        default_ttl: Optional[float] = None,
+        client: Optional[redis.Redis] = None,
+    ):
+        if client is None:
+            pool = redis.BlockingConnectionPool.from_url(
+                redis_url,
+                max_connections=max_connections,
+                timeout=pool_timeout,
+                socket_timeout=socket_timeout,
+                socket_connect_timeout=socket_connect_timeout,
+                decode_responses=True,
+            )
+            client = redis.Redis(connection_pool=pool)
+        self._client = client
+        self.operation_timeout = operation_timeout
+        self.failure_backoff = failure_backoff
+        self.default_ttl = default_ttl
+        self._unavailable_until = 0.0
 
     async def get(self, key: str) -> Optional[str]:
         """Get a value from Redis cache."""
-        pass
+        return await self._call("get", lambda: self._client.get(key), None)
 
-    async def set(self, key: str, value: str) -> None:
+    async def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
         """Set a value in Redis cache."""
-        pass
+        await self._call(
+            "set", lambda: self._client.set(key, value, px=self._ttl_ms(ttl)), None
+        )
+
+    async def get_many(self, keys: List[str]) -> List[Optional[str]]:
+        """Get several values from Redis cache with a single MGET."""
+        if not keys:
+            return []
+        return await self._call(
+            "get_many", lambda: self._client.mget(keys), [None] * len(keys)
+        )
+
+    async def set_many(self, items: Dict[str, str], ttl: Optional[float] = None) -> None:
+        """Set several values in Redis cache in a single pipelined round trip."""
+        if not items:
+            return
+        ttl_ms = self._ttl_ms(ttl)
+
+        async def pipelined_set():
+            async with self._client.pipeline(transaction=False) as pipe:
+                for key, value in items.items():
+                    pipe.set(key, value, px=ttl_ms)
+                return await pipe.execute()
+
+        await self._call("set_many", pipelined_set, None)
+
+    async def add(self, key: str, value: str, ttl: Optional[float] = None) -> bool:
+        """Set a value in Redis cache only if the key is absent."""
+        result = await self._call(
+            "add",
+            lambda: self._client.set(key, value, nx=True, px=self._ttl_ms(ttl)),
+            None,
+        )
+        return bool(result)
+
+    async def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        """Increment a counter in Redis cache. Returns 0 if Redis is unavailable."""
+
+        async def incr_with_expiry():
+            value = await self._client.incrby(key, amount)
+            ttl_ms = self._ttl_ms(ttl)
+            if value == amount and ttl_ms is not None:
+                await self._client.pexpire(key, ttl_ms)
+            return value
+
+        return await self._call("incr", incr_with_expiry, 0)
+
+    async def delete(self, key: str) -> None:
+        """Remove a value from Redis cache."""
+        await self._call("delete", lambda: self._client.delete(key), None)
+
+    async def scan(self, batch_size: int = 500) -> AsyncIterator[Tuple[str, str, int]]:
+        """Iterate over the entries in Redis with SCAN, reading values in MGET batches.
+
+        Redis does not track hits per key, so they are reported as 0. Unlike the
+        other operations this does not fail open, as it is only used offline.
+        """
+        keys = []
+        async for key in self._client.scan_iter(count=batch_size):
+            keys.append(key)
+            if len(keys) >= batch_size:
+                async for entry in self._mget_entries(keys):
+                    yield entry
+                keys = []
+        async for entry in self._mget_entries(keys):
+            yield entry
+
+    async def _mget_entries(self, keys: List[str]) -> AsyncIterator[Tuple[str, str, int]]:
+        if not keys:
+            return
+        for key, value in zip(keys, await self._client.mget(keys)):
+            # Keys may have expired, or hold non-string types, since they were scanned
+            if isinstance(value, str):
+                yield key, value, 0
+
+    async def close(self) -> None:
+        """Close the client and disconnect the connection pool."""
+        await self._client.aclose()
+
+    def _ttl_ms(self, ttl: Optional[float]) -> Optional[int]:
+        ttl = ttl if ttl is not None else self.default_ttl
+        return int(ttl * 1000) if ttl is not None else None
+
+    async def _call(
+        self, operation: str, fn: Callable[[], Awaitable[T]], default: T
+    ) -> T:
+        """Run a Redis command, returning `default` if Redis is unavailable."""
+        if time.monotonic() < self._unavailable_until:
+            return default
+
+        try:
+            return await asyncio.wait_for(fn(), timeout=self.operation_timeout)
+        except (RedisError, OSError, asyncio.TimeoutError) as e:
+            logger.warning("Redis %s failed, treating as a cache miss: %r", operation, e)
+            CACHE_ERRORS.labels(backend="redis", operation=operation).inc()
+            self._unavailable_until = time.monotonic() + self.failure_backoff
+            return default
@@ -0,0 +1,297 @@
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import time
+import zlib
+from contextlib import contextmanager
+from typing import AsyncIterator, Iterator, List, Optional, Tuple
+
+from app.config.logging import setup_logger
+
+from .base import PINNED_PREFIXES, Cache
+
+logger = setup_logger(__name__)
+
+_MAGIC = b"RWSHMC01"
+# Magic, number of buckets, ways per bucket and data bytes per slot
+_HEADER = struct.Struct("<8sIII")
+_HEADER_SIZE = 64
+# Slot header: key hash, expires_at, stale_at, accessed_at (0.0 for none), hits,
+# value length, key length (0 for an empty slot) and flags. The key and then
+# the value follow in the slot's data bytes.
+_SLOT = struct.Struct("<QdddIIHB5x")
+_USAGE = struct.Struct("<dI")
+_USAGE_OFFSET = 24
+_KEY_LENGTH = struct.Struct("<H")
+_KEY_LENGTH_OFFSET = 40
+_COMPRESSED = 1
+_PINNED = 2
+_PINNED_PREFIXES = tuple(prefix.encode("utf-8") for prefix in PINNED_PREFIXES)
+
+
+class SharedMemoryCache(Cache):
+    """Cache shared by all worker processes of a host through a memory-mapped file.
+
+    The file (by default on /dev/shm, so it lives in memory) holds a fixed
+    hash table of `max_entries` slots, so its size is bounded and allocated
+    once. A key hashes to a bucket of `ways` slots and evicts the least
+    recently used slot of that bucket when full, an approximation of LRU.
+    Slots of pinned keys are only taken over once they expire, unless every
+    slot of the bucket is pinned.
+    Each slot holds up to `slot_bytes` of key and value; values that don't
+    fit are stored compressed, and skipped if they still don't fit.
+
+    Each bucket is guarded by its own fcntl byte-range lock, shared for reads
+    and exclusive for writes, so workers only contend on the same bucket and
+    a crashed worker never leaves a bucket locked. As the locks are
+    per-process, a cache must only be used from one thread. `add` and `incr`
+    are atomic across workers. Every worker must use the same sizes; a file
+    of another size is reset by the first worker opening it.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int = 16384,
+        slot_bytes: int = 4096,
+        ways: int = 8,
+        default_ttl: Optional[float] = None,
+    ):
+        self.path = path
+        self.ways = ways
+        self.buckets = max(-(-max_entries // ways), 1)
+        self.slot_bytes = slot_bytes
+        self.default_ttl = default_ttl
+        self._slot_size = _SLOT.size + slot_bytes
+        self._bucket_size = ways * self._slot_size
+
+        size = _HEADER_SIZE + self.buckets * self._bucket_size
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            # Byte 0 guards the creation of the table, byte 1 + n guards bucket n
+            with self._locked(0, fcntl.LOCK_EX):
+                header = _HEADER.pack(_MAGIC, self.buckets, ways, slot_bytes)
+                if os.fstat(self._fd).st_size != size or os.pread(self._fd, _HEADER.size, 0) != header:
+                    logger.info(f"Initializing shared memory cache at {path} ({size} bytes)")
+                    # Truncating first zeroes the file, which marks every slot empty
+                    os.ftruncate(self._fd, 0)
+                    os.ftruncate(self._fd, size)
+                    os.pwrite(self._fd, header, 0)
+                self._map = mmap.mmap(self._fd, size)
+        except BaseException:
+            os.close(self._fd)
+            raise
+
+    @property
+    def capacity(self) -> Optional[int]:
+        return self.buckets * self.ways
+
+    async def get(self, key: str) -> Optional[str]:
+        """Get a value from the shared memory cache."""
+        return (await self.get_entries([key]))[0][0]
+
+    async def get_many(self, keys: List[str]) -> List[Optional[str]]:
+        """Get several values from the shared memory cache."""
+        return [value for value, _ in await self.get_entries(keys)]
+
+    async def get_entries(self, keys: List[str]) -> List[Tuple[Optional[str], bool]]:
+        """Get several values from the shared memory cache with whether each is still fresh."""
+        now = time.time()
+        results = []
+        for key in keys:
+            encoded_key = key.encode("utf-8")
+            bucket, key_hash = self._locate(encoded_key)
+            with self._locked(1 + bucket, fcntl.LOCK_SH):
+                slot = self._find(bucket, key_hash, encoded_key, now)
+                if slot is None:
+                    results.append((None, True))
+                    continue
+                offset, fields = slot
+                # Racing readers may lose a hit, which only skews eviction slightly
+                _USAGE.pack_into(self._map, offset + _USAGE_OFFSET, now, fields[4] + 1)
+                value = self._read_value(offset, fields)
+            stale_at = fields[2]
+            results.append((value, not stale_at or now < stale_at))
+        return results
+
+    async def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        """Set a value in the shared memory cache."""
+        await self.set_entry(key, value, ttl=ttl)
+
+    async def set_entry(
+        self, key: str, value: str, ttl: Optional[float] = None, soft_ttl: Optional[float] = None
+    ) -> None:
+        """Set a value in the shared memory cache that turns stale after `soft_ttl` seconds."""
+        encoded_key = key.encode("utf-8")
+        encoded = self._encode(encoded_key, value)
+        if encoded is None:
+            logger.debug("Not caching a value too large for a %d byte slot", self.slot_bytes)
+            return
+        now = time.time()
+        stale_at = now + soft_ttl if soft_ttl is not None else 0.0
+        bucket, key_hash = self._locate(encoded_key)
+        with self._locked(1 + bucket, fcntl.LOCK_EX):
+            offset = self._victim(bucket, key_hash, encoded_key, now)
+            self._write(offset, key_hash, encoded_key, encoded, self._expires_at(ttl, now), stale_at, now)
+
+    async def add(self, key: str, value: str, ttl: Optional[float] = None) -> bool:
+        """Set a value only if the key is absent, atomically across workers."""
+        encoded_key = key.encode("utf-8")
+        encoded = self._encode(encoded_key, value)
+        if encoded is None:
+            raise ValueError(f"Value too large for a {self.slot_bytes} byte slot")
+        now = time.time()
+        bucket, key_hash = self._locate(encoded_key)
+        with self._locked(1 + bucket, fcntl.LOCK_EX):
+            if self._find(bucket, key_hash, encoded_key, now) is not None:
+                return False
+            offset = self._victim(bucket, key_hash, encoded_key, now)
+            self._write(offset, key_hash, encoded_key, encoded, self._expires_at(ttl, now), 0.0, now)
+            return True
+
+    async def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        """Increment a counter, atomically across workers."""
+        encoded_key = key.encode("utf-8")
+        now = time.time()
+        bucket, key_hash = self._locate(encoded_key)
+        with self._locked(1 + bucket, fcntl.LOCK_EX):
+            slot = self._find(bucket, key_hash, encoded_key, now)
+            if slot is None:
+                value, expires_at = amount, self._expires_at(ttl, now)
+                offset = self._victim(bucket, key_hash, encoded_key, now)
+            else:
+                offset, fields = slot
+                # Updating in place keeps the expiry of the counter
+                value, expires_at = int(self._read_value(offset, fields)) + amount, fields[1]
+            encoded = self._encode(encoded_key, str(value))
+            if encoded is None:
+                raise ValueError(f"Key too large for a {self.slot_bytes} byte slot")
+            self._write(offset, key_hash, encoded_key, encoded, expires_at, 0.0, now)
+        return value
+
+    async def delete(self, key: str) -> None:
+        """Remove a value from the shared memory cache."""
+        encoded_key = key.encode("utf-8")
+        bucket, key_hash = self._locate(encoded_key)
+        with self._locked(1 + bucket, fcntl.LOCK_EX):
+            slot = self._find(bucket, key_hash, encoded_key, time.time())
+            if slot is not None:
+                _KEY_LENGTH.pack_into(self._map, slot[0] + _KEY_LENGTH_OFFSET, 0)
+
+    async def scan(self) -> AsyncIterator[Tuple[str, str, int]]:
+        """Iterate over the cached entries, most hit first."""
+        now = time.time()
+        entries = []
+        for bucket in range(self.buckets):
+            with self._locked(1 + bucket, fcntl.LOCK_SH):
+                for offset in self._slots(bucket):
+                    fields = _SLOT.unpack_from(self._map, offset)
+                    if fields[6] and not self._expired(fields, now):
+                        key_start = offset + _SLOT.size
+                        key = self._map[key_start : key_start + fields[6]].decode("utf-8")
+                        entries.append((key, self._read_value(offset, fields), fields[4]))
+        entries.sort(key=lambda entry: entry[2], reverse=True)
+        for entry in entries:
+            yield entry
+
+    async def close(self) -> None:
+        """Unmap the shared memory cache. The entries stay for the other workers."""
+        self._map.close()
+        os.close(self._fd)
+
+    @contextmanager
+    def _locked(self, offset: int, operation: int) -> Iterator[None]:
+        fcntl.lockf(self._fd, operation, 1, offset)
+        try:
+            yield
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, offset)
+
+    def _locate(self, encoded_key: bytes) -> Tuple[int, int]:
+        """Bucket and hash of a key. Python's hash() differs between processes, so it can't be used."""
+        key_hash = int.from_bytes(hashlib.blake2b(encoded_key, digest_size=8).digest(), "little")
+        return key_hash % self.buckets, key_hash
+
+    def _slots(self, bucket: int) -> range:
+        start = _HEADER_SIZE + bucket * self._bucket_size
+        return range(start, start + self._bucket_size, self._slot_size)
+
+    def _find(
+        self, bucket: int, key_hash: int, encoded_key: bytes, now: float
+    ) -> Optional[Tuple[int, tuple]]:
+        """Offset and header of the live slot holding a key, if any."""
+        for offset in self._slots(bucket):
+            fields = _SLOT.unpack_from(self._map, offset)
+            if fields[0] != key_hash or fields[6] != len(encoded_key):
+                continue
+            key_start = offset + _SLOT.size
+            if self._map[key_start : key_start + len(encoded_key)] != encoded_key:
+                continue
+            return None if self._expired(fields, now) else (offset, fields)
+        return None
+
+    def _victim(self, bucket: int, key_hash: int, encoded_key: bytes, now: float) -> int:
+        """Slot to write a key to: its own, else a free or expired one, else the least recently used."""
+        victim, oldest = None, None
+        for offset in self._slots(bucket):
+            fields = _SLOT.unpack_from(self._map, offset)
+            if fields[0] == key_hash and fields[6] == len(encoded_key):
+                key_start = offset + _SLOT.size
+                if self._map[key_start : key_start + len(encoded_key)] == encoded_key:
+                    return offset
+            if not fields[6] or self._expired(fields, now):
+                if oldest is None or oldest[0] >= 0:
+                    victim, oldest = offset, (-1, 0.0)
+                continue
+            # Unpinned slots are evicted first, then by last use
+            rank = (int(bool(fields[7] & _PINNED)), fields[3])
+            if oldest is None or rank < oldest:
+                victim, oldest = offset, rank
+        return victim
+
+    def _write(
+        self,
+        offset: int,
+        key_hash: int,
+        encoded_key: bytes,
+        encoded: Tuple[bytes, int],
+        expires_at: float,
+        stale_at: float,
+        now: float,
+    ) -> None:
+        value, flags = encoded
+        if encoded_key.startswith(_PINNED_PREFIXES):
+            flags |= _PINNED
+        data_start = offset + _SLOT.size
+        self._map[data_start : data_start + len(encoded_key) + len(value)] = encoded_key + value
+        _SLOT.pack_into(
+            self._map, offset, key_hash, expires_at, stale_at, now, 0, len(value), len(encoded_key), flags
+        )
+
+    def _read_value(self, offset: int, fields: tuple) -> str:
+        value_start = offset + _SLOT.size + fields[6]
+        value = self._map[value_start : value_start + fields[5]]
+        if fields[7] & _COMPRESSED:
+            value = zlib.decompress(value)
+        return value.decode("utf-8")
+
+    def _encode(self, encoded_key: bytes, value: str) -> Optional[Tuple[bytes, int]]:
+        """The bytes and flags to store a value with, or None if it doesn't fit in a slot."""
+        room = self.slot_bytes - len(encoded_key)
+        encoded = value.encode("utf-8")
+        if len(encoded) <= room:
+            return encoded, 0
+        compressed = zlib.compress(encoded)
+        if len(compressed) <= room:
+            return compressed, _COMPRESSED
+        return None
+
+    def _expires_at(self, ttl: Optional[float], now: float) -> float:
+        ttl = ttl if ttl is not None else self.default_ttl
+        return now + ttl if ttl is not None else 0.0
+
+    @staticmethod
+    def _expired(fields: tuple, now: float) -> bool:
+        return bool(fields[1]) and fields[1] <= now
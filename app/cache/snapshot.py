@@ -0,0 +1,96 @@
+import asyncio
+import gzip
+import json
+import os
+import re
+import time
+from typing import IO, List, Optional
+
+from app.config.logging import setup_logger
+
+from .base import Cache
+
+logger = setup_logger(__name__)
+
+SNAPSHOT_VERSION = 1
+
+# Only rewrite entries are snapshotted, not locks, counters or other bookkeeping keys
+_ENTRY_KEY = re.compile(r"^[0-9a-f]{64}$")
+
+
+async def export_snapshot(cache: Cache, path: str) -> int:
+    """Write the entries of `cache` to a gzip-compressed JSONL snapshot file.
+
+    The first line is a header, followed by one `[key, value, hits]` line per
+    entry, in the order the cache yields them (hottest first where known).
+    Returns the number of exported entries.
+    """
+    count = 0
+    start = time.perf_counter()
+    # Write and rename, so readers never see a partial snapshot
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        f.write(json.dumps({"version": SNAPSHOT_VERSION, "created_at": time.time()}) + "\n")
+        lines = []
+        async for key, value, hits in cache.scan():
+            if not _ENTRY_KEY.match(key):
+                continue
+            lines.append(json.dumps([key, value, hits], ensure_ascii=False, separators=(",", ":")))
+            count += 1
+            if len(lines) >= 1000:
+                await asyncio.to_thread(_write_lines, f, lines)
+                lines = []
+        await asyncio.to_thread(_write_lines, f, lines)
+    os.replace(tmp_path, path)
+
+    logger.info(f"Exported {count} cache entries to {path} in {time.perf_counter() - start:.2f}s")
+    return count
+
+
+async def load_snapshot(
+    cache: Cache, path: str, limit: Optional[int] = None, batch_size: int = 1000
+) -> int:
+    """Load the entries of a snapshot file into `cache`, so the hottest are the most recently used.
+
+    Loading reads at most `limit` entries, which defaults to the capacity of
+    the cache. They are then written with `set_many` in batches, coldest
+    first. A cache that evicts during the load, because it is bounded by
+    bytes or its capacity is unknown, so evicts the coldest entries rather
+    than the hottest. Returns the number of loaded entries.
+    """
+    limit = limit if limit is not None else cache.capacity
+    count = 0
+    start = time.perf_counter()
+    batches = []
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        header = json.loads(await asyncio.to_thread(f.readline))
+        if header.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version: {header.get('version')}")
+
+        while limit is None or count < limit:
+            size = batch_size if limit is None else min(batch_size, limit - count)
+            lines = await asyncio.to_thread(_read_lines, f, size)
+            if not lines:
+                break
+            batches.append([json.loads(line)[:2] for line in lines])
+            count += len(lines)
+
+    for entries in reversed(batches):
+        await cache.set_many(dict(reversed(entries)))
+
+    logger.info(f"Loaded {count} cache entries from {path} in {time.perf_counter() - start:.2f}s")
+    return count
+
+
+def _write_lines(f: IO[str], lines: List[str]) -> None:
+    f.writelines(line + "\n" for line in lines)
+
+
+def _read_lines(f: IO[str], count: int) -> List[str]:
+    lines = []
+    for line in f:
+        if line.strip():
+            lines.append(line)
+        if len(lines) >= count:
+            break
+    return lines
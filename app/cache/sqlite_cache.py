@@ -0,0 +1,299 @@
+import asyncio
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Dict, List, Optional, Set, Tuple, TypeVar
+
+from app.config.logging import setup_logger
+
+from .base import PINNED_PREFIXES, Cache
+
+logger = setup_logger(__name__)
+
+T = TypeVar("T")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    expires_at REAL,
+    accessed_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at);
+"""
+
+
+class SqliteCache(Cache):
+    """Persistent cache backed by a local SQLite database in WAL mode.
+
+    The cache survives restarts, so a redeployed service starts warm. SQLite
+    calls never run on the event loop: reads go to a small thread pool with
+    one connection per thread, and all writes go through a single writer
+    thread. Plain `set` calls are buffered and written in batches every
+    `flush_interval` seconds (write-behind), while reads check the buffer,
+    and the batch being written, first so they always see their own writes.
+
+    The table is bounded to `max_entries`, evicting the least recently read
+    entries other than pinned keys, which only expire. Last-read times are also recorded in batches, so eviction is an
+    approximation of LRU. Opening the database does not scan it, so startup
+    time does not depend on the number of stored entries.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int = 1_000_000,
+        default_ttl: Optional[float] = None,
+        flush_interval: float = 0.5,
+        flush_batch_size: int = 1000,
+        read_threads: int = 4,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.flush_interval = flush_interval
+        self.flush_batch_size = flush_batch_size
+
+        self._reader = ThreadPoolExecutor(read_threads, thread_name_prefix="sqlite-cache-read")
+        self._writer = ThreadPoolExecutor(1, thread_name_prefix="sqlite-cache-write")
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+
+        # Pending writes as key -> (value, expires_at), and keys read since the last flush
+        self._pending: Dict[str, Tuple[str, Optional[float]]] = {}
+        # Writes taken out of the buffer by a flush, until their transaction commits
+        self._flushing: Dict[str, Tuple[str, Optional[float]]] = {}
+        self._accessed: Set[str] = set()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+        self._writes_since_trim = 0
+
+        # Create the schema eagerly so a misconfigured path fails at startup
+        self._writer.submit(self._connection).result()
+
+    async def get(self, key: str) -> Optional[str]:
+        """Get a value from the SQLite cache."""
+        return (await self.get_many([key]))[0]
+
+    async def get_many(self, keys: List[str]) -> List[Optional[str]]:
+        """Get several values from the SQLite cache with a single query."""
+        now = time.time()
+        values: Dict[str, str] = {}
+        missing = []
+        for key in keys:
+            pending = self._pending.get(key) or self._flushing.get(key)
+            if pending is not None and (pending[1] is None or pending[1] > now):
+                values[key] = pending[0]
+            else:
+                missing.append(key)
+
+        if missing:
+            values.update(await self._run(self._reader, self._select, missing, now))
+
+        self._accessed.update(values)
+        self._schedule_flush()
+        return [values.get(key) for key in keys]
+
+    async def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        """Buffer a value to be written to the SQLite cache."""
+        await self.set_many({key: value}, ttl=ttl)
+
+    async def set_many(self, items: Dict[str, str], ttl: Optional[float] = None) -> None:
+        """Buffer several values to be written to the SQLite cache in one transaction."""
+        expires_at = self._expires_at(ttl)
+        for key, value in items.items():
+            self._pending[key] = (value, expires_at)
+
+        if len(self._pending) >= self.flush_batch_size:
+            await self.flush()
+        else:
+            self._schedule_flush()
+
+    async def add(self, key: str, value: str, ttl: Optional[float] = None) -> bool:
+        """Set a value only if the key is absent, atomically across processes."""
+        await self.flush()
+        return await self._run(self._writer, self._insert_if_absent, key, value, self._expires_at(ttl))
+
+    async def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        """Increment a counter, atomically across processes."""
+        await self.flush()
+        return await self._run(self._writer, self._increment, key, amount, self._expires_at(ttl))
+
+    async def delete(self, key: str) -> None:
+        """Remove a value from the SQLite cache."""
+        self._pending.pop(key, None)
+        self._flushing.pop(key, None)
+        await self._run(self._writer, self._delete, key)
+
+    @property
+    def capacity(self) -> Optional[int]:
+        return self.max_entries
+
+    async def scan(self, batch_size: int = 1000) -> AsyncIterator[Tuple[str, str, int]]:
+        """Iterate over the entries, most recently read first.
+
+        Hits are not tracked, so they are reported as 0 and recency stands in
+        for hotness.
+        """
+        await self.flush()
+        after = None
+        while True:
+            rows = await self._run(self._reader, self._select_page, after, batch_size, time.time())
+            for key, value, _ in rows:
+                yield key, value, 0
+            if len(rows) < batch_size:
+                return
+            after = (rows[-1][2], rows[-1][0])
+
+    async def flush(self) -> None:
+        """Write the buffered values and access times to the database."""
+        async with self._flush_lock:
+            if not self._pending and not self._accessed:
+                return
+            pending, self._pending = self._pending, {}
+            accessed, self._accessed = self._accessed, set()
+            self._flushing = pending
+            try:
+                await self._run(self._writer, self._write, pending, accessed)
+            finally:
+                self._flushing = {}
+
+    async def close(self) -> None:
+        """Flush the pending writes and close the database."""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+        await self.flush()
+        self._reader.shutdown()
+        self._writer.shutdown()
+        with self._connections_lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
+
+    def _expires_at(self, ttl: Optional[float]) -> Optional[float]:
+        ttl = ttl if ttl is not None else self.default_ttl
+        return time.time() + ttl if ttl is not None else None
+
+    def _schedule_flush(self) -> None:
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.flush_interval)
+        try:
+            await self.flush()
+        except sqlite3.Error:
+            logger.error("Failed to flush SQLite cache writes", exc_info=True)
+
+    async def _run(self, executor: ThreadPoolExecutor, fn: Callable[..., T], *args) -> T:
+        return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+
+    # The methods below run on the executor threads
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            # Each connection is only used by its own thread, but closed from the caller's
+            connection = sqlite3.connect(
+                self.path, isolation_level=None, timeout=5.0, check_same_thread=False
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(_SCHEMA)
+            self._local.connection = connection
+            with self._connections_lock:
+                self._connections.append(connection)
+        return connection
+
+    def _select(self, keys: List[str], now: float) -> Dict[str, str]:
+        placeholders = ",".join("?" * len(keys))
+        rows = self._connection().execute(
+            f"SELECT key, value FROM entries WHERE key IN ({placeholders}) "
+            "AND (expires_at IS NULL OR expires_at > ?)",
+            (*keys, now),
+        )
+        return dict(rows.fetchall())
+
+    def _select_page(
+        self, after: Optional[Tuple[float, str]], limit: int, now: float
+    ) -> List[Tuple[str, str, float]]:
+        # Keyset pagination, so each page costs the same however deep the scan is
+        condition, params = "", ()
+        if after is not None:
+            condition, params = "AND (accessed_at, key) < (?, ?)", after
+        return self._connection().execute(
+            "SELECT key, value, accessed_at FROM entries "
+            f"WHERE (expires_at IS NULL OR expires_at > ?) {condition} "
+            "ORDER BY accessed_at DESC, key DESC LIMIT ?",
+            (now, *params, limit),
+        ).fetchall()
+
+    def _write(self, pending: Dict[str, Tuple[str, Optional[float]]], accessed: Set[str]) -> None:
+        connection = self._connection()
+        now = time.time()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.executemany(
+                "INSERT OR REPLACE INTO entries (key, value, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?)",
+                ((key, value, expires_at, now) for key, (value, expires_at) in pending.items()),
+            )
+            connection.executemany(
+                "UPDATE entries SET accessed_at = ? WHERE key = ?",
+                ((now, key) for key in accessed - pending.keys()),
+            )
+
+        self._writes_since_trim += len(pending)
+        # Counting is a full index scan, so only trim once enough writes accumulated
+        if self._writes_since_trim >= min(self.flush_batch_size, self.max_entries):
+            self._trim(now)
+
+    def _trim(self, now: float) -> None:
+        connection = self._connection()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute("DELETE FROM entries WHERE expires_at <= ?", (now,))
+            unpinned = " AND ".join("key NOT GLOB ?" for _ in PINNED_PREFIXES)
+            patterns = tuple(f"{prefix}*" for prefix in PINNED_PREFIXES)
+            (count,) = connection.execute(
+                f"SELECT COUNT(*) FROM entries WHERE {unpinned}", patterns
+            ).fetchone()
+            excess = count - self.max_entries
+            if excess > 0:
+                logger.debug("Evicting %d least recently used SQLite cache entries", excess)
+                connection.execute(
+                    "DELETE FROM entries WHERE key IN "
+                    f"(SELECT key FROM entries WHERE {unpinned} ORDER BY accessed_at LIMIT ?)",
+                    (*patterns, excess),
+                )
+        self._writes_since_trim = 0
+
+    def _insert_if_absent(self, key: str, value: str, expires_at: Optional[float]) -> bool:
+        now = time.time()
+        cursor = self._connection().execute(
+            "INSERT INTO entries (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value, "
+            "expires_at = excluded.expires_at, accessed_at = excluded.accessed_at "
+            "WHERE entries.expires_at <= ?",
+            (key, value, expires_at, now, now),
+        )
+        return cursor.rowcount > 0
+
+    def _increment(self, key: str, amount: int, expires_at: Optional[float]) -> int:
+        now = time.time()
+        (value,) = self._connection().execute(
+            "INSERT INTO entries (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET "
+            "value = CASE WHEN entries.expires_at <= ? THEN excluded.value "
+            "ELSE CAST(entries.value AS INTEGER) + ? END, "
+            "expires_at = CASE WHEN entries.expires_at <= ? THEN excluded.expires_at "
+            "ELSE entries.expires_at END "
+            "RETURNING value",
+            (key, str(amount), expires_at, now, now, amount, now),
+        ).fetchone()
+        return int(value)
+
+    def _delete(self, key: str) -> None:
+        self._connection().execute("DELETE FROM entries WHERE key = ?", (key,))
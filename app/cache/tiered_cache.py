@@ -0,0 +1,157 @@
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from app.metrics.prometheus_metrics import CACHE_TIER_LOOKUPS
+
+from .base import PINNED_PREFIXES, Cache
+from .memory_cache import InMemoryCache
+
+
+class TieredCache(Cache):
+    """Two-tier cache with a per-process L1 in front of a shared L2 backend.
+
+    Reads go to L1 first and fall through to L2, backfilling L1 on an L2 hit.
+    Writes go to both tiers. L1 entries live for at most `l1_ttl` seconds, so
+    a value changed in L2 by another worker is picked up within that window.
+    Keys starting with one of `l2_only_prefixes`, used to coordinate workers
+    (locks, rate limit counters and pinned keys such as rewrite jobs), are
+    never held in L1, as a stale copy would outlive their changes in L2.
+    """
+
+    def __init__(
+        self,
+        l2: Cache,
+        l1: Optional[InMemoryCache] = None,
+        l1_ttl: float = 5.0,
+        l2_only_prefixes: Tuple[str, ...] = ("lock:", "ratelimit", *PINNED_PREFIXES),
+    ):
+        self.l1 = l1 or InMemoryCache()
+        self.l2 = l2
+        self.l1_ttl = l1_ttl
+        self.l2_only_prefixes = l2_only_prefixes
+
+    def _l2_only(self, key: str) -> bool:
+        return key.startswith(self.l2_only_prefixes)
+
+    async def get(self, key: str) -> Optional[str]:
+        """Get a value from L1, falling back to L2."""
+        if self._l2_only(key):
+            return await self.l2.get(key)
+
+        value = await self.l1.get(key)
+        if value is not None:
+            CACHE_TIER_LOOKUPS.labels(result="l1_hit").inc()
+            return value
+
+        value = await self.l2.get(key)
+        if value is not None:
+            CACHE_TIER_LOOKUPS.labels(result="l2_hit").inc()
+            await self.l1.set(key, value, ttl=self.l1_ttl)
+        else:
+            CACHE_TIER_LOOKUPS.labels(result="miss").inc()
+        return value
+
+    async def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        """Set a value in both tiers."""
+        await self.l2.set(key, value, ttl=ttl)
+        if not self._l2_only(key):
+            await self.l1.set(key, value, ttl=self._l1_ttl(ttl))
+
+    async def get_many(self, keys: List[str]) -> List[Optional[str]]:
+        """Get several values, reading only the L1 misses from L2 in one call."""
+        values = await self.l1.get_many(keys)
+        l1_misses = [i for i, value in enumerate(values) if value is None]
+        CACHE_TIER_LOOKUPS.labels(result="l1_hit").inc(len(keys) - len(l1_misses))
+        if not l1_misses:
+            return values
+
+        l2_values = await self.l2.get_many([keys[i] for i in l1_misses])
+        backfill, l2_only = {}, 0
+        for i, value in zip(l1_misses, l2_values):
+            values[i] = value
+            if self._l2_only(keys[i]):
+                # Never in L1, so neither backfilled nor counted as an L1 miss
+                l2_only += 1
+            elif value is not None:
+                backfill[keys[i]] = value
+
+        CACHE_TIER_LOOKUPS.labels(result="l2_hit").inc(len(backfill))
+        CACHE_TIER_LOOKUPS.labels(result="miss").inc(len(l1_misses) - len(backfill) - l2_only)
+        await self.l1.set_many(backfill, ttl=self.l1_ttl)
+        return values
+
+    async def get_entries(self, keys: List[str]) -> List[Tuple[Optional[str], bool]]:
+        """Get several values with whether each is still fresh, reading only the L1 misses from L2.
+
+        L1 keeps the soft expiry with the value, so stale markers never take
+        up L1 entries or count as tier lookups. A fresh value backfilled from
+        L2 is treated as fresh in L1 for up to `l1_ttl` seconds.
+        """
+        entries = await self.l1.get_entries(keys)
+        l1_misses = [i for i, (value, _) in enumerate(entries) if value is None]
+        CACHE_TIER_LOOKUPS.labels(result="l1_hit").inc(len(keys) - len(l1_misses))
+        if not l1_misses:
+            return entries
+
+        l2_entries = await self.l2.get_entries([keys[i] for i in l1_misses])
+        backfilled, l2_only = 0, 0
+        for i, (value, fresh) in zip(l1_misses, l2_entries):
+            entries[i] = (value, fresh)
+            if self._l2_only(keys[i]):
+                l2_only += 1
+            elif value is not None:
+                backfilled += 1
+                await self.l1.set_entry(
+                    keys[i], value, ttl=self.l1_ttl, soft_ttl=None if fresh else 0
+                )
+
+        CACHE_TIER_LOOKUPS.labels(result="l2_hit").inc(backfilled)
+        CACHE_TIER_LOOKUPS.labels(result="miss").inc(len(l1_misses) - backfilled - l2_only)
+        return entries
+
+    async def set_entry(
+        self, key: str, value: str, ttl: Optional[float] = None, soft_ttl: Optional[float] = None
+    ) -> None:
+        """Set a value that turns stale after `soft_ttl` seconds in both tiers."""
+        await self.l2.set_entry(key, value, ttl=ttl, soft_ttl=soft_ttl)
+        if not self._l2_only(key):
+            await self.l1.set_entry(key, value, ttl=self._l1_ttl(ttl), soft_ttl=soft_ttl)
+
+    async def set_many(self, items: Dict[str, str], ttl: Optional[float] = None) -> None:
+        """Set several values in both tiers."""
+        await self.l2.set_many(items, ttl=ttl)
+        await self.l1.set_many(
+            {key: value for key, value in items.items() if not self._l2_only(key)},
+            ttl=self._l1_ttl(ttl),
+        )
+
+    async def add(self, key: str, value: str, ttl: Optional[float] = None) -> bool:
+        """Set a value in L2 only if the key is absent there."""
+        # Only the shared tier can arbitrate between workers
+        return await self.l2.add(key, value, ttl=ttl)
+
+    async def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        """Increment a counter in L2."""
+        return await self.l2.incr(key, amount, ttl=ttl)
+
+    async def delete(self, key: str) -> None:
+        """Remove a value from both tiers."""
+        await self.l1.delete(key)
+        await self.l2.delete(key)
+
+    @property
+    def capacity(self) -> Optional[int]:
+        """Capacity of L2, which holds every entry."""
+        return self.l2.capacity
+
+    async def scan(self) -> AsyncIterator[Tuple[str, str, int]]:
+        """Iterate over the entries of L2."""
+        async for entry in self.l2.scan():
+            yield entry
+
+    async def close(self) -> None:
+        """Release the resources held by both tiers."""
+        await self.l1.close()
+        await self.l2.close()
+
+    def _l1_ttl(self, ttl: Optional[float]) -> float:
+        return min(ttl, self.l1_ttl) if ttl is not None else self.l1_ttl
@@ -0,0 +1,222 @@
+"""Stream a JSONL file of `{"text": ..., "style": ...}` records through RewriteService.
+
+Results are written to the output JSONL file in input order, one line per
+record: a rewrite response, or `{"error": {"message": ...}}` for a record that
+failed. Progress is checkpointed next to the output file, so an interrupted
+run started again with the same arguments resumes where it stopped.
+
+Usage: python -m app.cli.bulk_rewrite input.jsonl output.jsonl [--concurrency N]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, List, Optional, Tuple
+
+from app.cache import get_cache
+from app.config.logging import setup_logger
+from app.exception.custom_exceptions import ValidationError
+from app.llm_adapter import get_llm_adapter
+from app.metrics.prometheus_metrics import cache_registry
+from app.model.enums import StyleEnum
+from app.model.models import RewriteRequest
+from app.service.rewrite_service import RewriteService
+
+logger = setup_logger(__name__)
+
+# Number of latencies kept for the percentiles, so memory does not grow with the input
+LATENCY_SAMPLE_SIZE = 10_000
+
+
+@dataclass
+class BulkRewriteSummary:
+    """Throughput, latency and cache statistics of a bulk rewrite run."""
+
+    records: int = 0
+    errors: int = 0
+    skipped: int = 0
+    elapsed: float = 0.0
+    cache_hits: float = 0.0
+    cache_misses: float = 0.0
+    latency_sample: List[float] = field(default_factory=list)
+    _latencies_seen: int = 0
+
+    def record_latency(self, latency: float) -> None:
+        """Keep a uniform sample of the latencies (reservoir sampling)."""
+        self._latencies_seen += 1
+        if len(self.latency_sample) < LATENCY_SAMPLE_SIZE:
+            self.latency_sample.append(latency)
+        else:
+            index = random.randrange(self._latencies_seen)
+            if index < LATENCY_SAMPLE_SIZE:
+                self.latency_sample[index] = latency
+
+    def percentile(self, q: float) -> float:
+        if not self.latency_sample:
+            return 0.0
+        ordered = sorted(self.latency_sample)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+    def format(self) -> str:
+        lookups = self.cache_hits + self.cache_misses
+        hit_ratio = self.cache_hits / lookups if lookups else 0.0
+        throughput = self.records / self.elapsed if self.elapsed else 0.0
+        return "\n".join(
+            [
+                f"records:         {self.records} ({self.errors} errors, {self.skipped} skipped from checkpoint)",
+                f"elapsed:         {self.elapsed:.2f} s",
+                f"throughput:      {throughput:.1f} records/s",
+                f"latency p50:     {self.percentile(0.50) * 1000:.1f} ms",
+                f"latency p95:     {self.percentile(0.95) * 1000:.1f} ms",
+                f"latency p99:     {self.percentile(0.99) * 1000:.1f} ms",
+                f"cache hit ratio: {hit_ratio:.1%}",
+            ]
+        )
+
+
+def _load_checkpoint(checkpoint_path: str) -> Tuple[int, int]:
+    """Return the number of input lines done and the output size at the last checkpoint."""
+    if not os.path.exists(checkpoint_path):
+        return 0, 0
+    with open(checkpoint_path) as f:
+        checkpoint = json.load(f)
+    return checkpoint["lines_done"], checkpoint["output_offset"]
+
+
+def _save_checkpoint(checkpoint_path: str, lines_done: int, output_offset: int) -> None:
+    # Write and rename, so an interruption never leaves a partial checkpoint behind
+    tmp_path = f"{checkpoint_path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"lines_done": lines_done, "output_offset": output_offset}, f)
+    os.replace(tmp_path, checkpoint_path)
+
+
+async def _rewrite_line(service: RewriteService, line: str, semaphore: asyncio.Semaphore) -> Tuple[dict, float]:
+    """Rewrite a single JSONL record, returning the output record and its latency."""
+    async with semaphore:
+        start = time.perf_counter()
+        try:
+            record = json.loads(line)
+            request = RewriteRequest(text=record.get("text", ""), style=record.get("style", "formal"))
+            response = await service.rewrite(request.text, StyleEnum(request.style))
+            result = response.model_dump(mode="json")
+        except ValidationError as e:
+            result = {"error": {"message": e.detail}}
+        except (json.JSONDecodeError, AttributeError) as e:
+            result = {"error": {"message": f"Invalid record: {str(e)}"}}
+        except Exception as e:
+            logger.error(f"Error rewriting record: {str(e)}")
+            result = {"error": {"message": "Internal server error"}}
+        return result, time.perf_counter() - start
+
+
+def _cache_counters() -> Tuple[float, float]:
+    hits = cache_registry.get_sample_value("rewrite_cache_hits_total") or 0.0
+    misses = cache_registry.get_sample_value("rewrite_cache_misses_total") or 0.0
+    return hits, misses
+
+
+async def bulk_rewrite(
+    service: RewriteService,
+    input_path: str,
+    output_path: str,
+    concurrency: int = 16,
+    checkpoint_path: Optional[str] = None,
+    checkpoint_every: int = 100,
+) -> BulkRewriteSummary:
+    """Rewrite every record of `input_path` into `output_path`, in order.
+
+    At most `concurrency` records are rewritten at a time and at most
+    `4 * concurrency` are held in memory, whatever the size of the input.
+    """
+    checkpoint_path = checkpoint_path or f"{output_path}.checkpoint"
+    lines_done, output_offset = _load_checkpoint(checkpoint_path)
+    if lines_done and not os.path.exists(output_path):
+        logger.warning("Found a checkpoint but no output file, starting over")
+        lines_done, output_offset = 0, 0
+    if lines_done:
+        logger.info(f"Resuming from checkpoint after {lines_done} input lines")
+
+    summary = BulkRewriteSummary(skipped=lines_done)
+    hits_before, misses_before = _cache_counters()
+    semaphore = asyncio.Semaphore(concurrency)
+    window: Deque[Tuple[int, asyncio.Task]] = deque()
+    start = time.perf_counter()
+
+    mode = "r+" if lines_done else "w"
+    with open(input_path) as input_file, open(output_path, mode) as output_file:
+        # Drop anything written after the last checkpoint, it is redone below
+        output_file.seek(output_offset)
+        output_file.truncate()
+
+        async def write_oldest() -> None:
+            nonlocal lines_done
+            line_number, task = window.popleft()
+            result, latency = await task
+            output_file.write(json.dumps(result) + "\n")
+            summary.records += 1
+            summary.errors += "error" in result
+            summary.record_latency(latency)
+            lines_done = line_number
+            if summary.records % checkpoint_every == 0:
+                output_file.flush()
+                _save_checkpoint(checkpoint_path, lines_done, output_file.tell())
+
+        for line_number, line in enumerate(input_file, start=1):
+            if line_number <= summary.skipped or not line.strip():
+                continue
+            window.append((line_number, asyncio.create_task(_rewrite_line(service, line, semaphore))))
+            if len(window) >= 4 * concurrency:
+                await write_oldest()
+
+        while window:
+            await write_oldest()
+
+    summary.elapsed = time.perf_counter() - start
+    hits_after, misses_after = _cache_counters()
+    summary.cache_hits = hits_after - hits_before
+    summary.cache_misses = misses_after - misses_before
+
+    # The run completed, a later run with the same output starts over
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    return summary
+
+
+async def _main(args: argparse.Namespace) -> None:
+    cache = get_cache()
+    llm_adapter = get_llm_adapter()
+    service = RewriteService(llm_adapter, cache)
+    await llm_adapter.start()
+    try:
+        summary = await bulk_rewrite(
+            service,
+            args.input,
+            args.output,
+            concurrency=args.concurrency,
+            checkpoint_path=args.checkpoint,
+            checkpoint_every=args.checkpoint_every,
+        )
+    finally:
+        await llm_adapter.close()
+        await cache.close()
+    print(summary.format())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Rewrite a JSONL file of {text, style} records.")
+    parser.add_argument("input", help="Input JSONL file")
+    parser.add_argument("output", help="Output JSONL file, one result per input record in order")
+    parser.add_argument("--concurrency", type=int, default=16, help="Max records rewritten at a time")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: <output>.checkpoint)")
+    parser.add_argument("--checkpoint-every", type=int, default=100, help="Records between checkpoints")
+    asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""Export the configured cache to a snapshot file, or load a snapshot into it.
+
+Usage:
+    python -m app.cli.cache_snapshot export snapshot.jsonl.gz
+    python -m app.cli.cache_snapshot load snapshot.jsonl.gz [--limit N]
+"""
+
+import argparse
+import asyncio
+
+from app.cache import get_cache
+from app.cache.snapshot import export_snapshot, load_snapshot
+
+
+async def _main(args: argparse.Namespace) -> None:
+    cache = get_cache()
+    try:
+        if args.command == "export":
+            count = await export_snapshot(cache, args.path)
+            print(f"Exported {count} entries to {args.path}")
+        else:
+            count = await load_snapshot(cache, args.path, limit=args.limit)
+            print(f"Loaded {count} entries from {args.path}")
+    finally:
+        await cache.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Export or load cache snapshots.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="Write the cache entries to a snapshot file")
+    export_parser.add_argument("path", help="Snapshot file to write")
+
+    load_parser = subparsers.add_parser("load", help="Load a snapshot file into the cache")
+    load_parser.add_argument("path", help="Snapshot file to read")
+    load_parser.add_argument(
+        "--limit", type=int, help="Max entries to load (default: the cache capacity)"
+    )
+
+    asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,173 @@
+import atexit
+import json
 import logging
+import logging.handlers
+import os
+import queue
+import random
 import sys
-from typing import Optional
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+
+def _parse_mapping(value: str) -> Dict[str, str]:
+    """Parse comma-separated `name=value` pairs."""
+    pairs = (item.split("=", 1) for item in value.split(",") if item.strip())
+    return {name.strip(): setting.strip() for name, setting in pairs}
+
+
+def _longest_prefix(name: str, settings: Dict[str, Any]) -> Optional[str]:
+    matches = [prefix for prefix in settings if name.startswith(prefix)]
+    return max(matches, key=len) if matches else None
+
+
+# Level of every logger, overridden for the loggers under a name prefix by
+# LOG_LEVELS, e.g. "app.llm_adapter=DEBUG,app.cache=WARNING"
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_LEVELS = {name: level.upper() for name, level in _parse_mapping(os.getenv("LOG_LEVELS", "")).items()}
+# "text" or "json"
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+# Write the logs from a background thread, so a slow stdout never blocks the event loop.
+# At most LOG_QUEUE_SIZE records wait to be written, any more are dropped
+LOG_ASYNC = os.getenv("LOG_ASYNC", "true").lower() == "true"
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Share of requests whose INFO and DEBUG lines are kept, overridden for the routes
+# under a path prefix by LOG_SAMPLE_RATES, e.g. "/v1/rewrite=0.01,/v1/rewrite/jobs=1"
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))
+LOG_SAMPLE_RATES = {
+    route: float(rate) for route, rate in _parse_mapping(os.getenv("LOG_SAMPLE_RATES", "")).items()
+}
+
+_route: ContextVar[Optional[str]] = ContextVar("log_route", default=None)
+_sampled: ContextVar[bool] = ContextVar("log_sampled", default=True)
+
+# Attributes every record has, anything else was passed with `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "route", "taskName"}
+
+
+def _extra_fields(record: logging.LogRecord) -> Dict[str, Any]:
+    return {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES}
+
+
+class TextFormatter(logging.Formatter):
+    """Human readable lines, followed by the `extra` fields of the record as JSON."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        extra = _extra_fields(record)
+        return f"{line} {json.dumps(extra, default=str)}" if extra else line
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with the route of the request and the `extra` fields of the record."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        route = getattr(record, "route", None)
+        if route is not None:
+            entry["route"] = route
+        entry.update(_extra_fields(record))
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    """Drop the INFO and DEBUG records of requests left out of the log sample.
+
+    Warnings and errors are always kept, as are records logged outside of
+    a request. Records are tagged with the route of their request.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.route = _route.get()
+        return record.levelno > logging.INFO or _sampled.get()
+
+
+def sample_rate(route: str) -> float:
+    prefix = _longest_prefix(route, LOG_SAMPLE_RATES)
+    return LOG_SAMPLE_RATES[prefix] if prefix is not None else LOG_SAMPLE_RATE
+
+
+def start_request_logging(route: str) -> None:
+    """Decide whether the INFO and DEBUG lines of the current request are logged.
+
+    The decision is made once per request, so a sampled request keeps all
+    of its lines.
+    """
+    _route.set(route)
+    rate = sample_rate(route)
+    _sampled.set(rate >= 1.0 or random.random() < rate)
+
+
+class RequestLoggingMiddleware:
+    """Start the log sampling of every HTTP request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            start_request_logging(scope["path"])
+        await self.app(scope, receive, send)
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Queue records for the listener thread, which formats them.
+
+    The standard QueueHandler merges the message arguments and formats
+    records before queueing them, on the calling thread. Here records are
+    queued as they are, and the listener's formatter merges the arguments,
+    so log calls pass them `%`-style rather than as f-strings. Records are
+    dropped while the queue is full.
+    """
+
+    dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # Drop lines rather than block the event loop while stdout is backed up
+            self.dropped += 1
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+_handler: Optional[logging.Handler] = None
+
+
+def _get_handler() -> logging.Handler:
+    """The handler shared by all loggers, created on first use."""
+    global _handler
+    if _handler is None:
+        stream_handler = logging.StreamHandler(sys.stdout)
+        if LOG_FORMAT == "json":
+            stream_handler.setFormatter(JsonFormatter())
+        else:
+            stream_handler.setFormatter(
+                TextFormatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+            )
+
+        if LOG_ASYNC:
+            log_queue: queue.Queue = queue.Queue(LOG_QUEUE_SIZE)
+            handler = _DeferredQueueHandler(log_queue)
+            listener = logging.handlers.QueueListener(log_queue, stream_handler)
+            listener.start()
+            # Write out the queued records on exit
+            atexit.register(listener.stop)
+        else:
+            handler = stream_handler
+        handler.addFilter(SamplingFilter())
+        _handler = handler
+    return _handler
 
 
 def setup_logger(name: Optional[str] = None) -> logging.Logger:
@@ -9,16 +176,10 @@ def setup_logger(name: Optional[str] = None) -> logging.Logger:
     logger = logging.getLogger(name)
 
     if not logger.handlers:
-        # Set log level
-        logger.setLevel(logging.DEBUG)
-
-        # Create formatters
-        console_formatter = logging.Formatter(
-            "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-        )
-        # Console handler
-        console_handler = logging.StreamHandler(sys.stdout)
-        console_handler.setFormatter(console_formatter)
-        logger.addHandler(console_handler)
+        prefix = _longest_prefix(name or "", LOG_LEVELS)
+        logger.setLevel(LOG_LEVELS[prefix] if prefix is not None else LOG_LEVEL)
+        logger.addHandler(_get_handler())
+        # Every logger has the shared handler, so records must not also reach it through a parent
+        logger.propagate = False
 
     return logger
@@ -1,3 +1,5 @@
+import math
+
 from fastapi import HTTPException
 
 
@@ -29,6 +31,27 @@ class InvalidStyleError(ValidationError):
         super().__init__(message=f"Style must be one of: {', '.join(valid_styles)}")
 
 
+class EmptyBatchError(ValidationError):
+    """Exception raised when a batch has no items."""
+
+    def __init__(self):
+        super().__init__(message="Batch must contain at least one item")
+
+
+class BatchTooLargeError(ValidationError):
+    """Exception raised when a batch exceeds the maximum number of items."""
+
+    def __init__(self, max_items: int):
+        super().__init__(message=f"Batch exceeds the maximum of {max_items} items")
+
+
+class JobNotFoundError(HTTPException):
+    """Exception raised when a rewrite job does not exist or has expired."""
+
+    def __init__(self, job_id: str):
+        super().__init__(status_code=404, detail=f"Job {job_id} not found")
+
+
 class LLMError(HTTPException):
     """Base exception for LLM-related errors."""
     def __init__(self, detail: str):
@@ -43,3 +66,27 @@ class LLMTimeoutError(LLMError):
     """Exception raised when LLM API request times out."""
     def __init__(self, detail: str = "Request timed out"):
         super().__init__(detail=detail)
+
+
+class LLMBatchParseError(LLMError):
+    """Exception raised when a batched LLM response cannot be split into one rewrite per text."""
+    def __init__(self, detail: str = "Could not parse the batched LLM response"):
+        super().__init__(detail=detail)
+
+
+class LoadSheddingError(HTTPException):
+    """Base exception for requests rejected to protect the service and the LLM API."""
+
+    def __init__(self, status_code: int, detail: str, retry_after: float):
+        super().__init__(status_code=status_code, detail=detail)
+        self.retry_after = max(math.ceil(retry_after), 1)
+
+class ServiceOverloadedError(LoadSheddingError):
+    """Exception raised when too many LLM calls are in flight or queued."""
+    def __init__(self, detail: str = "Too many requests in flight", retry_after: float = 1):
+        super().__init__(status_code=429, detail=detail, retry_after=retry_after)
+
+class CircuitOpenError(LoadSheddingError):
+    """Exception raised when the circuit breaker in front of the LLM adapter is open."""
+    def __init__(self, detail: str = "LLM adapter circuit breaker is open", retry_after: float = 1):
+        super().__init__(status_code=503, detail=detail, retry_after=retry_after)
@@ -1,24 +1,121 @@
 import os
+from dataclasses import replace
 from functools import lru_cache
 
+from app.cache import get_cache
 from app.config.logging import setup_logger
 
 from .base import LLMAdapter
+from .hedging import HedgingAdapter
+from .micro_batching import MicroBatchingAdapter
 from .mock_adapter import MockLLMAdapter
-from .openai_adapter import OpenAIAdapter
+from .openai_adapter import OpenAIAdapter, OpenAIConfig
+from .recording import RecordingAdapter, ReplayAdapter
+from .rate_limiter import AdaptiveRateLimiter, SharedRateBudget
 
 logger = setup_logger(__name__)
 
 
+def _get_rate_limiter(config: OpenAIConfig, key_prefix: str = "ratelimit") -> AdaptiveRateLimiter:
+    """Build the OpenAI rate limiter, sharing its budget across workers if configured."""
+    shared_budget = None
+    if os.getenv("OPENAI_SHARED_RATE_LIMIT", "false").lower() == "true":
+        logger.info("Will share the OpenAI rate limit budget across workers through the cache")
+        shared_budget = SharedRateBudget(
+            get_cache(), config.requests_per_minute, config.tokens_per_minute, key_prefix
+        )
+    return AdaptiveRateLimiter(
+        requests_per_minute=config.requests_per_minute,
+        tokens_per_minute=config.tokens_per_minute,
+        max_wait=config.max_rate_limit_wait,
+        shared_budget=shared_budget,
+    )
+
+
 @lru_cache()
 def get_llm_adapter() -> LLMAdapter:
     """Factory function to get the appropriate LLM adapter based on environment variables."""
+    trace_mode = os.getenv("LLM_TRACE_MODE", "").lower()
+    trace_path = os.getenv("LLM_TRACE_PATH")
+    if trace_mode in ("record", "replay") and not trace_path:
+        raise ValueError(f"LLM_TRACE_PATH must be set to the trace file when LLM_TRACE_MODE={trace_mode}")
+    trace_fallback = os.getenv("LLM_TRACE_FALLBACK", "false").lower() == "true"
+    if trace_mode == "replay" and not trace_fallback:
+        # The recorded responses are all there is, so no LLM adapter is needed
+        logger.info(f"Will replay recorded LLM responses from {trace_path}")
+        return ReplayAdapter(
+            trace_path, latency_scale=float(os.getenv("LLM_TRACE_LATENCY_SCALE", "1.0"))
+        )
+
+    adapter = _get_base_adapter()
+    if os.getenv("LLM_MICRO_BATCHING", "false").lower() == "true" and not adapter.supports_batching:
+        # Batches would only be split back into one call per text
+        logger.warning(f"The {adapter.name} LLM adapter cannot batch rewrites, micro-batching is disabled")
+    elif os.getenv("LLM_MICRO_BATCHING", "false").lower() == "true":
+        logger.info("Will micro-batch concurrent LLM calls of the same style")
+        adapter = MicroBatchingAdapter(
+            adapter,
+            max_batch_size=int(os.getenv("LLM_MICRO_BATCH_SIZE", "8")),
+            max_wait=float(os.getenv("LLM_MICRO_BATCH_WAIT_MS", "10")) / 1000,
+            max_batch_tokens=int(os.getenv("LLM_MICRO_BATCH_TOKENS", "2000")),
+        )
+
+    if trace_mode == "record":
+        logger.info(f"Will record LLM responses to {trace_path}")
+        adapter = RecordingAdapter(adapter, trace_path)
+    elif trace_mode == "replay":
+        logger.info(f"Will replay recorded LLM responses from {trace_path}, falling back to the LLM")
+        # Recorded keys are looked up for the parameters of the adapter that fills the gaps
+        adapter = ReplayAdapter(
+            trace_path,
+            params=adapter.params,
+            latency_scale=float(os.getenv("LLM_TRACE_LATENCY_SCALE", "1.0")),
+            fallback=adapter,
+        )
+    return adapter
+
+
+def _get_base_adapter() -> LLMAdapter:
     openai_api_key = os.getenv("OPENAI_API_KEY")
     if openai_api_key:
         logger.info("Found OpenAI API key. Will use OpenAI LLM adapter")
-        return OpenAIAdapter(openai_api_key)
+        config = OpenAIConfig(
+            requests_per_minute=int(os.getenv("OPENAI_REQUESTS_PER_MINUTE", "500")),
+            tokens_per_minute=int(os.getenv("OPENAI_TOKENS_PER_MINUTE", "200000")),
+            base_url=os.getenv("OPENAI_BASE_URL") or None,
+            timeout=float(os.getenv("OPENAI_TIMEOUT", "60")),
+            connect_timeout=float(os.getenv("OPENAI_CONNECT_TIMEOUT", "5")),
+            max_connections=int(os.getenv("OPENAI_MAX_CONNECTIONS", "100")),
+            max_keepalive_connections=int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "100")),
+            keepalive_expiry=float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "60")),
+            http2=os.getenv("OPENAI_HTTP2", "false").lower() == "true",
+            warmup_connections=int(os.getenv("OPENAI_WARMUP_CONNECTIONS", "0")),
+        )
+        hedge_backends = os.getenv("LLM_HEDGE_BACKENDS")
+        if hedge_backends:
+            return _get_hedging_adapter(openai_api_key, config, hedge_backends)
+        return OpenAIAdapter(openai_api_key, config, rate_limiter=_get_rate_limiter(config))
     # If OPENAI_API_KEY is not set fall back to default mocked LLM adapter
     logger.info(
         "No OpenAI API key found. Will use mock LLM adapter instead. To use OpenAI setup OPENAI_API_KEY env variable"
     )
     return MockLLMAdapter()
+
+
+def _get_hedging_adapter(api_key: str, config: OpenAIConfig, backends: str) -> HedgingAdapter:
+    """Build a hedging adapter over comma-separated `model` or `model@base_url` backends."""
+    adapters = {}
+    for backend in backends.split(","):
+        model, _, base_url = backend.strip().partition("@")
+        backend_config = replace(config, model=model, base_url=base_url or config.base_url)
+        # Each model has its own rate limits
+        rate_limiter = _get_rate_limiter(backend_config, key_prefix=f"ratelimit:{backend.strip()}")
+        adapters[backend.strip()] = OpenAIAdapter(api_key, backend_config, rate_limiter=rate_limiter)
+
+    logger.info(f"Will route OpenAI calls across {', '.join(adapters)} with hedging")
+    return HedgingAdapter(
+        adapters,
+        hedge_quantile=float(os.getenv("LLM_HEDGE_QUANTILE", "0.95")),
+        default_hedge_delay=float(os.getenv("LLM_HEDGE_DEFAULT_DELAY", "2")),
+        max_hedge_rate=float(os.getenv("LLM_HEDGE_MAX_RATE", "0.1")),
+    )
@@ -1,4 +1,6 @@
+import asyncio
 from abc import ABC, abstractmethod
+from typing import Any, AsyncIterator, Dict, List
 
 from app.model.models import StyleEnum
 
@@ -6,7 +8,41 @@ from app.model.models import StyleEnum
 class LLMAdapter(ABC):
     """Abstract base class for LLM adapters."""
 
+    # Identifies the adapter in metric labels
+    name: str = "unknown"
+    # Whether `rewrite_many` packs the texts into a single LLM call
+    supports_batching: bool = False
+
+    @property
+    def params(self) -> Dict[str, Any]:
+        """Model parameters that affect the output, used to key recorded responses."""
+        return {}
+
     @abstractmethod
     async def rewrite(self, text: str, style: StyleEnum) -> str:
         """Rewrite the given text in the specified style."""
         pass
+
+    async def rewrite_stream(self, text: str, style: StyleEnum) -> AsyncIterator[str]:
+        """Rewrite the given text, yielding the output in chunks as it is generated.
+
+        Adapters without native streaming yield the whole rewrite as one chunk.
+        """
+        yield await self.rewrite(text, style)
+
+    async def rewrite_many(self, texts: List[str], style: StyleEnum) -> List[str]:
+        """Rewrite several texts in the same style, returning the rewrites in input order.
+
+        Adapters that can pack the texts into a single LLM call raise
+        LLMBatchParseError if its output cannot be split back into one rewrite
+        per text. By default each text is rewritten with its own call.
+        """
+        return list(await asyncio.gather(*(self.rewrite(text, style) for text in texts)))
+
+    async def start(self) -> None:
+        """Prepare the adapter to serve requests, e.g. open connections ahead of the first call."""
+        pass
+
+    async def close(self) -> None:
+        """Release any resources held by the adapter."""
+        pass
@@ -0,0 +1,221 @@
+import asyncio
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+from app.config.logging import setup_logger
+from app.metrics.prometheus_metrics import (
+    HEDGED_REQUESTS,
+    HEDGES_SKIPPED,
+    LLM_BACKEND_ERROR_RATE,
+    LLM_BACKEND_LATENCY,
+)
+from app.model.models import StyleEnum
+
+from .base import LLMAdapter
+
+logger = setup_logger(__name__)
+
+
+class BackendStats:
+    """Latency and error statistics of one LLM backend."""
+
+    def __init__(self, name: str, alpha: float, window_size: int, prior_latency: float):
+        self.name = name
+        self.alpha = alpha
+        # Assumed latency until the first successful call
+        self.prior_latency = prior_latency
+        self.latency: Optional[float] = None
+        self.error_rate = 0.0
+        self._latencies: Deque[float] = deque(maxlen=window_size)
+
+    @property
+    def samples(self) -> int:
+        return len(self._latencies)
+
+    def quantile(self, q: float) -> float:
+        """Latency quantile of the recent successful calls."""
+        latencies = sorted(self._latencies)
+        return latencies[min(int(q * len(latencies)), len(latencies) - 1)]
+
+    def score(self) -> float:
+        """Expected latency of a call, lower is better."""
+        latency = self.latency if self.latency is not None else self.prior_latency
+        # A call that fails has to be repeated, so errors inflate the expected latency
+        return latency / max(1.0 - self.error_rate, 0.05)
+
+    def record_success(self, latency: float) -> None:
+        self._latencies.append(latency)
+        self.latency = latency if self.latency is None else self._ewma(self.latency, latency)
+        self.error_rate = self._ewma(self.error_rate, 0.0)
+        LLM_BACKEND_LATENCY.labels(backend=self.name).set(self.latency)
+        LLM_BACKEND_ERROR_RATE.labels(backend=self.name).set(self.error_rate)
+
+    def record_censored(self, elapsed: float) -> None:
+        """Record a call cancelled after `elapsed` seconds, whose latency is at least that."""
+        self._latencies.append(elapsed)
+        self.latency = elapsed if self.latency is None else self._ewma(self.latency, elapsed)
+        LLM_BACKEND_LATENCY.labels(backend=self.name).set(self.latency)
+
+    def record_failure(self) -> None:
+        self.error_rate = self._ewma(self.error_rate, 1.0)
+        LLM_BACKEND_ERROR_RATE.labels(backend=self.name).set(self.error_rate)
+
+    def _ewma(self, average: float, value: float) -> float:
+        return (1 - self.alpha) * average + self.alpha * value
+
+
+class HedgingAdapter(LLMAdapter):
+    """Route rewrites across several LLM backends, hedging slow calls.
+
+    Each call goes to the backend with the lowest expected latency, judged
+    from moving averages of its latency and error rate. If it has not
+    answered by the `hedge_quantile` latency of that backend's recent calls
+    (or `default_hedge_delay` until enough calls were seen), the same rewrite
+    is sent to the next best backend, as it is when the call fails early.
+    The first successful answer wins and
+    the other call is cancelled. Backends start from an assumed latency of
+    `default_hedge_delay`, so the configured order decides until hedged
+    calls have measured the others.
+
+    Hedges are limited to about `max_hedge_rate` of the calls: every call
+    adds that fraction of a hedge to a budget, capped at `max_hedge_burst`,
+    and every hedge spends a whole one. Streaming and batched rewrites are
+    routed but not hedged.
+    """
+
+    name = "hedged"
+
+    def __init__(
+        self,
+        backends: Dict[str, LLMAdapter],
+        hedge_quantile: float = 0.95,
+        default_hedge_delay: float = 2.0,
+        min_samples: int = 20,
+        max_hedge_rate: float = 0.1,
+        max_hedge_burst: float = 10.0,
+        ewma_alpha: float = 0.1,
+        window_size: int = 200,
+    ):
+        if not backends:
+            raise ValueError("HedgingAdapter needs at least one backend")
+        self.backends = backends
+        self.hedge_quantile = hedge_quantile
+        self.default_hedge_delay = default_hedge_delay
+        self.min_samples = min_samples
+        self.max_hedge_rate = max_hedge_rate
+        self.max_hedge_burst = max_hedge_burst
+        self.stats = {
+            name: BackendStats(name, ewma_alpha, window_size, default_hedge_delay)
+            for name in backends
+        }
+        self._hedge_budget = max_hedge_burst
+
+    @property
+    def supports_batching(self) -> bool:
+        return all(backend.supports_batching for backend in self.backends.values())
+
+    @property
+    def params(self) -> Dict[str, Any]:
+        return next(iter(self.backends.values())).params
+
+    async def rewrite(self, text: str, style: StyleEnum) -> str:
+        """Rewrite text on the best backend, hedging on the next best one if it is slow."""
+        ranked = self._ranked()
+        self._hedge_budget = min(self._hedge_budget + self.max_hedge_rate, self.max_hedge_burst)
+
+        start = time.monotonic()
+        primary = asyncio.create_task(self._call(ranked[0], text, style))
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=self._hedge_delay(ranked[0]))
+        except asyncio.CancelledError:
+            primary.cancel()
+            raise
+        if done and primary.exception() is None:
+            return primary.result()
+
+        # The primary is slow, or failed fast, so try the next best backend too
+        if len(ranked) < 2:
+            return await primary
+        if self._hedge_budget < 1:
+            HEDGES_SKIPPED.inc()
+            return await primary
+
+        self._hedge_budget -= 1
+        logger.debug("Backend %s is slow or failed, hedging on %s", ranked[0], ranked[1])
+        hedge_start = time.monotonic()
+        hedge = asyncio.create_task(self._call(ranked[1], text, style))
+        return await self._first_success(
+            {primary: ("primary", ranked[0], start), hedge: ("hedge", ranked[1], hedge_start)}
+        )
+
+    async def rewrite_stream(self, text: str, style: StyleEnum) -> AsyncIterator[str]:
+        """Stream the rewrite from the best backend."""
+        async for chunk in self.backends[self._ranked()[0]].rewrite_stream(text, style):
+            yield chunk
+
+    async def rewrite_many(self, texts: List[str], style: StyleEnum) -> List[str]:
+        """Rewrite several texts on the best backend."""
+        return await self.backends[self._ranked()[0]].rewrite_many(texts, style)
+
+    async def start(self) -> None:
+        await asyncio.gather(*(backend.start() for backend in self.backends.values()))
+
+    async def close(self) -> None:
+        await asyncio.gather(*(backend.close() for backend in self.backends.values()))
+
+    def _ranked(self) -> List[str]:
+        # Sorting is stable, so ties keep the configured order
+        return sorted(self.backends, key=lambda name: self.stats[name].score())
+
+    def _hedge_delay(self, name: str) -> float:
+        stats = self.stats[name]
+        if stats.samples < self.min_samples:
+            return self.default_hedge_delay
+        return stats.quantile(self.hedge_quantile)
+
+    async def _call(self, name: str, text: str, style: StyleEnum) -> str:
+        start = time.monotonic()
+        try:
+            result = await self.backends[name].rewrite(text, style)
+        except asyncio.CancelledError:
+            # Losers of a hedge are recorded by _first_success
+            raise
+        except Exception:
+            self.stats[name].record_failure()
+            raise
+        self.stats[name].record_success(time.monotonic() - start)
+        return result
+
+    async def _first_success(self, calls: Dict[asyncio.Task, Tuple[str, str, float]]) -> str:
+        """Wait for the first call to succeed and cancel the others, or raise the primary's error.
+
+        `calls` maps each call to its role, backend and start time. A loser
+        cancelled past its backend's hedge delay is recorded with the time it
+        ran, a lower bound of its latency, so slow tails keep counting
+        towards the backend's hedge delay and ranking.
+        """
+        pending = set(calls)
+        errors: List[Tuple[str, BaseException]] = []
+        won = False
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        won = True
+                        HEDGED_REQUESTS.labels(winner=calls[task][0]).inc()
+                        return task.result()
+                    errors.append((calls[task][0], task.exception()))
+        finally:
+            for task in pending:
+                task.cancel()
+                _, name, start = calls[task]
+                elapsed = time.monotonic() - start
+                # A loser cancelled early, or with the whole request, says little about its backend
+                if won and elapsed >= self._hedge_delay(name):
+                    self.stats[name].record_censored(elapsed)
+
+        HEDGED_REQUESTS.labels(winner="none").inc()
+        errors.sort(key=lambda error: error[0] != "primary")
+        raise errors[0][1]
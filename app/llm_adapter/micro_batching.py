@@ -0,0 +1,135 @@
+import asyncio
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, List, Optional, Set
+
+from app.config.logging import setup_logger
+from app.exception.custom_exceptions import LLMBatchParseError
+from app.metrics.prometheus_metrics import (
+    LLM_BATCH_FALLBACKS,
+    LLM_BATCH_SIZE,
+    LLM_CALLS_SAVED,
+)
+from app.model.models import StyleEnum
+
+from .base import LLMAdapter
+
+logger = setup_logger(__name__)
+
+
+@dataclass
+class _Batch:
+    texts: List[str] = field(default_factory=list)
+    futures: List[asyncio.Future] = field(default_factory=list)
+    tokens: int = 0
+    timer: Optional[asyncio.TimerHandle] = None
+
+
+class MicroBatchingAdapter(LLMAdapter):
+    """Pack concurrent rewrites of the same style into a single LLM call.
+
+    A rewrite waits up to `max_wait` seconds for other rewrites of its style,
+    and the batch is sent early once it holds `max_batch_size` texts or about
+    `max_batch_tokens` tokens. The wrapped adapter's `rewrite_many` answers
+    the whole batch, and if its output cannot be split back into one rewrite
+    per text, each text is rewritten with its own call instead. Streaming
+    rewrites are passed through unbatched. Calls are only counted as saved
+    if the wrapped adapter `supports_batching`.
+    """
+
+    def __init__(
+        self,
+        adapter: LLMAdapter,
+        max_batch_size: int = 8,
+        max_wait: float = 0.01,
+        max_batch_tokens: int = 2000,
+    ):
+        self.adapter = adapter
+        self.name = adapter.name
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.max_batch_tokens = max_batch_tokens
+        self._pending: Dict[StyleEnum, _Batch] = {}
+        # Keep a reference to the sending tasks, so they are not garbage collected
+        self._sending: Set[asyncio.Task] = set()
+
+    @property
+    def params(self) -> Dict[str, Any]:
+        return self.adapter.params
+
+    async def rewrite(self, text: str, style: StyleEnum) -> str:
+        """Rewrite text as part of the next batch of its style."""
+        tokens = len(text) // 4 + 1
+        batch = self._pending.get(style)
+        if batch is not None and batch.tokens + tokens > self.max_batch_tokens:
+            self._dispatch(style)
+            batch = None
+
+        loop = asyncio.get_running_loop()
+        if batch is None:
+            batch = self._pending[style] = _Batch()
+            batch.timer = loop.call_later(self.max_wait, self._dispatch, style)
+
+        future = loop.create_future()
+        batch.texts.append(text)
+        batch.futures.append(future)
+        batch.tokens += tokens
+        if len(batch.texts) >= self.max_batch_size:
+            self._dispatch(style)
+
+        return await future
+
+    async def rewrite_stream(self, text: str, style: StyleEnum) -> AsyncIterator[str]:
+        """Stream the rewrite from the wrapped adapter, without batching."""
+        async for chunk in self.adapter.rewrite_stream(text, style):
+            yield chunk
+
+    async def start(self) -> None:
+        await self.adapter.start()
+
+    async def close(self) -> None:
+        await self.adapter.close()
+
+    def _dispatch(self, style: StyleEnum) -> None:
+        batch = self._pending.pop(style, None)
+        if batch is None:
+            return
+        batch.timer.cancel()
+        task = asyncio.create_task(self._send(style, batch))
+        self._sending.add(task)
+        task.add_done_callback(self._sending.discard)
+
+    async def _send(self, style: StyleEnum, batch: _Batch) -> None:
+        texts = batch.texts
+        LLM_BATCH_SIZE.labels(adapter=self.name).observe(len(texts))
+        try:
+            if len(texts) == 1:
+                results = [await self.adapter.rewrite(texts[0], style)]
+            else:
+                results = await self._rewrite_many(texts, style)
+        except Exception as e:
+            results = [e] * len(texts)
+
+        for future, result in zip(batch.futures, results):
+            # The caller may have been cancelled while the batch was in flight
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    async def _rewrite_many(self, texts: List[str], style: StyleEnum) -> list:
+        try:
+            results = await self.adapter.rewrite_many(texts, style)
+        except LLMBatchParseError as e:
+            logger.warning(
+                "Falling back to individual calls for a batch of %d texts: %s", len(texts), e.detail
+            )
+            LLM_BATCH_FALLBACKS.labels(adapter=self.name).inc()
+            return await asyncio.gather(
+                *(self.adapter.rewrite(text, style) for text in texts),
+                return_exceptions=True,
+            )
+        if self.adapter.supports_batching:
+            LLM_CALLS_SAVED.labels(adapter=self.name).inc(len(texts) - 1)
+        return results
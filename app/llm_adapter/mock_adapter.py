@@ -1,3 +1,6 @@
+import re
+from typing import AsyncIterator
+
 from app.model.models import StyleEnum
 
 from .base import LLMAdapter
@@ -6,6 +9,8 @@ from .base import LLMAdapter
 class MockLLMAdapter(LLMAdapter):
     """Mock LLM adapter for testing and when no API key is available."""
 
+    name = "mock"
+
     async def rewrite(self, text: str, style: StyleEnum) -> str:
         """Mock rewrite implementation that wraps text with style indicators."""
         if style == StyleEnum.PIRATE:
@@ -14,3 +19,8 @@ class MockLLMAdapter(LLMAdapter):
             return f"[*haiku*] {text} [*haiku*]"
         elif style == StyleEnum.FORMAL:
             return f"[*formal*] {text} [*formal*]"
+
+    async def rewrite_stream(self, text: str, style: StyleEnum) -> AsyncIterator[str]:
+        """Mock streaming implementation that yields the mock rewrite word by word."""
+        for chunk in re.findall(r"\S+\s*", await self.rewrite(text, style)):
+            yield chunk
@@ -1,15 +1,27 @@
 import asyncio
-from typing import Dict, Optional
+import importlib.util
+import json
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional
 from dataclasses import dataclass
 
+import httpx
 import openai
 from openai import RateLimitError, APIError, APITimeoutError, APIConnectionError
 
 from app.config.logging import setup_logger
 from app.model.models import StyleEnum
-from app.exception.custom_exceptions import LLMError, LLMRateLimitError, LLMTimeoutError
+from app.exception.custom_exceptions import (
+    LLMBatchParseError,
+    LLMError,
+    LLMRateLimitError,
+    LLMTimeoutError,
+)
+from app.metrics.prometheus_metrics import LLM_RATE_LIMIT_ERRORS, LLM_RETRIES, LLM_TIMEOUTS
+from app.metrics.tracing import span
 
 from .base import LLMAdapter
+from .rate_limiter import AdaptiveRateLimiter, jittered, retry_after
 
 logger = setup_logger(__name__)
 
@@ -22,14 +34,43 @@ class OpenAIConfig:
     max_retries: int = 3
     retry_delay: float = 1.0
     system_prompt: str = "You are a helpful writing assistant that rewrites text in different styles."
+    requests_per_minute: int = 500
+    tokens_per_minute: int = 200000
+    max_rate_limit_wait: float = 30.0
+    # OpenAI-compatible API to call instead of OpenAI, e.g. a local stand-in for load tests
+    base_url: Optional[str] = None
+    timeout: float = 60.0
+    # Connection pool of the HTTP client. Keeping idle connections alive for longer
+    # than httpx's 5 seconds spares requests after a lull a new TLS handshake
+    connect_timeout: float = 5.0
+    max_connections: int = 100
+    max_keepalive_connections: int = 100
+    keepalive_expiry: float = 60.0
+    http2: bool = False
+    # Connections opened at startup, so the first requests don't pay for the handshakes
+    warmup_connections: int = 0
 
 class OpenAIAdapter(LLMAdapter):
     """OpenAI LLM adapter using the OpenAI API."""
 
-    def __init__(self, api_key: str, config: Optional[OpenAIConfig] = None):
+    name = "openai"
+    supports_batching = True
+
+    def __init__(
+        self,
+        api_key: str,
+        config: Optional[OpenAIConfig] = None,
+        rate_limiter: Optional[AdaptiveRateLimiter] = None,
+    ):
         """Initialize the OpenAI adapter."""
-        self.client = openai.AsyncOpenAI(api_key=api_key)
         self.config = config or OpenAIConfig()
+        self._api_key = api_key
+        self.client = self._create_client()
+        self.rate_limiter = rate_limiter or AdaptiveRateLimiter(
+            requests_per_minute=self.config.requests_per_minute,
+            tokens_per_minute=self.config.tokens_per_minute,
+            max_wait=self.config.max_rate_limit_wait,
+        )
 
         self.style_prompts: Dict[StyleEnum, str] = {
             StyleEnum.PIRATE: "Rewrite the following text in pirate speak with 'arrr', 'matey', etc.:",
@@ -37,38 +78,187 @@ class OpenAIAdapter(LLMAdapter):
             StyleEnum.FORMAL: "Rewrite the following text in a formal, professional tone:",
         }
 
+    @property
+    def params(self) -> Dict[str, Any]:
+        return {
+            "model": self.config.model,
+            "max_tokens": self.config.max_tokens,
+            "temperature": self.config.temperature,
+        }
+
+    async def start(self) -> None:
+        """Open `warmup_connections` connections to the API ahead of the first requests."""
+        if self.client.is_closed():
+            # Closed by an earlier shutdown of the app, e.g. between tests
+            self.client = self._create_client()
+        count = self.config.warmup_connections
+        if count <= 0:
+            return
+        start = time.perf_counter()
+        # Concurrent requests each need their own connection, which then stays in the
+        # pool. Any response will do, only connection errors count as failures
+        url = f"{self.client.base_url}models"
+        headers = {"Authorization": f"Bearer {self._api_key}"}
+        results = await asyncio.gather(
+            *(self._http_client.get(url, headers=headers) for _ in range(count)),
+            return_exceptions=True,
+        )
+        failures = [result for result in results if isinstance(result, Exception)]
+        if failures:
+            # A cold pool only slows the first requests down, it must not keep the service from starting
+            logger.warning("Failed to warm %d of %d connections: %s", len(failures), count, failures[0])
+        logger.info(
+            "Warmed %d connections to %s in %.2fs",
+            count - len(failures), self.client.base_url, time.perf_counter() - start,
+        )
+
+    async def close(self) -> None:
+        """Close the connections of the HTTP client."""
+        await self.client.close()
+
     async def rewrite(self, text: str, style: StyleEnum) -> str:
         """Rewrite text using OpenAI's API with retries and error handling."""
+        response = await self._create_completion(self._messages(style, text))
+        return response.choices[0].message.content.strip()
+
+    async def rewrite_many(self, texts: List[str], style: StyleEnum) -> List[str]:
+        """Rewrite several texts with a single completion, passing them in and out as JSON.
+
+        Raises LLMBatchParseError if the completion does not hold exactly one
+        rewrite per text.
+        """
+        content = (
+            "The texts are given as a JSON array. Rewrite each of them separately and answer "
+            'with a JSON object of the form {"rewrites": [...]}, holding exactly one rewrite '
+            "per text, in the same order.\n\n" + json.dumps(texts, ensure_ascii=False)
+        )
+        response = await self._create_completion(
+            self._messages(style, content),
+            max_tokens=self.config.max_tokens * len(texts),
+            response_format={"type": "json_object"},
+        )
+        choice = response.choices[0]
+        if choice.finish_reason == "length":
+            raise LLMBatchParseError("Batched completion was cut off")
+        try:
+            rewrites = json.loads(choice.message.content)["rewrites"]
+        except (TypeError, ValueError, KeyError) as e:
+            raise LLMBatchParseError(f"Batched completion is not valid JSON: {str(e)}") from e
+        if (
+            not isinstance(rewrites, list)
+            or len(rewrites) != len(texts)
+            or not all(isinstance(rewrite, str) for rewrite in rewrites)
+        ):
+            raise LLMBatchParseError(
+                f"Batched completion does not hold {len(texts)} rewrites"
+            )
+        return [rewrite.strip() for rewrite in rewrites]
+
+    async def rewrite_stream(self, text: str, style: StyleEnum) -> AsyncIterator[str]:
+        """Rewrite text using OpenAI's streaming API, yielding content deltas.
+
+        Retries only apply until the stream is opened. An error after the first
+        chunk has been yielded is raised to the caller, as the partial output
+        cannot be taken back.
+        """
+        stream = await self._create_completion(self._messages(style, text), stream=True)
+
+        first = True
+        try:
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                content = chunk.choices[0].delta.content
+                if first and content:
+                    content = content.lstrip()
+                if content:
+                    first = False
+                    yield content
+        except APIError as e:
+            logger.error("OpenAI API error while streaming", exc_info=True)
+            raise LLMError(f"OpenAI API error: {str(e)}") from e
+
+    def _create_client(self) -> openai.AsyncOpenAI:
+        http2 = self.config.http2
+        if http2 and importlib.util.find_spec("h2") is None:
+            logger.warning("HTTP/2 needs the h2 package (pip install 'httpx[http2]'), using HTTP/1.1")
+            http2 = False
+        self._http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=self.config.max_connections,
+                max_keepalive_connections=self.config.max_keepalive_connections,
+                keepalive_expiry=self.config.keepalive_expiry,
+            ),
+            timeout=httpx.Timeout(self.config.timeout, connect=self.config.connect_timeout),
+            http2=http2,
+            follow_redirects=True,
+        )
+        # The client's timeout applies to the API calls too
+        return openai.AsyncOpenAI(
+            api_key=self._api_key, base_url=self.config.base_url, http_client=self._http_client
+        )
+
+    def _messages(self, style: StyleEnum, content: str) -> list:
+        """Chat messages asking to rewrite `content` in the specified style."""
+        prompt = self.style_prompts.get(style)
+        return [
+            {
+                "role": "system",
+                "content": self.config.system_prompt,
+            },
+            {"role": "user", "content": f"{prompt}\n\n{content}"},
+        ]
+
+    async def _create_completion(
+        self,
+        messages: list,
+        stream: bool = False,
+        max_tokens: Optional[int] = None,
+        response_format: Optional[dict] = None,
+    ):
+        """Create a chat completion with retries and error handling."""
 
         retry_count = 0
+        max_tokens = max_tokens or self.config.max_tokens
+        extra_args = {"response_format": response_format} if response_format else {}
+        estimated_tokens = self._estimate_tokens(messages, max_tokens)
 
         while retry_count < self.config.max_retries:
+            # Queue here rather than send a request the API would reject
+            with span("llm_rate_limit"):
+                await self.rate_limiter.acquire(estimated_tokens)
             try:
+                with span("llm_request"):
+                    raw_response = await self.client.chat.completions.with_raw_response.create(
+                        model=self.config.model,
+                        messages=messages,
+                        max_tokens=max_tokens,
+                        temperature=self.config.temperature,
+                        stream=stream,
+                        **extra_args,
+                    )
+                self.rate_limiter.update_from_headers(raw_response.headers)
+                response = raw_response.parse()
 
-                prompt = self.style_prompts.get(style)
-
-                response = await self.client.chat.completions.create(
-                    model=self.config.model,
-                    messages=[
-                        {
-                            "role": "system",
-                            "content": self.config.system_prompt,
-                        },
-                        {"role": "user", "content": f"{prompt}\n\n{text}"},
-                    ],
-                    max_tokens=self.config.max_tokens,
-                    temperature=self.config.temperature,
-                )
-
-                return response.choices[0].message.content.strip()
+                if not stream and response.usage:
+                    self.rate_limiter.release_tokens(
+                        estimated_tokens, response.usage.total_tokens
+                    )
+                return response
 
             except RateLimitError as e:
+                LLM_RATE_LIMIT_ERRORS.labels(adapter=self.name).inc()
                 retry_count += 1
+                delay = retry_after(e.response.headers)
+                if delay is not None:
+                    # Hold back every caller, not only this one
+                    self.rate_limiter.block_for(delay)
                 if retry_count >= self.config.max_retries:
                     logger.error("Rate limit exceeded after retries", exc_info=True)
                     raise LLMRateLimitError("OpenAI rate limit exceeded") from e
-                await self._wait_with_backoff(retry_count)
+                await self._wait_with_backoff(retry_count, delay)
             except (APITimeoutError, APIConnectionError) as e:
+                LLM_TIMEOUTS.labels(adapter=self.name).inc()
                 retry_count += 1
                 if retry_count >= self.config.max_retries:
                     logger.error("API timeout/connection error after retries", exc_info=True)
@@ -81,8 +271,21 @@ class OpenAIAdapter(LLMAdapter):
                 logger.error("Unexpected error in OpenAI adapter", exc_info=True)
                 raise LLMError(f"Unexpected error: {str(e)}") from e
 
-    async def _wait_with_backoff(self, retry_count: int) -> None:
-        """Wait with exponential backoff between retries."""
-        delay = self.config.retry_delay * (2 ** (retry_count - 1))
-        logger.info(f"Retrying in {delay} seconds... (attempt {retry_count + 1})")
-        await asyncio.sleep(delay)
+    def _estimate_tokens(self, messages: list, max_tokens: int) -> int:
+        """Upper bound of the tokens a request will use, for the rate limiter."""
+        # Roughly 4 characters per token for the prompt, plus the full completion budget
+        prompt_chars = sum(len(message["content"]) for message in messages)
+        return prompt_chars // 4 + max_tokens
+
+    async def _wait_with_backoff(self, retry_count: int, delay: Optional[float] = None) -> None:
+        """Wait with jittered exponential backoff between retries.
+
+        A delay requested by the server via Retry-After takes precedence.
+        """
+        if delay is None:
+            delay = self.config.retry_delay * (2 ** (retry_count - 1))
+        delay = jittered(delay)
+        logger.info("Retrying in %.2f seconds... (attempt %d)", delay, retry_count + 1)
+        LLM_RETRIES.labels(adapter=self.name).inc()
+        with span("llm_backoff"):
+            await asyncio.sleep(delay)
@@ -0,0 +1,246 @@
+import asyncio
+import heapq
+import itertools
+import random
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Mapping, Optional, Tuple
+
+from app.cache.base import Cache
+from app.config.logging import setup_logger
+from app.exception.custom_exceptions import LLMRateLimitError
+from app.metrics.prometheus_metrics import RATE_LIMITER_WAIT
+
+logger = setup_logger(__name__)
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+# Priority of the LLM calls made by the current task, lower values are served
+# first. Tasks copy the context, so hedged or batched calls keep their caller's
+_call_priority: ContextVar[int] = ContextVar("llm_call_priority", default=0)
+
+
+@contextmanager
+def call_priority(priority: int) -> Iterator[None]:
+    """Queue the LLM calls made within the block at `priority` in the rate limiters."""
+    previous = _call_priority.get()
+    _call_priority.set(priority)
+    try:
+        yield
+    finally:
+        # Not reset with a token, as a streamed rewrite may end in another context
+        _call_priority.set(previous)
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Parse a rate limit reset duration such as `1s`, `6m0s` or `20ms` into seconds."""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at a per-minute rate."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.tokens = float(per_minute)
+        self._updated = time.monotonic()
+
+    @property
+    def rate(self) -> float:
+        """Refill rate in tokens per second."""
+        return self.capacity / 60.0
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` tokens are available."""
+        self._refill()
+        # A request larger than the bucket only needs to wait for a full bucket
+        missing = min(amount, self.capacity) - self.tokens
+        return max(missing / self.rate, 0.0)
+
+    def consume(self, amount: float) -> None:
+        """Take `amount` tokens from the bucket, going negative if needed."""
+        self._refill()
+        self.tokens -= amount
+
+    def update(self, limit: Optional[float] = None, remaining: Optional[float] = None) -> None:
+        """Adjust the bucket to the limit and remaining budget reported by the server."""
+        self._refill()
+        if limit:
+            self.capacity = limit
+            self.tokens = min(self.tokens, limit)
+        if remaining is not None:
+            self.tokens = min(self.tokens, remaining)
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+
+class SharedRateBudget:
+    """Per-minute request and token budget shared between workers through a cache.
+
+    Each worker increments counters for the current minute window in the
+    shared cache and waits for the next window once the budget is exhausted.
+    Rejected reservations are rolled back, so only admitted calls count.
+    """
+
+    def __init__(
+        self,
+        cache: Cache,
+        requests_per_minute: int,
+        tokens_per_minute: int,
+        key_prefix: str = "ratelimit",
+    ):
+        self.cache = cache
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.key_prefix = key_prefix
+
+    async def wait_time(self, tokens: int) -> float:
+        """Reserve budget in the current window, returning 0 or the seconds to wait."""
+        now = time.time()
+        window = int(now // 60)
+        requests_key = f"{self.key_prefix}:requests:{window}"
+        tokens_key = f"{self.key_prefix}:tokens:{window}"
+        requests_used = await self.cache.incr(requests_key, 1, ttl=120)
+        tokens_used = await self.cache.incr(tokens_key, tokens, ttl=120)
+        if requests_used <= self.requests_per_minute and tokens_used <= self.tokens_per_minute:
+            return 0.0
+        # Give back the reservation, so callers waiting for the next window don't use up its budget
+        await self.cache.incr(requests_key, -1, ttl=120)
+        await self.cache.incr(tokens_key, -tokens, ttl=120)
+        return (window + 1) * 60 - now
+
+
+class AdaptiveRateLimiter:
+    """Client-side limiter for requests/min and tokens/min of an LLM API.
+
+    Callers queue until both buckets have room for their request, by the
+    priority set with `call_priority` and then in arrival order, so
+    interactive calls overtake queued background work. The limits start from
+    the configured values and are corrected from the `x-ratelimit-*` headers
+    of every response, and a `Retry-After` from the server pauses all callers
+    at once instead of letting each of them find out with its own failed
+    request.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: int = 500,
+        tokens_per_minute: int = 200000,
+        max_wait: float = 30.0,
+        shared_budget: Optional[SharedRateBudget] = None,
+    ):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_wait = max_wait
+        self.shared_budget = shared_budget
+        self._blocked_until = 0.0
+        # Heap of (priority, arrival order) of the waiting callers, the first one is served next
+        self._waiters: List[Tuple[int, int]] = []
+        self._arrivals = itertools.count()
+        self._changed = asyncio.Condition()
+
+    async def acquire(self, tokens: int) -> None:
+        """Wait until a request using `tokens` tokens may be sent.
+
+        Raises LLMRateLimitError if the wait would exceed `max_wait`, since the
+        request would most likely fail anyway.
+        """
+        start = time.monotonic()
+        entry = (_call_priority.get(), next(self._arrivals))
+        async with self._changed:
+            heapq.heappush(self._waiters, entry)
+            # The caller being served may have to give way
+            self._changed.notify_all()
+            try:
+                while True:
+                    if self._waiters[0] == entry:
+                        wait = self._wait_time(tokens)
+                        if wait <= 0 and self.shared_budget is not None:
+                            wait = await self.shared_budget.wait_time(tokens)
+                        if wait <= 0:
+                            break
+                        if time.monotonic() + wait - start > self.max_wait:
+                            raise LLMRateLimitError(
+                                f"Rate limit budget exhausted, next slot in {wait:.1f} seconds"
+                            )
+                        logger.debug("Rate limiter queueing request for %.2f seconds", wait)
+                    else:
+                        # Wait for the callers ahead, for as long as the caller may wait at all
+                        wait = start + self.max_wait - time.monotonic()
+                        if wait <= 0:
+                            raise LLMRateLimitError("Rate limit budget exhausted, too many queued requests")
+                    try:
+                        await asyncio.wait_for(self._changed.wait(), wait)
+                    except asyncio.TimeoutError:
+                        pass
+
+                self.requests.consume(1)
+                self.tokens.consume(tokens)
+            finally:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._changed.notify_all()
+        RATE_LIMITER_WAIT.observe(time.monotonic() - start)
+
+    def release_tokens(self, estimated: int, used: int) -> None:
+        """Correct the token bucket once the actual token usage is known."""
+        self.tokens.consume(used - estimated)
+
+    def block_for(self, seconds: float) -> None:
+        """Pause all callers for `seconds`, e.g. as requested by a Retry-After header."""
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+    def update_from_headers(self, headers: Mapping[str, str]) -> None:
+        """Learn the current limits and remaining budget from response headers."""
+        self.requests.update(
+            limit=_optional_float(headers.get("x-ratelimit-limit-requests")),
+            remaining=_optional_float(headers.get("x-ratelimit-remaining-requests")),
+        )
+        self.tokens.update(
+            limit=_optional_float(headers.get("x-ratelimit-limit-tokens")),
+            remaining=_optional_float(headers.get("x-ratelimit-remaining-tokens")),
+        )
+
+    def _wait_time(self, tokens: int) -> float:
+        return max(
+            self._blocked_until - time.monotonic(),
+            self.requests.wait_time(1),
+            self.tokens.wait_time(tokens),
+        )
+
+
+def retry_after(headers: Optional[Mapping[str, str]]) -> Optional[float]:
+    """Seconds to wait before retrying, as requested by the server."""
+    if not headers:
+        return None
+    retry_after_ms = _optional_float(headers.get("retry-after-ms"))
+    if retry_after_ms is not None:
+        return retry_after_ms / 1000
+    return parse_duration(headers.get("retry-after"))
+
+
+def jittered(delay: float) -> float:
+    """Stretch a retry delay by a random factor so concurrent callers don't retry in lockstep."""
+    return delay * random.uniform(1.0, 1.5)
+
+
+def _optional_float(value: Optional[str]) -> Optional[float]:
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
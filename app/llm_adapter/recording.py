@@ -0,0 +1,215 @@
+import asyncio
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from app.config.logging import setup_logger
+from app.exception.custom_exceptions import LLMError
+from app.model.models import StyleEnum
+
+from .base import LLMAdapter
+
+logger = setup_logger(__name__)
+
+# Records are `<key>\t<json>\n` lines, with a fixed-size hex key so the index
+# can be built without parsing the JSON. Each recording run starts with a
+# `#params\t<json>\n` line holding the model parameters its keys are derived from
+_KEY_LENGTH = 32
+_PARAMS_PREFIX = b"#params\t"
+
+
+def trace_key(text: str, style: StyleEnum, params: Dict[str, Any]) -> str:
+    """Key of a recorded response, derived from everything that affects the output."""
+    style = style.value if isinstance(style, StyleEnum) else str(style)
+    payload = json.dumps([style, params, text], sort_keys=True, ensure_ascii=False)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=_KEY_LENGTH // 2).hexdigest()
+
+
+def _ends_with_newline(path: str) -> bool:
+    with open(path, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+
+class RecordingAdapter(LLMAdapter):
+    """Record every rewrite of the wrapped adapter, with its latency, to a trace file.
+
+    The trace is an append-only file of one line per response, so it can be
+    recorded by several runs in a row and replayed with ReplayAdapter. Each
+    run first records the wrapped adapter's `params`, so a replay does not
+    need the adapter to derive the keys. Failed calls are not recorded.
+
+    Records are written by a background thread, so disk latency never blocks
+    the event loop, and `close` waits for the queued records to be written.
+    """
+
+    def __init__(self, adapter: LLMAdapter, path: str):
+        self.adapter = adapter
+        self.name = adapter.name
+        self.path = path
+        # Line buffered, so every record reaches the file as a whole
+        self._file = open(path, "a", encoding="utf-8", buffering=1)
+        if self._file.tell() > 0 and not _ends_with_newline(path):
+            # Terminate a record cut short by an earlier crash, so it can't corrupt the next one
+            self._file.write("\n")
+        params = json.dumps(self.params, sort_keys=True, ensure_ascii=False)
+        self._file.write(f"{_PARAMS_PREFIX.decode()}{params}\n")
+        # Lines to write, ended by None
+        self._lines: queue.SimpleQueue = queue.SimpleQueue()
+        self._writer = threading.Thread(target=self._write_lines, name="trace-writer", daemon=True)
+        self._writer.start()
+
+    @property
+    def params(self) -> Dict[str, Any]:
+        return self.adapter.params
+
+    async def rewrite(self, text: str, style: StyleEnum) -> str:
+        """Rewrite text with the wrapped adapter and record the response."""
+        start = time.perf_counter()
+        rewritten_text = await self.adapter.rewrite(text, style)
+        self._record(text, style, rewritten_text, time.perf_counter() - start)
+        return rewritten_text
+
+    async def rewrite_stream(self, text: str, style: StyleEnum) -> AsyncIterator[str]:
+        """Stream the rewrite from the wrapped adapter, recording it once complete."""
+        start = time.perf_counter()
+        chunks = []
+        async for chunk in self.adapter.rewrite_stream(text, style):
+            chunks.append(chunk)
+            yield chunk
+        self._record(text, style, "".join(chunks).strip(), time.perf_counter() - start)
+
+    async def start(self) -> None:
+        await self.adapter.start()
+
+    async def close(self) -> None:
+        self._lines.put(None)
+        await asyncio.to_thread(self._writer.join)
+        self._file.close()
+        await self.adapter.close()
+
+    def _record(self, text: str, style: StyleEnum, response: str, latency: float) -> None:
+        record = {
+            "style": style.value if isinstance(style, StyleEnum) else str(style),
+            "text": text,
+            "response": response,
+            "latency": round(latency, 4),
+        }
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+        self._lines.put(f"{trace_key(text, style, self.params)}\t{line}\n")
+
+    def _write_lines(self) -> None:
+        # Runs on the writer thread
+        for line in iter(self._lines.get, None):
+            self._file.write(line)
+
+
+class ReplayAdapter(LLMAdapter):
+    """Serve rewrites from a trace file written by RecordingAdapter.
+
+    Each response is returned after its recorded latency multiplied by
+    `latency_scale`, so a replay reproduces the timing of the recorded calls
+    (or a faster or slower LLM) without calling it. Opening the trace builds
+    an index from key to file offset in a single pass, and each lookup then
+    reads only its own record, however large the trace is.
+
+    A text that was not recorded is rewritten by `fallback` if one is given,
+    and raises LLMError otherwise. Responses are looked up for `params` if
+    given, which must then match the model parameters the trace was recorded
+    with, and otherwise for the parameters recorded in the trace, latest
+    first.
+    """
+
+    name = "replay"
+
+    def __init__(
+        self,
+        path: str,
+        params: Optional[Dict[str, Any]] = None,
+        latency_scale: float = 1.0,
+        fallback: Optional[LLMAdapter] = None,
+    ):
+        self.path = path
+        self.latency_scale = latency_scale
+        self.fallback = fallback
+        self._fd = os.open(path, os.O_RDONLY)
+        # Parameters of the recording runs, in the order they were recorded
+        self._recorded_params: List[Dict[str, Any]] = []
+        self._index = self._build_index()
+        if params is not None:
+            self._lookup_params = [params]
+        else:
+            self._lookup_params = list(reversed(self._recorded_params)) or [{}]
+
+    @property
+    def params(self) -> Dict[str, Any]:
+        return self._lookup_params[0]
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    async def rewrite(self, text: str, style: StyleEnum) -> str:
+        """Return the recorded rewrite after its recorded latency."""
+        record = None
+        for params in self._lookup_params:
+            record = self._lookup(trace_key(text, style, params))
+            if record is not None:
+                break
+        if record is None:
+            if self.fallback is not None:
+                return await self.fallback.rewrite(text, style)
+            raise LLMError("No recorded response for this text and style")
+
+        delay = record["latency"] * self.latency_scale
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return record["response"]
+
+    async def start(self) -> None:
+        if self.fallback is not None:
+            await self.fallback.start()
+
+    async def close(self) -> None:
+        os.close(self._fd)
+        if self.fallback is not None:
+            await self.fallback.close()
+
+    def _build_index(self) -> Dict[bytes, Tuple[int, int]]:
+        start = time.perf_counter()
+        index: Dict[bytes, Tuple[int, int]] = {}
+        offset = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                # Skip a partially written last line
+                if not line.endswith(b"\n"):
+                    pass
+                elif line.startswith(_PARAMS_PREFIX):
+                    params = json.loads(line[len(_PARAMS_PREFIX) :])
+                    if params in self._recorded_params:
+                        self._recorded_params.remove(params)
+                    self._recorded_params.append(params)
+                else:
+                    # Later records of the same key win
+                    index[line[:_KEY_LENGTH]] = (offset, len(line))
+                offset += len(line)
+        logger.info(
+            f"Indexed {len(index)} recorded responses from {self.path} "
+            f"in {time.perf_counter() - start:.2f}s"
+        )
+        return index
+
+    def _lookup(self, key: str) -> Optional[dict]:
+        location = self._index.get(key.encode("ascii"))
+        if location is None:
+            return None
+        offset, length = location
+        line = os.pread(self._fd, length, offset)
+        try:
+            return json.loads(line[_KEY_LENGTH + 1 :])
+        except ValueError:
+            logger.warning("Skipping corrupt recorded response at offset %d of %s", offset, self.path)
+            return None
@@ -1,22 +1,138 @@
+import asyncio
+import json
 import os
+import secrets
+from contextlib import asynccontextmanager
+from typing import Optional
 
-from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import JSONResponse, PlainTextResponse
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 
 from app.cache import get_cache
-from app.config.logging import setup_logger
-from app.exception.custom_exceptions import ValidationError
+from app.cache.snapshot import export_snapshot, load_snapshot
+from app.config.logging import RequestLoggingMiddleware, setup_logger
+from app.exception.custom_exceptions import (
+    JobNotFoundError,
+    LoadSheddingError,
+    ValidationError,
+)
 from app.llm_adapter import get_llm_adapter
-from app.metrics.prometheus_metrics import get_metrics
-from app.model.models import HealthResponse, RewriteRequest, RewriteResponse
+from app.metrics.profiler import sample_stacks
+from app.metrics.prometheus_metrics import (
+    REQUEST_LATENCY,
+    REQUESTS_IN_FLIGHT,
+    cleanup_dead_processes,
+    get_metrics,
+    mark_process_dead,
+)
+from app.metrics.tracing import ServerTimingMiddleware, record_elapsed
+from app.model.enums import StyleEnum
+from app.model.models import (
+    BatchRewriteItemResult,
+    BatchRewriteRequest,
+    BatchRewriteResponse,
+    ErrorDetail,
+    HealthResponse,
+    RewriteJobRequest,
+    RewriteJobResponse,
+    RewriteRequest,
+    RewriteResponse,
+)
+from app.model.serialization import FastJSONResponse, json_body_schema, parse_json_body
+from app.service.admission import AdmissionController, CircuitBreaker
+from app.service.job_queue import RewriteJobQueue
 from app.service.rewrite_service import RewriteService
 from app.exception.custom_exceptions import LLMRateLimitError
 
 logger = setup_logger(__name__)
 
-app = FastAPI()
 
-rewrite_service = RewriteService(get_llm_adapter(), get_cache())
+def _optional_float(value: Optional[str]) -> Optional[float]:
+    return float(value) if value else None
+
+
+rewrite_service = RewriteService(
+    get_llm_adapter(),
+    get_cache(),
+    coalesce_across_workers=os.getenv("COALESCE_ACROSS_WORKERS", "false").lower() == "true",
+    batch_concurrency=int(os.getenv("BATCH_CONCURRENCY", "10")),
+    admission=AdmissionController(
+        max_in_flight=int(os.getenv("LLM_MAX_IN_FLIGHT", "100")),
+        max_queue=int(os.getenv("LLM_MAX_QUEUE", "1000")),
+        queue_timeout=float(os.getenv("LLM_QUEUE_TIMEOUT", "10")),
+    ),
+    circuit_breaker=CircuitBreaker(
+        failure_rate_threshold=float(os.getenv("CIRCUIT_BREAKER_FAILURE_RATE", "0.5")),
+        latency_threshold=_optional_float(os.getenv("CIRCUIT_BREAKER_LATENCY_THRESHOLD")),
+        cooldown=float(os.getenv("CIRCUIT_BREAKER_COOLDOWN", "30")),
+    ),
+    soft_ttl=_optional_float(os.getenv("CACHE_SOFT_TTL")),
+    chunk_max_chars=(
+        int(os.getenv("CHUNK_MAX_CHARS", "1000"))
+        if os.getenv("CHUNKING_ENABLED", "false").lower() == "true"
+        else None
+    ),
+    unchunked_styles=[
+        StyleEnum(style.strip())
+        for style in os.getenv("CHUNKING_EXCLUDED_STYLES", "haiku").split(",")
+        if style.strip()
+    ],
+)
+
+job_queue = RewriteJobQueue(
+    rewrite_service,
+    workers=int(os.getenv("JOB_WORKERS", "4")),
+    max_queue=int(os.getenv("JOB_MAX_QUEUE", "10000")),
+    jobs_per_minute=_optional_float(os.getenv("JOB_RATE_PER_MINUTE")),
+    result_ttl=float(os.getenv("JOB_RESULT_TTL", "3600")),
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Warm the cache from a snapshot on startup and save one on shutdown, if configured.
+
+    The LLM adapter opens its connections on startup, and the rewrite job
+    workers run for the lifetime of the app. On shutdown the adapter and the
+    cache are closed. In Prometheus multiprocess mode, the live gauges of
+    crashed workers are dropped on startup and those of this worker on
+    shutdown.
+    """
+    cleanup_dead_processes()
+    await rewrite_service.llm_adapter.start()
+    snapshot_path = os.getenv("CACHE_SNAPSHOT_PATH")
+    if snapshot_path and os.path.exists(snapshot_path):
+        try:
+            await load_snapshot(rewrite_service.cache, snapshot_path)
+        except Exception:
+            # A broken snapshot must not keep the service from starting
+            logger.error("Failed to load cache snapshot from %s", snapshot_path, exc_info=True)
+
+    job_queue.start()
+    yield
+    await job_queue.stop()
+
+    if snapshot_path and os.getenv("CACHE_SNAPSHOT_ON_SHUTDOWN", "false").lower() == "true":
+        try:
+            await export_snapshot(rewrite_service.cache, snapshot_path)
+        except Exception:
+            logger.error("Failed to export cache snapshot to %s", snapshot_path, exc_info=True)
+    await rewrite_service.llm_adapter.close()
+    await rewrite_service.cache.close()
+    mark_process_dead(os.getpid())
+
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(
+    ServerTimingMiddleware,
+    header=os.getenv("SERVER_TIMING_ENABLED", "true").lower() == "true",
+    log=os.getenv("TRACE_LOG_ENABLED", "false").lower() == "true",
+)
+app.add_middleware(RequestLoggingMiddleware)
+
+# The profiling endpoint is only served to callers presenting this token
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN")
+_profiling = asyncio.Lock()
 
 
 @app.exception_handler(ValidationError)
@@ -38,25 +154,189 @@ async def health_check():
     return HealthResponse(status="ok")
 
 
-@app.post("/v1/rewrite", response_model=RewriteResponse)
-async def rewrite_text(request: RewriteRequest):
-    """Rewrite text in the specified style."""
-    try:
-        logger.info("Processing new rewrite request")
-        result = await rewrite_service.rewrite(request.text, request.style)
-        return result
-    except LLMRateLimitError as e:
-        logger.error(f"LLM Adapter Rate limit exceeded: {str(e)}")
-        raise HTTPException(
+@app.get("/debug/profile", response_class=PlainTextResponse)
+async def profile(
+    request: Request,
+    seconds: float = Query(10, gt=0, le=60),
+    interval_ms: float = Query(5, ge=1, le=1000),
+):
+    """Sample the stacks of this worker for `seconds` and return a folded flamegraph profile.
+
+    Disabled unless PROFILING_TOKEN is set, and then only served to callers
+    sending it as a bearer token. One profile runs at a time.
+    """
+    if not PROFILING_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    authorization = request.headers.get("Authorization", "")
+    if not secrets.compare_digest(authorization.encode(), f"Bearer {PROFILING_TOKEN}".encode()):
+        raise HTTPException(status_code=403, detail="Invalid profiling token")
+    if _profiling.locked():
+        raise HTTPException(status_code=409, detail="A profile is already running")
+
+    async with _profiling:
+        logger.info("Profiling for %ss", seconds)
+        # Sampling runs in a thread, so the event loop keeps serving the traffic being profiled
+        folded = await asyncio.to_thread(sample_stacks, seconds, interval_ms / 1000)
+    return PlainTextResponse(folded)
+
+
+def _rewrite_error(e: Exception) -> HTTPException:
+    """Map an error raised while rewriting to the HTTP error returned to the client."""
+    if isinstance(e, LoadSheddingError):
+        logger.warning("Rejected rewrite request: %s", e.detail)
+        return HTTPException(
+            status_code=e.status_code,
+            detail={
+                "message": "The service is currently experiencing high demand. Please try again in a few moments.",
+                "retry_after_seconds": e.retry_after,
+            },
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    if isinstance(e, LLMRateLimitError):
+        logger.error("LLM Adapter Rate limit exceeded: %s", e)
+        return HTTPException(
             status_code=429, 
             detail={
                 "message": "The service is currently experiencing high demand. Please try again in a few moments.",
                 "retry_after_seconds": 60,  
             }
         )
+    logger.error("Error processing rewrite request: %s", e)
+    return HTTPException(status_code=500, detail="Internal server error")
+
+
+def _sse_event(data: dict, event: Optional[str] = None) -> str:
+    """Format a Server-Sent Event."""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+
+@app.post(
+    "/v1/rewrite",
+    response_model=RewriteResponse,
+    response_class=FastJSONResponse,
+    openapi_extra=json_body_schema(RewriteRequest),
+)
+async def rewrite_text(http_request: Request):
+    """Rewrite text in the specified style.
+
+    The body is parsed and validated in one pass, and the response, built
+    from already validated values, is encoded as is instead of being
+    validated again against the response model.
+    """
+    request = await parse_json_body(http_request, RewriteRequest)
+    # Time spent reading and validating the request body
+    record_elapsed("parse")
+    with (
+        REQUESTS_IN_FLIGHT.labels(endpoint="rewrite").track_inprogress(),
+        REQUEST_LATENCY.labels(
+            style=request.style, adapter=rewrite_service.llm_adapter.name
+        ).time(),
+    ):
+        try:
+            logger.info("Processing new rewrite request")
+            result = await rewrite_service.rewrite(request.text, StyleEnum(request.style))
+            return FastJSONResponse(result)
+        except Exception as e:
+            raise _rewrite_error(e)
+
+
+@app.post("/v1/rewrite/stream", response_class=StreamingResponse)
+async def rewrite_text_stream(request: RewriteRequest):
+    """Rewrite text in the specified style, streaming the output as Server-Sent Events.
+
+    Each chunk is sent as a `data: {"delta": ...}` event, followed by an `event: done`
+    once the rewrite is complete, or an `event: error` if it fails midway.
+    """
+    record_elapsed("parse")
+    logger.info("Processing new streaming rewrite request")
+    chunks = rewrite_service.rewrite_stream(request.text, request.style)
+    try:
+        # Wait for the first chunk, so errors before any output get a proper status code
+        first_chunk = await anext(chunks, None)
     except Exception as e:
-        logger.error(f"Error processing rewrite request: {str(e)}")
-        raise HTTPException(status_code=500, detail="Internal server error")
+        raise _rewrite_error(e)
+
+    async def events():
+        with REQUESTS_IN_FLIGHT.labels(endpoint="stream").track_inprogress():
+            try:
+                if first_chunk is not None:
+                    yield _sse_event({"delta": first_chunk})
+                    async for chunk in chunks:
+                        yield _sse_event({"delta": chunk})
+            except Exception as e:
+                logger.error("Error while streaming rewrite: %s", e)
+                yield _sse_event({"error": {"message": "Internal server error"}}, event="error")
+                return
+            yield _sse_event({"style": request.style}, event="done")
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/v1/rewrite/batch", response_model=BatchRewriteResponse)
+async def rewrite_batch(request: BatchRewriteRequest):
+    """Rewrite several texts, returning a result or an error per item in input order."""
+    record_elapsed("parse")
+    logger.info("Processing new batch rewrite request of %d items", len(request.items))
+    with REQUESTS_IN_FLIGHT.labels(endpoint="batch").track_inprogress():
+        return await _rewrite_batch(request)
+
+
+async def _rewrite_batch(request: BatchRewriteRequest) -> BatchRewriteResponse:
+    """Validate the batch items individually and rewrite the valid ones."""
+    results: list[BatchRewriteItemResult] = [None] * len(request.items)
+    valid_indices, valid_items = [], []
+    for i, item in enumerate(request.items):
+        try:
+            valid = RewriteRequest(text=item.text, style=item.style)
+        except ValidationError as e:
+            results[i] = BatchRewriteItemResult(error=ErrorDetail(message=e.detail))
+            continue
+        valid_indices.append(i)
+        valid_items.append((valid.text, StyleEnum(valid.style)))
+
+    outcomes = await rewrite_service.rewrite_batch(valid_items)
+
+    for i, outcome in zip(valid_indices, outcomes):
+        if isinstance(outcome, (LLMRateLimitError, LoadSheddingError)):
+            logger.error("LLM Adapter Rate limit exceeded: %s", outcome)
+            results[i] = BatchRewriteItemResult(
+                error=ErrorDetail(
+                    message="The service is currently experiencing high demand. Please try again in a few moments."
+                )
+            )
+        elif isinstance(outcome, Exception):
+            logger.error("Error processing batch rewrite item: %s", outcome)
+            results[i] = BatchRewriteItemResult(
+                error=ErrorDetail(message="Internal server error")
+            )
+        else:
+            results[i] = BatchRewriteItemResult(result=outcome)
+
+    return BatchRewriteResponse(results=results)
+
+
+@app.post("/v1/rewrite/jobs", response_model=RewriteJobResponse, status_code=202)
+async def submit_rewrite_job(request: RewriteJobRequest):
+    """Queue a rewrite to run in the background, returning the job id to poll."""
+    logger.info("Queueing new rewrite job")
+    try:
+        return await job_queue.submit(request.text, StyleEnum(request.style), request.priority)
+    except LoadSheddingError as e:
+        raise _rewrite_error(e)
+
+
+@app.get("/v1/rewrite/jobs/{job_id}", response_model=RewriteJobResponse)
+async def get_rewrite_job(job_id: str):
+    """Get the state of a rewrite job, with its result once done."""
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise JobNotFoundError(job_id)
+    return job
 
 
 if __name__ == "__main__":
@@ -0,0 +1,46 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from types import FrameType
+from typing import List
+
+
+def _frame_name(frame: FrameType) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _stack(frame: FrameType) -> List[str]:
+    """Names of the frames of a stack, outermost first."""
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    names.reverse()
+    return names
+
+
+def sample_stacks(duration: float, interval: float = 0.005) -> str:
+    """Sample the stacks of every thread of the process for `duration` seconds.
+
+    Returns them in the folded format of flamegraph.pl and speedscope, one
+    `thread;outer;...;inner count` line per distinct stack. Sampling walks
+    the frames from a separate thread, so it only costs the process a short
+    pause of the GIL every `interval` seconds. The event loop thread shows
+    the coroutine that is running when it is sampled, or the selector when
+    it is idle.
+    """
+    own_id = threading.get_ident()
+    samples: Counter = Counter()
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id:
+                continue
+            stack = [names.get(thread_id, str(thread_id)), *_stack(frame)]
+            samples[";".join(name.replace(";", ":") for name in stack)] += 1
+        time.sleep(interval)
+    return "".join(f"{stack} {count}\n" for stack, count in samples.most_common())
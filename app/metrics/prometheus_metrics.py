@@ -1,6 +1,30 @@
-from prometheus_client import CollectorRegistry, Counter
+import os
+
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, multiprocess
 from prometheus_client.openmetrics.exposition import generate_latest
 
+# With several worker processes, each one writes its metric values to memory-mapped
+# files in this directory and /metrics aggregates all of them. prometheus_client
+# picks the storage when it is imported, so the variable must be set before the
+# workers start, and the directory emptied before the server starts.
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+if MULTIPROC_DIR:
+    os.makedirs(MULTIPROC_DIR, exist_ok=True)
+
+
+def _buckets(env_var: str, default: str) -> list[float]:
+    """Parse comma-separated histogram bucket boundaries from an env variable."""
+    return [float(bound) for bound in os.getenv(env_var, default).split(",")]
+
+
+LATENCY_BUCKETS = _buckets(
+    "METRICS_LATENCY_BUCKETS",
+    "0.001,0.0025,0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10,30",
+)
+SIZE_BUCKETS = _buckets(
+    "METRICS_SIZE_BUCKETS", "64,128,256,512,1024,2048,4096,8192,16384"
+)
+
 cache_registry = CollectorRegistry()
 
 CACHE_HITS = Counter(
@@ -13,6 +37,263 @@ CACHE_MISSES = Counter(
     registry=cache_registry,
 )
 
+CACHE_STALE_SERVES = Counter(
+    "rewrite_cache_stale_serves_total",
+    "Total number of cache hits served past their soft TTL while being refreshed",
+    registry=cache_registry,
+)
+
+CACHE_REFRESHES = Counter(
+    "rewrite_cache_background_refreshes_total",
+    "Total number of background refreshes of stale cache entries",
+    ["result"],
+    registry=cache_registry,
+)
+
+COALESCED_REQUESTS = Counter(
+    "rewrite_coalesced_requests_total",
+    "Total number of cache misses served by another in-flight LLM call",
+    ["scope"],
+    registry=cache_registry,
+)
+
+CACHE_ERRORS = Counter(
+    "rewrite_cache_errors_total",
+    "Total number of failed cache backend operations",
+    ["backend", "operation"],
+    registry=cache_registry,
+)
+
+CACHE_TIER_LOOKUPS = Counter(
+    "rewrite_cache_tier_lookups_total",
+    "Total number of two-tier cache lookups by the tier that served them",
+    ["result"],
+    registry=cache_registry,
+)
+
+REWRITE_CHUNKS = Histogram(
+    "rewrite_chunks_per_request",
+    "Number of chunks long texts are split into when chunked rewriting is enabled",
+    buckets=[1, 2, 4, 8, 16, 32],
+    registry=cache_registry,
+)
+
+STREAM_TIME_TO_FIRST_BYTE = Histogram(
+    "rewrite_stream_time_to_first_byte_seconds",
+    "Time from the start of a streaming rewrite until its first chunk is available",
+    ["source"],
+    buckets=LATENCY_BUCKETS,
+    registry=cache_registry,
+)
+
+REQUEST_LATENCY = Histogram(
+    "rewrite_request_duration_seconds",
+    "End-to-end latency of rewrite requests",
+    ["style", "adapter"],
+    buckets=LATENCY_BUCKETS,
+    registry=cache_registry,
+)
+
+REQUESTS_IN_FLIGHT = Gauge(
+    "rewrite_requests_in_flight",
+    "Number of rewrite requests currently being processed",
+    ["endpoint"],
+    multiprocess_mode="livesum",
+    registry=cache_registry,
+)
+
+CACHE_LATENCY = Histogram(
+    "rewrite_cache_operation_duration_seconds",
+    "Latency of cache operations",
+    ["operation", "style", "adapter"],
+    buckets=LATENCY_BUCKETS,
+    registry=cache_registry,
+)
+
+LLM_LATENCY = Histogram(
+    "rewrite_llm_request_duration_seconds",
+    "Latency of LLM adapter calls, including retries",
+    ["style", "adapter"],
+    buckets=LATENCY_BUCKETS,
+    registry=cache_registry,
+)
+
+PAYLOAD_SIZE = Histogram(
+    "rewrite_payload_size_bytes",
+    "Size of the original and rewritten texts in bytes",
+    ["direction", "style", "adapter"],
+    buckets=SIZE_BUCKETS,
+    registry=cache_registry,
+)
+
+LLM_RETRIES = Counter(
+    "rewrite_llm_retries_total",
+    "Total number of retried LLM API calls",
+    ["adapter"],
+    registry=cache_registry,
+)
+
+LLM_RATE_LIMIT_ERRORS = Counter(
+    "rewrite_llm_rate_limit_errors_total",
+    "Total number of rate limit errors returned by the LLM API",
+    ["adapter"],
+    registry=cache_registry,
+)
+
+LLM_TIMEOUTS = Counter(
+    "rewrite_llm_timeouts_total",
+    "Total number of timeouts and connection errors calling the LLM API",
+    ["adapter"],
+    registry=cache_registry,
+)
+
+LLM_BATCH_SIZE = Histogram(
+    "rewrite_llm_micro_batch_size",
+    "Number of texts packed into a single micro-batched LLM call",
+    ["adapter"],
+    buckets=[1, 2, 4, 8, 16, 32, 64],
+    registry=cache_registry,
+)
+
+LLM_CALLS_SAVED = Counter(
+    "rewrite_llm_calls_saved_total",
+    "Total number of LLM calls saved by micro-batching",
+    ["adapter"],
+    registry=cache_registry,
+)
+
+LLM_BATCH_FALLBACKS = Counter(
+    "rewrite_llm_micro_batch_fallbacks_total",
+    "Total number of micro-batches retried as individual calls after an unparseable response",
+    ["adapter"],
+    registry=cache_registry,
+)
+
+HEDGED_REQUESTS = Counter(
+    "rewrite_llm_hedged_requests_total",
+    "Total number of hedged LLM calls by the call that answered first",
+    ["winner"],
+    registry=cache_registry,
+)
+
+HEDGES_SKIPPED = Counter(
+    "rewrite_llm_hedges_skipped_total",
+    "Total number of slow LLM calls not hedged because the hedge budget was exhausted",
+    registry=cache_registry,
+)
+
+LLM_BACKEND_LATENCY = Gauge(
+    "rewrite_llm_backend_latency_ewma_seconds",
+    "Exponentially weighted moving average of the latency of each routed LLM backend",
+    ["backend"],
+    multiprocess_mode="livemostrecent",
+    registry=cache_registry,
+)
+
+LLM_BACKEND_ERROR_RATE = Gauge(
+    "rewrite_llm_backend_error_rate_ewma",
+    "Exponentially weighted moving average of the error rate of each routed LLM backend",
+    ["backend"],
+    multiprocess_mode="livemostrecent",
+    registry=cache_registry,
+)
+
+RATE_LIMITER_WAIT = Histogram(
+    "rewrite_llm_rate_limiter_wait_seconds",
+    "Time LLM calls spent queued in the client-side rate limiter",
+    buckets=LATENCY_BUCKETS,
+    registry=cache_registry,
+)
+
+ADMISSION_QUEUE_DEPTH = Gauge(
+    "rewrite_llm_admission_queue_depth",
+    "Number of LLM calls waiting for an in-flight slot",
+    multiprocess_mode="livesum",
+    registry=cache_registry,
+)
+
+ADMISSION_REJECTIONS = Counter(
+    "rewrite_llm_admission_rejections_total",
+    "Total number of LLM calls rejected by admission control",
+    ["reason"],
+    registry=cache_registry,
+)
+
+CIRCUIT_BREAKER_STATE = Gauge(
+    "rewrite_llm_circuit_breaker_state",
+    "State of the LLM circuit breaker (0 closed, 1 half-open, 2 open)",
+    multiprocess_mode="livemax",
+    registry=cache_registry,
+)
+
+CACHE_ENTRIES = Gauge(
+    "rewrite_cache_entries",
+    "Number of entries held by the in-memory cache",
+    ["cache"],
+    multiprocess_mode="livesum",
+    registry=cache_registry,
+)
+
+CACHE_BYTES = Gauge(
+    "rewrite_cache_bytes",
+    "Approximate size in bytes of the entries held by a byte-bounded in-memory cache",
+    ["cache"],
+    multiprocess_mode="livesum",
+    registry=cache_registry,
+)
+
+JOB_QUEUE_DEPTH = Gauge(
+    "rewrite_job_queue_depth",
+    "Number of asynchronous rewrite jobs waiting for a worker",
+    multiprocess_mode="livesum",
+    registry=cache_registry,
+)
+
+JOBS_COMPLETED = Counter(
+    "rewrite_jobs_completed_total",
+    "Total number of finished asynchronous rewrite jobs",
+    ["status"],
+    registry=cache_registry,
+)
+
 def get_metrics():
-    """Generate Prometheus metrics."""
+    """Generate Prometheus metrics, aggregated over all worker processes in multiprocess mode."""
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry, path=MULTIPROC_DIR)
+        return generate_latest(registry)
     return generate_latest(cache_registry)
+
+
+def mark_process_dead(pid: int) -> None:
+    """Drop the live gauges of a worker process that exited, in multiprocess mode.
+
+    Its counters and histograms stay in the directory, so totals don't go
+    backwards when a worker is restarted.
+    """
+    if MULTIPROC_DIR:
+        multiprocess.mark_process_dead(pid, MULTIPROC_DIR)
+
+
+def cleanup_dead_processes() -> None:
+    """Drop the live gauges of worker processes that died without shutting down."""
+    if not MULTIPROC_DIR:
+        return
+    pids = set()
+    for file_name in os.listdir(MULTIPROC_DIR):
+        # Live gauge files are named gauge_live<mode>_<pid>.db
+        if file_name.startswith("gauge_live") and file_name.endswith(".db"):
+            pids.add(int(file_name[: -len(".db")].rsplit("_", 1)[1]))
+    for pid in pids:
+        if pid != os.getpid() and not _process_alive(pid):
+            mark_process_dead(pid)
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
@@ -0,0 +1,110 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+
+from app.config.logging import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class Trace:
+    """Durations of the named spans of one request.
+
+    Spans of the same name, e.g. several LLM attempts, add up. Overlapping
+    spans, like hedged calls, are each counted in full.
+    """
+
+    __slots__ = ("start", "spans")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.spans: Dict[str, float] = {}
+
+    def add(self, name: str, duration: float) -> None:
+        self.spans[name] = self.spans.get(name, 0.0) + duration
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+    def server_timing(self) -> str:
+        """Format the spans and the total time as a Server-Timing header value, in milliseconds."""
+        spans = [f"{name};dur={duration * 1000:.2f}" for name, duration in self.spans.items()]
+        spans.append(f"total;dur={self.elapsed() * 1000:.2f}")
+        return ", ".join(spans)
+
+
+# Tasks copy the context when they are created, so spans recorded by tasks a
+# request starts (hedged or batched LLM calls) land in the request's trace too
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Time a block as a span of the current request's trace, if it is traced."""
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(name, time.perf_counter() - start)
+
+
+def record_elapsed(name: str) -> None:
+    """Record the time since the current request's trace started as a span."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(name, trace.elapsed())
+
+
+class ServerTimingMiddleware:
+    """Trace the requests to paths starting with `path_prefix`.
+
+    The spans are returned in a `Server-Timing` header if `header` is set,
+    and logged with each request if `log` is set. A streamed
+    response reports the spans recorded until its first byte.
+    """
+
+    def __init__(self, app, path_prefix: str = "/v1/", header: bool = True, log: bool = False):
+        self.app = app
+        self.path_prefix = path_prefix
+        self.header = header
+        self.log = log
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefix):
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace()
+        token = _current_trace.set(trace)
+        status = None
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.header:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", trace.server_timing().encode("latin-1")))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_trace.reset(token)
+            if self.log:
+                logger.info(
+                    "Request timing",
+                    extra={
+                        "method": scope["method"],
+                        "path": scope["path"],
+                        "status": status,
+                        "total_ms": round(trace.elapsed() * 1000, 2),
+                        "spans_ms": {name: round(d * 1000, 2) for name, d in trace.spans.items()},
+                    },
+                )
@@ -1,9 +1,11 @@
-from typing import Literal, Optional
+from typing import List, Literal, Optional
 
 from pydantic import BaseModel, Field, field_validator
 
 from app.config.logging import setup_logger
 from app.exception.custom_exceptions import (
+    BatchTooLargeError,
+    EmptyBatchError,
     EmptyTextError,
     InvalidStyleError,
     TextTooLongError,
@@ -12,6 +14,8 @@ from app.model.enums import StyleEnum
 
 logger = setup_logger(__name__)
 
+MAX_BATCH_SIZE = 1000
+
 
 class RewriteRequest(BaseModel):
     """Request model for the rewrite endpoint."""
@@ -45,6 +49,62 @@ class RewriteResponse(BaseModel):
     style: Optional[StyleEnum] = None
 
 
+class BatchRewriteItem(BaseModel):
+    """A single item of a batch rewrite request, validated individually."""
+
+    text: str
+    style: str = "formal"
+
+
+class BatchRewriteRequest(BaseModel):
+    """Request model for the batch rewrite endpoint."""
+
+    items: List[BatchRewriteItem]
+
+    @field_validator("items")
+    @classmethod
+    def validate_items(cls, v: List[BatchRewriteItem]) -> List[BatchRewriteItem]:
+        if not v:
+            raise EmptyBatchError()
+        if len(v) > MAX_BATCH_SIZE:
+            raise BatchTooLargeError(MAX_BATCH_SIZE)
+        return v
+
+
+class ErrorDetail(BaseModel):
+    """Error details of a failed batch item."""
+
+    message: str
+
+
+class BatchRewriteItemResult(BaseModel):
+    """Result of a single batch item, either a rewrite or an error."""
+
+    result: Optional[RewriteResponse] = None
+    error: Optional[ErrorDetail] = None
+
+
+class BatchRewriteResponse(BaseModel):
+    """Response model for the batch rewrite endpoint, in the order of the request items."""
+
+    results: List[BatchRewriteItemResult]
+
+
+class RewriteJobRequest(RewriteRequest):
+    """Request model for submitting an asynchronous rewrite job."""
+
+    priority: int = Field(0, ge=0, le=9, description="Jobs with a higher priority run first")
+
+
+class RewriteJobResponse(BaseModel):
+    """State of an asynchronous rewrite job, with its result or error once finished."""
+
+    job_id: str
+    status: Literal["queued", "running", "done", "failed"]
+    result: Optional[RewriteResponse] = None
+    error: Optional[ErrorDetail] = None
+
+
 class HealthResponse(BaseModel):
     """Response model for the health check endpoint."""
 
@@ -0,0 +1,117 @@
+import json
+from typing import Any, Dict, List, Type, TypeVar
+
+import pydantic
+from fastapi import Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+ModelT = TypeVar("ModelT", bound=pydantic.BaseModel)
+
+
+def _fields(obj: Any) -> Dict[str, Any]:
+    """Serialize models by their field values, without running pydantic's serializer."""
+    if isinstance(obj, pydantic.BaseModel):
+        return obj.__dict__
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """Encode plain data and models made of JSON types (str, numbers, str enums) as JSON.
+
+    Uses orjson when it is installed, and the standard library otherwise.
+    """
+    if orjson is not None:
+        return orjson.dumps(content, default=_fields)
+    return json.dumps(content, default=_fields, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+class FastJSONResponse(Response):
+    """JSON response for content that needs no validation, such as models built with `model_construct`.
+
+    FastAPI validates and re-encodes whatever an endpoint returns against its
+    `response_model`, unless it returns a Response, as this one is.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def _is_json(content_type: str) -> bool:
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    return media_type == "application/json" or media_type.endswith("+json")
+
+
+async def parse_json_body(request: Request, model: Type[ModelT]) -> ModelT:
+    """Parse and validate a JSON request body into `model` in a single pass.
+
+    Pydantic parses the raw bytes itself rather than validating the objects
+    decoded by the json module. A body that fails is parsed again the way
+    FastAPI's own body parsing does, so invalid bodies get the same 422
+    responses as before, while the errors the model's validators raise as
+    HTTP exceptions go through their usual handler.
+    """
+    body = await request.body()
+    if not _is_json(request.headers.get("content-type", "")):
+        raise RequestValidationError([_not_an_object_error(body.decode("utf-8", "replace"))], body=body)
+    try:
+        return model.model_validate_json(body)
+    except pydantic.ValidationError:
+        # Rare, so the cost of parsing twice doesn't matter
+        return _parse_decoded_body(body, model)
+
+
+def _parse_decoded_body(body: bytes, model: Type[ModelT]) -> ModelT:
+    """Validate a body decoded by the json module into `model`, raising the errors FastAPI would."""
+    value = None
+    if body:
+        try:
+            value = json.loads(body)
+        except json.JSONDecodeError as e:
+            error = {
+                "type": "json_invalid",
+                "loc": ("body", e.pos),
+                "msg": "JSON decode error",
+                "input": {},
+                "ctx": {"error": e.msg},
+            }
+            raise RequestValidationError([error], body=body)
+    if value is None:
+        error = {"type": "missing", "loc": ("body",), "msg": "Field required", "input": None}
+        raise RequestValidationError([error], body=body)
+    if not isinstance(value, dict):
+        raise RequestValidationError([_not_an_object_error(value)], body=body)
+    try:
+        return model.model_validate(value)
+    except pydantic.ValidationError as e:
+        raise RequestValidationError(_body_errors(e), body=body)
+
+
+def _not_an_object_error(value: Any) -> Dict[str, Any]:
+    return {
+        "type": "model_attributes_type",
+        "loc": ("body",),
+        "msg": "Input should be a valid dictionary or object to extract fields from",
+        "input": value,
+    }
+
+
+def _body_errors(e: pydantic.ValidationError) -> List[Dict[str, Any]]:
+    return [{**error, "loc": ("body", *error["loc"])} for error in e.errors(include_url=False)]
+
+
+def json_body_schema(model: Type[pydantic.BaseModel]) -> Dict[str, Any]:
+    """OpenAPI request body of an endpoint that parses its body with `parse_json_body`."""
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {"application/json": {"schema": model.model_json_schema()}},
+        }
+    }
@@ -0,0 +1,214 @@
+import asyncio
+import heapq
+import itertools
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from typing import AsyncIterator, Deque, List, Optional, Tuple
+
+from app.config.logging import setup_logger
+from app.exception.custom_exceptions import (
+    CircuitOpenError,
+    LLMRateLimitError,
+    LoadSheddingError,
+    ServiceOverloadedError,
+)
+from app.metrics.prometheus_metrics import (
+    ADMISSION_QUEUE_DEPTH,
+    ADMISSION_REJECTIONS,
+    CIRCUIT_BREAKER_STATE,
+)
+
+logger = setup_logger(__name__)
+
+
+class Priority(IntEnum):
+    """Priority of an LLM call, lower values are admitted first."""
+
+    INTERACTIVE = 0
+    BACKGROUND = 1
+
+
+class AdmissionController:
+    """Cap the number of in-flight LLM calls, with a bounded wait queue.
+
+    A call beyond `max_in_flight` waits for a free slot, by priority and then
+    in FIFO order, so interactive calls overtake queued background work. If
+    the queue already holds `max_queue` calls, or the wait exceeds
+    `queue_timeout` seconds, the call is rejected with ServiceOverloadedError
+    instead of piling up on the event loop.
+    """
+
+    def __init__(self, max_in_flight: int = 100, max_queue: int = 1000, queue_timeout: float = 10.0):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._in_flight = 0
+        # Heap of (priority, arrival order, future)
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._arrivals = itertools.count()
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    @asynccontextmanager
+    async def slot(self, priority: Priority = Priority.INTERACTIVE) -> AsyncIterator[None]:
+        """Hold an in-flight slot for the duration of the block."""
+        await self._acquire(priority)
+        try:
+            yield
+        finally:
+            self._release()
+
+    async def _acquire(self, priority: Priority) -> None:
+        if self._in_flight < self.max_in_flight and not self._waiters:
+            self._in_flight += 1
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            ADMISSION_REJECTIONS.labels(reason="queue_full").inc()
+            raise ServiceOverloadedError(retry_after=self.queue_timeout)
+
+        waiter = asyncio.get_running_loop().create_future()
+        entry = (priority, next(self._arrivals), waiter)
+        heapq.heappush(self._waiters, entry)
+        ADMISSION_QUEUE_DEPTH.set(len(self._waiters))
+        try:
+            # The releasing call hands its slot over by resolving the future
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as the wait ended, pass it on
+                self._release()
+            else:
+                waiter.cancel()
+            if isinstance(e, asyncio.TimeoutError):
+                ADMISSION_REJECTIONS.labels(reason="queue_timeout").inc()
+                raise ServiceOverloadedError(
+                    "Timed out waiting for an LLM slot", retry_after=self.queue_timeout
+                ) from e
+            raise
+        finally:
+            if entry in self._waiters:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+            ADMISSION_QUEUE_DEPTH.set(len(self._waiters))
+
+    def _release(self) -> None:
+        while self._waiters:
+            _, _, waiter = heapq.heappop(self._waiters)
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._in_flight -= 1
+
+
+class CircuitState(IntEnum):
+    CLOSED = 0
+    HALF_OPEN = 1
+    OPEN = 2
+
+
+class CircuitBreaker:
+    """Fail fast while the LLM adapter is failing or too slow.
+
+    The outcome of the last `window_size` calls is tracked. Once at least
+    `min_calls` of them are known and the share of failed calls, or of calls
+    slower than `latency_threshold` seconds, reaches `failure_rate_threshold`,
+    the breaker opens and rejects calls with CircuitOpenError for `cooldown`
+    seconds. Rate limited and load-shed calls are not counted. After that a single probe call is let through, closing the
+    breaker if it succeeds and reopening it otherwise.
+    """
+
+    def __init__(
+        self,
+        failure_rate_threshold: float = 0.5,
+        latency_threshold: Optional[float] = None,
+        window_size: int = 20,
+        min_calls: int = 10,
+        cooldown: float = 30.0,
+    ):
+        self.failure_rate_threshold = failure_rate_threshold
+        self.latency_threshold = latency_threshold
+        self.min_calls = min_calls
+        self.cooldown = cooldown
+        self.state = CircuitState.CLOSED
+        self._outcomes: Deque[bool] = deque(maxlen=window_size)
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+    def check(self) -> None:
+        """Raise CircuitOpenError if a call would currently be rejected."""
+        if self.state == CircuitState.CLOSED:
+            return
+        remaining = self._opened_at + self.cooldown - time.monotonic()
+        if self.state == CircuitState.OPEN and remaining <= 0:
+            return
+        if self.state == CircuitState.HALF_OPEN and not self._probe_in_flight:
+            return
+        ADMISSION_REJECTIONS.labels(reason="circuit_open").inc()
+        raise CircuitOpenError(retry_after=max(remaining, 1))
+
+    @asynccontextmanager
+    async def guard(self) -> AsyncIterator[None]:
+        """Reject the call if the breaker is open, otherwise record its outcome."""
+        self.check()
+        probe = self.state != CircuitState.CLOSED
+        if probe:
+            self._set_state(CircuitState.HALF_OPEN)
+            self._probe_in_flight = True
+
+        start = time.monotonic()
+        try:
+            yield
+        except (LoadSheddingError, LLMRateLimitError):
+            # Rejections further down, and rate limits whether enforced by the
+            # client-side limiter or the API, say nothing about the adapter's health
+            if probe:
+                self._probe_in_flight = False
+            raise
+        except Exception:
+            self._record(False, probe)
+            raise
+        except BaseException:
+            # Cancelled, e.g. a hedge won or a streaming client disconnected. The
+            # adapter didn't fail, so the next call becomes the probe instead
+            if probe:
+                self._probe_in_flight = False
+            raise
+        else:
+            latency = time.monotonic() - start
+            slow = self.latency_threshold is not None and latency > self.latency_threshold
+            self._record(not slow, probe)
+
+    def _record(self, healthy: bool, probe: bool) -> None:
+        if probe:
+            self._probe_in_flight = False
+            if healthy:
+                logger.info("Circuit breaker probe succeeded, closing the circuit")
+                self._outcomes.clear()
+                self._set_state(CircuitState.CLOSED)
+            else:
+                self._open()
+            return
+
+        self._outcomes.append(healthy)
+        if self.state == CircuitState.CLOSED and len(self._outcomes) >= self.min_calls:
+            failure_rate = self._outcomes.count(False) / len(self._outcomes)
+            if failure_rate >= self.failure_rate_threshold:
+                self._open()
+
+    def _open(self) -> None:
+        logger.warning("Opening circuit breaker for %s seconds", self.cooldown)
+        self._opened_at = time.monotonic()
+        self._set_state(CircuitState.OPEN)
+
+    def _set_state(self, state: CircuitState) -> None:
+        self.state = state
+        CIRCUIT_BREAKER_STATE.set(state)
@@ -0,0 +1,60 @@
+import re
+import zlib
+from typing import List, Tuple
+
+# A sentence ends with terminal punctuation, optionally followed by closing
+# quotes or brackets, and then whitespace
+_SENTENCE_END = re.compile(r"(?<=[.!?…])[\"'”’)\]]*\s+")
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+
+
+def _split_keeping_separators(pattern: re.Pattern, text: str) -> List[Tuple[str, str]]:
+    """Split `text` on `pattern`, returning each piece with the separator that follows it."""
+    pieces, start = [], 0
+    for match in pattern.finditer(text):
+        # Keep closing quotes and brackets with their sentence
+        end = match.start() + len(match.group().rstrip())
+        if end > start:
+            pieces.append((text[start:end], text[end : match.end()]))
+        start = match.end()
+    if start < len(text):
+        pieces.append((text[start:], ""))
+    return pieces
+
+
+def _is_boundary(sentence: str, boundary_rate: int) -> bool:
+    """Whether a chunk may end after `sentence`, decided by its content alone."""
+    return zlib.crc32(sentence.encode("utf-8")) % boundary_rate == 0
+
+
+def split_into_chunks(text: str, max_chars: int, boundary_rate: int = 3) -> List[Tuple[str, str]]:
+    """Split a text on paragraph and sentence boundaries into chunks of at most `max_chars`.
+
+    Returns each chunk with the whitespace that separated it from the next
+    one, so joining them gives back the text. Chunks always end at
+    paragraph breaks, and sentences are only split from the next one at
+    roughly one sentence boundary in `boundary_rate`, picked by a hash of
+    the sentence, or when the chunk would grow past `max_chars`. Because the
+    boundaries depend on the content around them rather than on offsets, an
+    edit only changes the chunk it falls in, and the chunks before and after
+    it keep their cache keys. A single sentence longer than `max_chars` is
+    kept whole.
+    """
+    chunks: List[Tuple[str, str]] = []
+    for paragraph, paragraph_separator in _split_keeping_separators(_PARAGRAPH_BREAK, text):
+        current, separator = "", ""
+        for sentence, sentence_separator in _split_keeping_separators(_SENTENCE_END, paragraph):
+            if current and len(current) + len(separator) + len(sentence) > max_chars:
+                chunks.append((current, separator))
+                current = ""
+            current = f"{current}{separator}{sentence}" if current else sentence
+            separator = sentence_separator
+            if len(current) >= max_chars // 2 and _is_boundary(sentence, boundary_rate):
+                chunks.append((current, separator))
+                current = ""
+        if current:
+            chunks.append((current, separator))
+        if chunks:
+            # The paragraph break follows the last chunk of the paragraph
+            chunks[-1] = (chunks[-1][0], chunks[-1][1] + paragraph_separator)
+    return chunks
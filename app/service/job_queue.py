@@ -0,0 +1,164 @@
+import asyncio
+import itertools
+import uuid
+from dataclasses import dataclass, replace
+from typing import List, Optional
+
+from app.config.logging import setup_logger
+from app.exception.custom_exceptions import (
+    LLMRateLimitError,
+    LoadSheddingError,
+    ServiceOverloadedError,
+)
+from app.llm_adapter.rate_limiter import TokenBucket
+from app.metrics.prometheus_metrics import JOB_QUEUE_DEPTH, JOBS_COMPLETED
+from app.model.enums import StyleEnum
+from app.model.models import ErrorDetail, RewriteJobResponse
+from app.service.admission import Priority
+from app.service.rewrite_service import RewriteService
+
+logger = setup_logger(__name__)
+
+
+@dataclass(frozen=True)
+class _Job:
+    job_id: str
+    text: str
+    style: StyleEnum
+    priority: int
+    attempt: int = 1
+
+
+class RewriteJobQueue:
+    """In-process queue of asynchronous rewrite jobs, drained by worker coroutines.
+
+    Jobs run highest priority first, in submission order within a priority,
+    on `workers` coroutines and at most `jobs_per_minute` per minute. Their
+    LLM calls are admitted with background priority, so interactive requests
+    always get the next free LLM slot. Jobs rejected by load shedding or rate
+    limiting are requeued after the suggested delay, up to `max_attempts`.
+
+    Job states and results are kept in the service's cache for `result_ttl`
+    seconds, so any worker sharing the cache can answer a status poll. Job
+    keys are pinned, so cache backends never evict them to make room for
+    rewrites. Jobs still queued when the process stops are lost.
+    """
+
+    def __init__(
+        self,
+        service: RewriteService,
+        workers: int = 4,
+        max_queue: int = 10000,
+        jobs_per_minute: Optional[float] = None,
+        result_ttl: float = 3600.0,
+        max_attempts: int = 5,
+        retry_delay: float = 5.0,
+    ):
+        self.service = service
+        self.workers = workers
+        self.max_queue = max_queue
+        self.result_ttl = result_ttl
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._rate = TokenBucket(jobs_per_minute) if jobs_per_minute else None
+        self._queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        self._arrivals = itertools.count()
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def queued(self) -> int:
+        return self._queue.qsize()
+
+    async def submit(self, text: str, style: StyleEnum, priority: int = 0) -> RewriteJobResponse:
+        """Queue a rewrite job, returning its initial state."""
+        if self._queue.qsize() >= self.max_queue:
+            raise ServiceOverloadedError("Too many queued rewrite jobs", retry_after=self.retry_delay)
+
+        job = _Job(job_id=uuid.uuid4().hex, text=text, style=style, priority=priority)
+        state = RewriteJobResponse(job_id=job.job_id, status="queued")
+        await self._save(state)
+        self._enqueue(job)
+        return state
+
+    async def get(self, job_id: str) -> Optional[RewriteJobResponse]:
+        """Get the state of a job, or None if it does not exist or has expired."""
+        value = await self.service.cache.get(_job_key(job_id))
+        return RewriteJobResponse.model_validate_json(value) if value else None
+
+    def start(self) -> None:
+        """Start the worker coroutines on the running event loop."""
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        """Stop the worker coroutines, abandoning the queued jobs."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._queue.qsize():
+            logger.warning("Stopped with %d rewrite jobs still queued", self._queue.qsize())
+
+    def _enqueue(self, job: _Job) -> None:
+        self._queue.put_nowait((-job.priority, next(self._arrivals), job))
+        JOB_QUEUE_DEPTH.set(self._queue.qsize())
+
+    async def _work(self) -> None:
+        while True:
+            _, _, job = await self._queue.get()
+            JOB_QUEUE_DEPTH.set(self._queue.qsize())
+            try:
+                await self._throttle()
+                await self._run(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.error("Unexpected error running rewrite job %s", job.job_id, exc_info=True)
+
+    async def _throttle(self) -> None:
+        if self._rate is None:
+            return
+        # Reserve the token before sleeping, so concurrent workers queue up behind each other
+        wait = self._rate.wait_time(1)
+        self._rate.consume(1)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    async def _run(self, job: _Job) -> None:
+        await self._save(RewriteJobResponse(job_id=job.job_id, status="running"))
+        try:
+            result = await self.service.rewrite(job.text, job.style, Priority.BACKGROUND)
+        except (LoadSheddingError, LLMRateLimitError) as e:
+            if job.attempt < self.max_attempts:
+                delay = getattr(e, "retry_after", self.retry_delay)
+                logger.info("Rewrite job %s was rejected, retrying in %s seconds", job.job_id, delay)
+                await self._save(RewriteJobResponse(job_id=job.job_id, status="queued"))
+                asyncio.get_running_loop().call_later(
+                    delay, self._enqueue, replace(job, attempt=job.attempt + 1)
+                )
+                return
+            logger.error("Rewrite job %s was rejected %d times: %s", job.job_id, job.attempt, e)
+            await self._fail(
+                job,
+                "The service is currently experiencing high demand. Please try again in a few moments.",
+            )
+        except Exception as e:
+            logger.error("Error processing rewrite job %s: %s", job.job_id, e)
+            await self._fail(job, "Internal server error")
+        else:
+            await self._save(RewriteJobResponse(job_id=job.job_id, status="done", result=result))
+            JOBS_COMPLETED.labels(status="done").inc()
+
+    async def _fail(self, job: _Job, message: str) -> None:
+        await self._save(
+            RewriteJobResponse(job_id=job.job_id, status="failed", error=ErrorDetail(message=message))
+        )
+        JOBS_COMPLETED.labels(status="failed").inc()
+
+    async def _save(self, state: RewriteJobResponse) -> None:
+        await self.service.cache.set(
+            _job_key(state.job_id), state.model_dump_json(), ttl=self.result_ttl
+        )
+
+
+def _job_key(job_id: str) -> str:
+    return f"job:{job_id}"
@@ -1,42 +1,413 @@
+import asyncio
+import time
+from contextlib import AsyncExitStack, asynccontextmanager, contextmanager
+from typing import AsyncIterator, Collection, Dict, Iterator, List, Optional, Tuple, Union
+
 from app.cache.base import Cache
 from app.config.logging import setup_logger
 from app.llm_adapter.base import LLMAdapter
-from app.metrics.prometheus_metrics import CACHE_HITS, CACHE_MISSES
+from app.llm_adapter.rate_limiter import call_priority
+from app.metrics.prometheus_metrics import (
+    CACHE_HITS,
+    CACHE_LATENCY,
+    CACHE_MISSES,
+    CACHE_REFRESHES,
+    CACHE_STALE_SERVES,
+    COALESCED_REQUESTS,
+    LLM_LATENCY,
+    PAYLOAD_SIZE,
+    REWRITE_CHUNKS,
+    STREAM_TIME_TO_FIRST_BYTE,
+)
+from app.metrics.tracing import span
 from app.model.models import RewriteResponse, StyleEnum
+from app.service.admission import AdmissionController, CircuitBreaker, Priority
+from app.service.chunking import split_into_chunks
+from app.service.single_flight import SingleFlight
 
 logger = setup_logger(__name__)
 
 
 class RewriteService:
-    def __init__(self, llm_adapter: LLMAdapter, cache: Cache):
+    def __init__(
+        self,
+        llm_adapter: LLMAdapter,
+        cache: Cache,
+        coalesce_across_workers: bool = False,
+        lock_ttl: float = 30.0,
+        lock_poll_interval: float = 0.1,
+        batch_concurrency: int = 10,
+        admission: Optional[AdmissionController] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        soft_ttl: Optional[float] = None,
+        chunk_max_chars: Optional[int] = None,
+        unchunked_styles: Collection[StyleEnum] = (StyleEnum.HAIKU,),
+    ):
         self.llm_adapter = llm_adapter
         self.cache = cache
+        self.coalesce_across_workers = coalesce_across_workers
+        self.lock_ttl = lock_ttl
+        self.lock_poll_interval = lock_poll_interval
+        self.batch_concurrency = batch_concurrency
+        self.admission = admission
+        self.circuit_breaker = circuit_breaker
+        # Cached rewrites older than this are served stale and refreshed in the background
+        self.soft_ttl = soft_ttl
+        # Texts longer than this are rewritten and cached in chunks of sentences,
+        # except in styles that need to see the whole text at once
+        self.chunk_max_chars = chunk_max_chars
+        self.unchunked_styles = frozenset(unchunked_styles)
+        self._single_flight = SingleFlight()
+        self._refreshes: Dict[str, asyncio.Task] = {}
+
+    async def rewrite(
+        self, text: str, style: StyleEnum, priority: Priority = Priority.INTERACTIVE
+    ) -> RewriteResponse:
+        """Rewrite text in the specified style with caching.
 
-    async def rewrite(self, text: str, style: StyleEnum) -> RewriteResponse:
-        """Rewrite text in the specified style with caching."""
-        cache_key = self.cache.generate_key(text, style)
+        `priority` decides the order in which calls waiting for an LLM slot are
+        admitted, so background work never holds up interactive requests.
+        Callers validate the text and style, so the response is built without
+        validating them again.
+        """
+        if self._should_chunk(text, style):
+            return await self._rewrite_chunked(text, style, priority)
+
+        with span("cache_key"):
+            cache_key = self.cache.generate_key(text, style)
 
         # Try to get from cache
-        cached_result = await self.cache.get(cache_key)
+        with self._cache_timer("get", style):
+            cached_result, fresh = await self._cache_get(cache_key)
 
         if cached_result:
             logger.debug("Value found in cache, skip calling LLM adapter")
 
             # Record cache hit metric
             CACHE_HITS.inc()
+            if not fresh:
+                self._refresh_in_background(cache_key, text, style)
 
-            return RewriteResponse(
+            return RewriteResponse.model_construct(
                 original_text=text, rewritten_text=cached_result, style=style
             )
 
         # Record cache miss metric
         CACHE_MISSES.inc()
 
+        # Identical misses arriving while an LLM call for the same key is in
+        # flight wait for that call instead of issuing their own
+        rewritten_text, shared = await self._single_flight.do(
+            cache_key, lambda: self._rewrite_and_cache(cache_key, text, style, priority)
+        )
+        if shared:
+            logger.debug("Joined in-flight LLM call for the same key")
+            COALESCED_REQUESTS.labels(scope="local").inc()
+
+        return RewriteResponse.model_construct(
+            original_text=text, rewritten_text=rewritten_text, style=style
+        )
+
+    async def rewrite_stream(self, text: str, style: StyleEnum) -> AsyncIterator[str]:
+        """Rewrite text in the specified style, yielding the output in chunks.
+
+        A cached rewrite is yielded at once as a single chunk. Otherwise chunks
+        are yielded as the LLM adapter produces them, and the full text is
+        cached only once the stream has completed.
+        """
+        start = time.perf_counter()
+        with span("cache_key"):
+            cache_key = self.cache.generate_key(text, style)
+
+        with self._cache_timer("get", style):
+            cached_result, fresh = await self._cache_get(cache_key)
+
+        if cached_result:
+            logger.debug("Value found in cache, skip calling LLM adapter")
+            CACHE_HITS.inc()
+            if not fresh:
+                self._refresh_in_background(cache_key, text, style)
+            STREAM_TIME_TO_FIRST_BYTE.labels(source="cache").observe(
+                time.perf_counter() - start
+            )
+            yield cached_result
+            return
+
+        CACHE_MISSES.inc()
+
+        logger.debug("Value not found in cache, streaming from LLM adapter")
+        chunks = []
+        async with self._llm_guard():
+            with self._llm_timer(style):
+                async for chunk in self.llm_adapter.rewrite_stream(text, style):
+                    if not chunks:
+                        STREAM_TIME_TO_FIRST_BYTE.labels(source="llm").observe(
+                            time.perf_counter() - start
+                        )
+                    chunks.append(chunk)
+                    yield chunk
+
+        # Only reached if the stream completed and the consumer read all of it
+        rewritten_text = "".join(chunks).strip()
+        self._observe_payload(text, rewritten_text, style)
+        with self._cache_timer("set", style):
+            await self._cache_set(cache_key, rewritten_text)
+
+    def _should_chunk(self, text: str, style: StyleEnum) -> bool:
+        return (
+            self.chunk_max_chars is not None
+            and len(text) > self.chunk_max_chars
+            and style not in self.unchunked_styles
+        )
+
+    async def _rewrite_chunked(
+        self, text: str, style: StyleEnum, priority: Priority
+    ) -> RewriteResponse:
+        """Rewrite a long text chunk by chunk, caching each chunk on its own.
+
+        The text is split on paragraph and sentence boundaries, and the chunks
+        are resolved like the items of a batch: cached chunks are read with
+        a single multi-get and the others are rewritten in parallel. The
+        rewrites are joined in order with the original separators, so an edit
+        to a long text only calls the LLM for the chunks it touched.
+        """
+        chunks = split_into_chunks(text, self.chunk_max_chars)
+        REWRITE_CHUNKS.observe(len(chunks))
+        outcomes = await self.rewrite_batch([(chunk, style) for chunk, _ in chunks], priority)
+        for outcome in outcomes:
+            if isinstance(outcome, Exception):
+                raise outcome
+
+        rewritten_text = "".join(
+            outcome.rewritten_text.strip() + separator
+            for outcome, (_, separator) in zip(outcomes, chunks)
+        )
+        return RewriteResponse.model_construct(
+            original_text=text, rewritten_text=rewritten_text.strip(), style=style
+        )
+
+    async def rewrite_batch(
+        self, items: List[Tuple[str, StyleEnum]], priority: Priority = Priority.INTERACTIVE
+    ) -> List[Union[RewriteResponse, Exception]]:
+        """Rewrite several texts, returning a response or an exception per item.
+
+        Identical items are resolved once, cache hits are read with a single
+        multi-get and misses call the LLM adapter with at most
+        `batch_concurrency` calls in flight. A failed item does not affect the
+        others.
+        """
+        keys = [self.cache.generate_key(text, style) for text, style in items]
+
+        # Resolve each distinct key once, using the first item that produced it
+        unique: Dict[str, Tuple[str, StyleEnum]] = {}
+        for key, item in zip(keys, items):
+            unique.setdefault(key, item)
+
+        rewritten: Dict[str, Union[str, Exception]] = {}
+        misses = []
+        with self._cache_timer("get_many", "batch"):
+            cached_results = await self._cache_get_many(list(unique))
+        for key, (cached_result, fresh) in zip(unique, cached_results):
+            if cached_result:
+                rewritten[key] = cached_result
+                if not fresh:
+                    self._refresh_in_background(key, *unique[key])
+            else:
+                misses.append(key)
+
+        CACHE_HITS.inc(len(unique) - len(misses))
+        CACHE_MISSES.inc(len(misses))
+        logger.debug(
+            "Batch of %d items: %d unique, %d cache misses", len(items), len(unique), len(misses)
+        )
+
+        semaphore = asyncio.Semaphore(self.batch_concurrency)
+
+        async def resolve(key: str) -> str:
+            text, style = unique[key]
+            async with semaphore:
+                rewritten_text, shared = await self._single_flight.do(
+                    key, lambda: self._rewrite_and_cache(key, text, style, priority)
+                )
+            if shared:
+                COALESCED_REQUESTS.labels(scope="local").inc()
+            return rewritten_text
+
+        outcomes = await asyncio.gather(
+            *(resolve(key) for key in misses), return_exceptions=True
+        )
+        rewritten.update(zip(misses, outcomes))
+
+        results: List[Union[RewriteResponse, Exception]] = []
+        for key, (text, style) in zip(keys, items):
+            outcome = rewritten[key]
+            if isinstance(outcome, Exception):
+                results.append(outcome)
+            else:
+                results.append(
+                    RewriteResponse.model_construct(
+                        original_text=text, rewritten_text=outcome, style=style
+                    )
+                )
+        return results
+
+    async def _rewrite_and_cache(
+        self,
+        cache_key: str,
+        text: str,
+        style: StyleEnum,
+        priority: Priority = Priority.INTERACTIVE,
+    ) -> str:
+        """Call the LLM adapter and store the result in the cache."""
+        if self.coalesce_across_workers:
+            return await self._rewrite_with_lock(cache_key, text, style, priority)
+
         logger.debug("Value not found in cache, calling LLM adapter")
-        rewritten_text = await self.llm_adapter.rewrite(text, style)
+        rewritten_text = await self._call_llm(text, style, priority)
 
-        await self.cache.set(cache_key, rewritten_text)
+        with self._cache_timer("set", style):
+            await self._cache_set(cache_key, rewritten_text)
 
-        return RewriteResponse(
-            original_text=text, rewritten_text=rewritten_text, style=style
+        return rewritten_text
+
+    async def _rewrite_with_lock(
+        self, cache_key: str, text: str, style: StyleEnum, priority: Priority
+    ) -> str:
+        """Coalesce misses across workers using a lock entry in the shared cache.
+
+        The worker that acquires the lock calls the LLM adapter. The others poll
+        the cache until the value appears, and fall back to calling the adapter
+        themselves if the holder releases the lock without a result (e.g. the
+        call failed) or the lock expires.
+        """
+        lock_key = f"lock:{cache_key}"
+
+        if not await self.cache.add(lock_key, "1", ttl=self.lock_ttl):
+            COALESCED_REQUESTS.labels(scope="distributed").inc()
+            logger.debug("Another worker holds the lock, waiting for its result")
+
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + self.lock_ttl
+            while loop.time() < deadline:
+                await asyncio.sleep(self.lock_poll_interval)
+                cached_result = await self.cache.get(cache_key)
+                if cached_result:
+                    return cached_result
+                if not await self.cache.get(lock_key):
+                    break
+
+            logger.debug("No result from the lock holder, calling LLM adapter")
+            rewritten_text = await self._call_llm(text, style, priority)
+            with self._cache_timer("set", style):
+                await self._cache_set(cache_key, rewritten_text)
+            return rewritten_text
+
+        try:
+            logger.debug("Value not found in cache, calling LLM adapter")
+            rewritten_text = await self._call_llm(text, style, priority)
+            with self._cache_timer("set", style):
+                await self._cache_set(cache_key, rewritten_text)
+            return rewritten_text
+        finally:
+            await self.cache.delete(lock_key)
+
+    async def _cache_get(self, cache_key: str) -> Tuple[Optional[str], bool]:
+        """Read a cached rewrite with whether it is still fresh."""
+        if self.soft_ttl is None:
+            return await self.cache.get(cache_key), True
+        return (await self.cache.get_entries([cache_key]))[0]
+
+    async def _cache_get_many(self, keys: List[str]) -> List[Tuple[Optional[str], bool]]:
+        """Read cached rewrites with whether each is still fresh."""
+        if self.soft_ttl is None:
+            # Without a soft TTL every cached rewrite is fresh, skip the extra bookkeeping
+            return [(value, True) for value in await self.cache.get_many(keys)]
+        return await self.cache.get_entries(keys)
+
+    async def _cache_set(self, cache_key: str, rewritten_text: str) -> None:
+        if self.soft_ttl is None:
+            await self.cache.set(cache_key, rewritten_text)
+        else:
+            await self.cache.set_entry(cache_key, rewritten_text, soft_ttl=self.soft_ttl)
+
+    def _refresh_in_background(self, cache_key: str, text: str, style: StyleEnum) -> None:
+        """Refresh a stale cached rewrite, unless a refresh of it is already running."""
+        CACHE_STALE_SERVES.inc()
+        if cache_key in self._refreshes:
+            return
+        logger.debug("Cached value is stale, refreshing it in the background")
+        task = asyncio.create_task(self._refresh(cache_key, text, style))
+        self._refreshes[cache_key] = task
+        task.add_done_callback(lambda _: self._refreshes.pop(cache_key, None))
+
+    async def _refresh(self, cache_key: str, text: str, style: StyleEnum) -> None:
+        try:
+            # Shares the LLM call with any concurrent miss of the same key
+            await self._single_flight.do(
+                cache_key,
+                lambda: self._rewrite_and_cache(cache_key, text, style, Priority.BACKGROUND),
+            )
+        except Exception as e:
+            logger.warning("Background refresh failed, the stale value is kept: %s", e)
+            CACHE_REFRESHES.labels(result="failure").inc()
+        else:
+            CACHE_REFRESHES.labels(result="success").inc()
+
+    async def _call_llm(
+        self, text: str, style: StyleEnum, priority: Priority = Priority.INTERACTIVE
+    ) -> str:
+        """Call the LLM adapter, recording its latency and payload sizes."""
+        async with self._llm_guard(priority):
+            with self._llm_timer(style):
+                rewritten_text = await self.llm_adapter.rewrite(text, style)
+        self._observe_payload(text, rewritten_text, style)
+        return rewritten_text
+
+    @asynccontextmanager
+    async def _llm_guard(
+        self, priority: Priority = Priority.INTERACTIVE
+    ) -> AsyncIterator[None]:
+        """Apply the circuit breaker and admission control to an LLM call.
+
+        The call also waits for the client-side rate limit at `priority`.
+        """
+        if self.circuit_breaker is not None:
+            # Fail fast rather than queue for a call that would be rejected
+            self.circuit_breaker.check()
+
+        async with AsyncExitStack() as stack:
+            stack.enter_context(call_priority(priority))
+            if self.admission is not None:
+                with span("llm_queue"):
+                    await stack.enter_async_context(self.admission.slot(priority))
+            if self.circuit_breaker is not None:
+                await stack.enter_async_context(self.circuit_breaker.guard())
+            yield
+
+    @contextmanager
+    def _cache_timer(self, operation: str, style: StyleEnum) -> Iterator[None]:
+        with span(f"cache_{operation}"), CACHE_LATENCY.labels(
+            operation=operation, style=_style_label(style), adapter=self.llm_adapter.name
+        ).time():
+            yield
+
+    @contextmanager
+    def _llm_timer(self, style: StyleEnum) -> Iterator[None]:
+        with span("llm"), LLM_LATENCY.labels(
+            style=_style_label(style), adapter=self.llm_adapter.name
+        ).time():
+            yield
+
+    def _observe_payload(self, text: str, rewritten_text: str, style: StyleEnum) -> None:
+        style, adapter = _style_label(style), self.llm_adapter.name
+        PAYLOAD_SIZE.labels(direction="request", style=style, adapter=adapter).observe(
+            len(text.encode("utf-8"))
         )
+        PAYLOAD_SIZE.labels(direction="response", style=style, adapter=adapter).observe(
+            len(rewritten_text.encode("utf-8"))
+        )
+
+
+def _style_label(style: StyleEnum) -> str:
+    """Metric label value for a style, accepting both enum members and plain strings."""
+    return style.value if isinstance(style, StyleEnum) else str(style)
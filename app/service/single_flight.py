@@ -0,0 +1,46 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Tuple, TypeVar
+
+from app.config.logging import setup_logger
+
+logger = setup_logger(__name__)
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Coalesce concurrent calls for the same key into a single execution.
+
+    The first caller for a key (the leader) starts the work as a task; every
+    caller that arrives while it is still running (a follower) awaits the same
+    task. The task is shielded, so a cancelled caller never cancels the work
+    for the others, and any exception raised by the work is re-raised to all
+    of them.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[str, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._in_flight)
+
+    async def do(
+        self, key: str, fn: Callable[[], Awaitable[T]]
+    ) -> Tuple[T, bool]:
+        """Run `fn` once per key, returning its result and whether it was shared."""
+        task = self._in_flight.get(key)
+        shared = task is not None
+
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+
+        return await asyncio.shield(task), shared
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # Mark the exception as retrieved in case every caller was cancelled
+        if not task.cancelled() and task.exception() is not None:
+            logger.debug("In-flight call for key %s failed: %s", key, task.exception())
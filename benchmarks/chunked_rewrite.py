@@ -0,0 +1,83 @@
+"""Compare whole-text and chunked rewrites of a long text, cold and after a one-sentence edit.
+
+The LLM is simulated by an adapter whose latency grows with the length of
+the text, like the output tokens of a real model, so the benchmark shows
+both effects of chunking: chunks are rewritten in parallel, and after an
+edit only the chunks it touched miss the cache.
+
+Run with: python -m benchmarks.chunked_rewrite [--chars 5000] [--chunk-max-chars 1000] [--ms-per-char 0.5]
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+from app.cache.memory_cache import InMemoryCache
+from app.llm_adapter.base import LLMAdapter
+from app.model.enums import StyleEnum
+from app.service.rewrite_service import RewriteService
+
+
+class LengthLatencyAdapter(LLMAdapter):
+    """Echo the text back after a delay proportional to its length."""
+
+    name = "simulated"
+
+    def __init__(self, base_latency: float, latency_per_char: float):
+        self.base_latency = base_latency
+        self.latency_per_char = latency_per_char
+        self.calls = 0
+        self.chars = 0
+
+    async def rewrite(self, text: str, style: StyleEnum) -> str:
+        self.calls += 1
+        self.chars += len(text)
+        await asyncio.sleep(self.base_latency + self.latency_per_char * len(text))
+        return text.upper()
+
+
+def make_text(chars: int, rng: random.Random) -> list:
+    """Sentences of a text of about `chars` characters, with a paragraph break every few sentences."""
+    words = "the quick brown fox jumps over a lazy dog while rain falls on quiet streets".split()
+    sentences = []
+    while sum(len(sentence) + 1 for sentence in sentences) < chars:
+        sentence = " ".join(rng.choice(words) for _ in range(rng.randint(6, 20))).capitalize() + "."
+        sentences.append(sentence + ("\n\n" if len(sentences) % 6 == 5 else " "))
+    return sentences
+
+
+async def run(chunk_max_chars, args: argparse.Namespace) -> list:
+    rng = random.Random(0)
+    sentences = make_text(args.chars, rng)
+    adapter = LengthLatencyAdapter(args.base_ms / 1000, args.ms_per_char / 1000)
+    service = RewriteService(adapter, InMemoryCache(), chunk_max_chars=chunk_max_chars)
+
+    rows = []
+    for name in ("cold", "repeat", "edited"):
+        if name == "edited":
+            index = len(sentences) // 2
+            sentences[index] = sentences[index].replace(" ", " really ", 1)
+        calls, chars = adapter.calls, adapter.chars
+        start = time.perf_counter()
+        await service.rewrite("".join(sentences).strip(), StyleEnum.FORMAL)
+        rows.append((name, time.perf_counter() - start, adapter.calls - calls, adapter.chars - chars))
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--chars", type=int, default=5000)
+    parser.add_argument("--chunk-max-chars", type=int, default=1000)
+    parser.add_argument("--base-ms", type=float, default=300, help="Latency of an LLM call of an empty text")
+    parser.add_argument("--ms-per-char", type=float, default=0.5, help="Added latency per character of text")
+    args = parser.parse_args()
+
+    print(f"{'mode':>8} {'request':>8} {'latency ms':>11} {'LLM calls':>10} {'LLM chars':>10}")
+    for mode, chunk_max_chars in (("whole", None), ("chunked", args.chunk_max_chars)):
+        for name, latency, calls, chars in asyncio.run(run(chunk_max_chars, args)):
+            print(f"{mode:>8} {name:>8} {latency * 1000:>11.1f} {calls:>10} {chars:>10}")
+
+
+if __name__ == "__main__":
+    main()
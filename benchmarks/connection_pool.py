@@ -0,0 +1,123 @@
+"""Compare the OpenAI client's connection pool settings on cold and idle bursts.
+
+Each setup sends a burst of `--concurrency` concurrent rewrites right after
+startup, and another one after `--idle` seconds without traffic, and reports
+the latency of both. With httpx's defaults, idle connections are closed
+after 5 seconds and none are opened ahead of time, so both bursts open new
+connections; the tuned setup warms them at startup and keeps them alive.
+
+By default the rewrites go to the local stand-in server
+(benchmarks.fake_openai_server), served over HTTPS with a throwaway
+self-signed certificate so new connections pay for a TLS handshake as they
+would against OpenAI (or over plain HTTP with `--no-tls`). Pass `--base-url`
+and `--api-key` to measure against a real endpoint instead.
+
+Run with: python -m benchmarks.connection_pool [--concurrency 8] [--idle 6] [--no-tls] [--base-url URL --api-key KEY]
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import tempfile
+import time
+from typing import Dict, List
+
+from app.llm_adapter.openai_adapter import OpenAIAdapter, OpenAIConfig
+from app.model.enums import StyleEnum
+from benchmarks.load_test import free_port, percentile, start_process, stop_process
+
+
+def setups(concurrency: int) -> Dict[str, dict]:
+    return {
+        "httpx defaults": {"keepalive_expiry": 5.0, "max_keepalive_connections": 20},
+        "tuned + warm-up": {"keepalive_expiry": 60.0, "warmup_connections": concurrency},
+    }
+
+
+async def burst(adapter: OpenAIAdapter, concurrency: int) -> List[float]:
+    async def timed() -> float:
+        start = time.perf_counter()
+        await adapter.rewrite("Connection pool benchmark text", StyleEnum.FORMAL)
+        return time.perf_counter() - start
+
+    return sorted(await asyncio.gather(*(timed() for _ in range(concurrency))))
+
+
+async def run_setup(settings: dict, args: argparse.Namespace) -> Dict[str, List[float]]:
+    config = OpenAIConfig(
+        base_url=args.base_url,
+        model=args.model,
+        max_tokens=16,
+        requests_per_minute=100_000,
+        tokens_per_minute=100_000_000,
+        **settings,
+    )
+    adapter = OpenAIAdapter(args.api_key, config)
+    await adapter.start()
+    try:
+        cold = await burst(adapter, args.concurrency)
+        await asyncio.sleep(args.idle)
+        idle = await burst(adapter, args.concurrency)
+    finally:
+        await adapter.close()
+    return {"startup": cold, "after idle": idle}
+
+
+def self_signed_certificate(directory: str) -> tuple:
+    """Create a certificate for 127.0.0.1 with openssl, returning the certificate and key paths."""
+    certfile, keyfile = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+         "-keyout", keyfile, "-out", certfile, "-subj", "/CN=127.0.0.1",
+         "-addext", "subjectAltName=IP:127.0.0.1"],
+        check=True,
+        capture_output=True,
+    )
+    return certfile, keyfile
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--idle", type=float, default=6.0, help="Seconds without traffic between the bursts")
+    parser.add_argument("--base-url", help="OpenAI-compatible API to call instead of the local stand-in")
+    parser.add_argument("--api-key", default=os.getenv("OPENAI_API_KEY") or "fake")
+    parser.add_argument("--model", default="gpt-3.5-turbo")
+    parser.add_argument("--no-tls", action="store_true", help="Serve the local stand-in over plain HTTP")
+    args = parser.parse_args()
+
+    fake_server = None
+    workdir = tempfile.TemporaryDirectory()
+    if args.base_url is None:
+        port = free_port()
+        server_args = ["-m", "benchmarks.fake_openai_server", "--port", str(port),
+                       "--latency-median", "0.05", "--latency-sigma", "0",
+                       # Like OpenAI's servers, keep idle connections open longer than the client does
+                       "--keep-alive", "120"]
+        scheme = "http"
+        if not args.no_tls:
+            certfile, keyfile = self_signed_certificate(workdir.name)
+            server_args += ["--ssl-certfile", certfile, "--ssl-keyfile", keyfile]
+            # httpx trusts the certificates in SSL_CERT_FILE
+            os.environ["SSL_CERT_FILE"] = certfile
+            scheme = "https"
+        fake_server = start_process(server_args, dict(os.environ), f"{scheme}://127.0.0.1:{port}/docs")
+        args.base_url = f"{scheme}://127.0.0.1:{port}/v1"
+
+    print(f"{'setup':>16} {'burst':>11} {'p50 ms':>9} {'max ms':>9}")
+    try:
+        for name, settings in setups(args.concurrency).items():
+            for burst_name, latencies in asyncio.run(run_setup(settings, args)).items():
+                print(
+                    f"{name:>16} {burst_name:>11} {percentile(latencies, 0.5) * 1000:>9.1f} "
+                    f"{latencies[-1] * 1000:>9.1f}"
+                )
+    finally:
+        if fake_server is not None:
+            stop_process(fake_server)
+        workdir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""Local stand-in for the OpenAI chat completions API, for load tests.
+
+Completions take a log-normally distributed time, and a share of the requests
+can be failed with a 429 or left hanging past the client timeout. The server
+enforces its own requests/min and tokens/min limits and reports them in the
+same `x-ratelimit-*` headers as OpenAI, so the client-side rate limiter can be
+exercised too. Requests asking for a JSON object (micro-batched rewrites) get
+one rewrite per text of the JSON array they hold.
+
+Run with: python -m benchmarks.fake_openai_server [--port 8100] [--latency-median 0.5] ...
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+import uuid
+from dataclasses import dataclass, fields
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+@dataclass
+class FakeServerConfig:
+    # Median and log-normal spread of the completion latency, in seconds
+    latency_median: float = 0.5
+    latency_sigma: float = 0.5
+    # Share of requests failed with a 429, and the retry-after-ms it suggests
+    rate_limit_rate: float = 0.0
+    retry_after_ms: int = 1000
+    # Share of requests left hanging for `timeout_delay` seconds
+    timeout_rate: float = 0.0
+    timeout_delay: float = 120.0
+    # Limits enforced by the server per minute window
+    requests_per_minute: int = 10000
+    tokens_per_minute: int = 2000000
+    seed: int = 0
+
+
+class _Window:
+    """Request and token usage of the current minute window."""
+
+    def __init__(self):
+        self.minute = 0
+        self.requests = 0
+        self.tokens = 0
+
+    def reset_if_expired(self, now: float) -> None:
+        minute = int(now // 60)
+        if minute != self.minute:
+            self.minute, self.requests, self.tokens = minute, 0, 0
+
+
+def create_app(config: FakeServerConfig) -> FastAPI:
+    app = FastAPI()
+    rng = random.Random(config.seed)
+    window = _Window()
+
+    def rate_limit_headers(now: float) -> dict:
+        reset = f"{math.ceil((window.minute + 1) * 60 - now)}s"
+        return {
+            "x-ratelimit-limit-requests": str(config.requests_per_minute),
+            "x-ratelimit-remaining-requests": str(max(config.requests_per_minute - window.requests, 0)),
+            "x-ratelimit-reset-requests": reset,
+            "x-ratelimit-limit-tokens": str(config.tokens_per_minute),
+            "x-ratelimit-remaining-tokens": str(max(config.tokens_per_minute - window.tokens, 0)),
+            "x-ratelimit-reset-tokens": reset,
+        }
+
+    def rate_limited(headers: dict, retry_after_ms: int) -> JSONResponse:
+        return JSONResponse(
+            status_code=429,
+            content={"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}},
+            headers={**headers, "retry-after-ms": str(retry_after_ms)},
+        )
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        prompt = body["messages"][-1]["content"]
+        prompt_tokens = len(prompt) // 4 + 1
+        now = time.time()
+        window.reset_if_expired(now)
+
+        if (
+            window.requests + 1 > config.requests_per_minute
+            or window.tokens + prompt_tokens > config.tokens_per_minute
+        ):
+            retry_after_ms = int(((window.minute + 1) * 60 - now) * 1000)
+            return rate_limited(rate_limit_headers(now), retry_after_ms)
+        if rng.random() < config.rate_limit_rate:
+            return rate_limited(rate_limit_headers(now), config.retry_after_ms)
+        if rng.random() < config.timeout_rate:
+            await asyncio.sleep(config.timeout_delay)
+
+        if config.latency_median > 0:
+            await asyncio.sleep(
+                rng.lognormvariate(math.log(config.latency_median), config.latency_sigma)
+            )
+
+        content = _completion_content(prompt, body.get("response_format"))
+        completion_tokens = len(content) // 4 + 1
+        window.requests += 1
+        window.tokens += prompt_tokens + completion_tokens
+        headers = rate_limit_headers(time.time())
+
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        if body.get("stream"):
+            return StreamingResponse(
+                _stream_chunks(completion_id, body["model"], content),
+                media_type="text/event-stream",
+                headers=headers,
+            )
+        return JSONResponse(
+            content={
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body["model"],
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                },
+            },
+            headers=headers,
+        )
+
+    return app
+
+
+def _completion_content(prompt: str, response_format: dict | None) -> str:
+    # The text to rewrite follows the style instruction after a blank line
+    text = prompt.split("\n\n")[-1]
+    if response_format and response_format.get("type") == "json_object":
+        return json.dumps({"rewrites": [f"[fake] {item}" for item in json.loads(text)]})
+    return f"[fake] {text}"
+
+
+async def _stream_chunks(completion_id: str, model: str, content: str):
+    words = content.split(" ")
+    for i, word in enumerate(words):
+        delta = word if i == 0 else f" {word}"
+        chunk = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": {"content": delta}, "finish_reason": None}],
+        }
+        yield f"data: {json.dumps(chunk)}\n\n"
+        await asyncio.sleep(0)
+    yield "data: [DONE]\n\n"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--ssl-certfile", help="Serve HTTPS with this certificate")
+    parser.add_argument("--ssl-keyfile", help="Private key of the HTTPS certificate")
+    parser.add_argument("--keep-alive", type=int, default=5, help="Seconds idle connections are kept open")
+    for config_field in fields(FakeServerConfig):
+        parser.add_argument(
+            f"--{config_field.name.replace('_', '-')}",
+            type=type(config_field.default),
+            default=config_field.default,
+        )
+    args = parser.parse_args()
+    config = FakeServerConfig(**{f.name: getattr(args, f.name) for f in fields(FakeServerConfig)})
+
+    import uvicorn
+
+    uvicorn.run(
+        create_app(config),
+        host=args.host,
+        port=args.port,
+        log_level="warning",
+        ssl_certfile=args.ssl_certfile,
+        ssl_keyfile=args.ssl_keyfile,
+        timeout_keep_alive=args.keep_alive,
+    )
+
+
+if __name__ == "__main__":
+    main()
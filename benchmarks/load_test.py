@@ -0,0 +1,258 @@
+"""Load test `/v1/rewrite` end to end against the fake OpenAI-compatible server.
+
+The fake server (see benchmarks.fake_openai_server) is started once, and the
+service is started with uvicorn for each cache backend, configured to call
+the fake server through OPENAI_BASE_URL. Each concurrency level sends
+`--requests` requests from that many concurrent clients, drawing texts from a
+Zipf-like popularity distribution, and reports p50/p95/p99 latency, requests
+per second, error count and the cache hit ratio read from `/metrics`. Every
+level uses its own texts, so it starts with a cold cache.
+
+Results are saved as JSON, by default to the system temp directory so runs
+never touch the working tree, and `--compare` prints the change against an
+earlier results file to spot regressions.
+
+Run with: python -m benchmarks.load_test [--backends memory sqlite shared_memory] [--concurrency 1 8 32] ...
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from typing import Dict, List, Optional
+
+import httpx
+
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_process(
+    args: List[str], env: Dict[str, str], health_url: str, stdout=None
+) -> subprocess.Popen:
+    """Start a server process and wait until its health URL answers."""
+    process = subprocess.Popen([sys.executable, *args], env=env, stdout=stdout)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{' '.join(args)} exited with code {process.returncode}")
+        try:
+            httpx.get(health_url, timeout=1)
+            return process
+        except httpx.TransportError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError(f"{' '.join(args)} did not start within 30 seconds")
+
+
+def stop_process(process: subprocess.Popen) -> None:
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def backend_env(backend: str, workdir: str, redis_url: Optional[str]) -> Dict[str, str]:
+    """Environment variables selecting a cache backend."""
+    env = {"REDIS_URL": "", "CACHE_SQLITE_PATH": "", "CACHE_SHARED_MEMORY_PATH": ""}
+    if backend == "sqlite":
+        env["CACHE_SQLITE_PATH"] = os.path.join(workdir, f"cache-{uuid.uuid4().hex}.db")
+    elif backend == "shared_memory":
+        env["CACHE_SHARED_MEMORY_PATH"] = os.path.join(workdir, f"cache-{uuid.uuid4().hex}.shm")
+    elif backend == "redis":
+        if not redis_url:
+            raise ValueError("The redis backend needs --redis-url")
+        env["REDIS_URL"] = redis_url
+    elif backend != "memory":
+        raise ValueError(f"Unknown cache backend: {backend}")
+    return env
+
+
+async def read_cache_counters(client: httpx.AsyncClient) -> Dict[str, float]:
+    text = (await client.get("/metrics")).text
+    counters = {}
+    for name in ("hits", "misses"):
+        match = re.search(rf"^rewrite_cache_{name}_total (\S+)$", text, re.MULTILINE)
+        counters[name] = float(match.group(1)) if match else 0.0
+    return counters
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(int(q * len(sorted_values)), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+async def run_level(
+    base_url: str, concurrency: int, requests: int, distinct: int, seed: int
+) -> Dict[str, float]:
+    """Send `requests` rewrites from `concurrency` concurrent clients."""
+    rng = random.Random(seed)
+    prefix = uuid.uuid4().hex[:8]
+    texts = [f"{prefix} load test text number {i}" for i in range(distinct)]
+    weights = [1 / (rank + 1) for rank in range(distinct)]
+    workload = rng.choices(texts, weights, k=requests)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        before = await read_cache_counters(client)
+        latencies: List[float] = []
+        errors = 0
+        queue = iter(workload)
+
+        async def worker():
+            nonlocal errors
+            for text in queue:
+                start = time.perf_counter()
+                response = await client.post("/v1/rewrite", json={"text": text, "style": "formal"})
+                latencies.append(time.perf_counter() - start)
+                if response.status_code != 200:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+        after = await read_cache_counters(client)
+
+    hits = after["hits"] - before["hits"]
+    lookups = hits + after["misses"] - before["misses"]
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": errors,
+        "rps": requests / elapsed,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "cache_hit_ratio": hits / lookups if lookups else 0.0,
+    }
+
+
+def format_row(backend: str, result: Dict[str, float]) -> str:
+    return (
+        f"{backend:>13} {result['concurrency']:>6} {result['rps']:>9.1f} "
+        f"{result['p50_ms']:>9.1f} {result['p95_ms']:>9.1f} {result['p99_ms']:>9.1f} "
+        f"{result['cache_hit_ratio']:>7.1%} {result['errors']:>6}"
+    )
+
+
+def compare(results: Dict[str, List[dict]], previous_path: str) -> None:
+    """Print the change of each result against the same backend and concurrency in an earlier run."""
+    with open(previous_path) as f:
+        previous = json.load(f)["results"]
+
+    print(f"\nChange against {previous_path}:")
+    print(f"{'backend':>13} {'conc':>6} {'rps':>9} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for backend, levels in results.items():
+        earlier = {level["concurrency"]: level for level in previous.get(backend, [])}
+        for level in levels:
+            old = earlier.get(level["concurrency"])
+            if old is None:
+                continue
+            changes = [
+                (level[metric] - old[metric]) / old[metric] if old[metric] else 0.0
+                for metric in ("rps", "p50_ms", "p95_ms", "p99_ms")
+            ]
+            print(
+                f"{backend:>13} {level['concurrency']:>6} "
+                + " ".join(f"{change:>+9.1%}" for change in changes)
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--backends",
+        nargs="+",
+        default=["memory", "sqlite"],
+        choices=["memory", "sqlite", "shared_memory", "redis"],
+    )
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8, 32, 128])
+    parser.add_argument("--requests", type=int, default=500, help="Requests per concurrency level")
+    parser.add_argument("--distinct", type=int, default=200, help="Distinct texts per concurrency level")
+    parser.add_argument("--redis-url", help="Redis URL for the redis backend")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Results file, defaults to load_test-<time>.json in the temp directory")
+    parser.add_argument("--compare", help="Earlier results file to compare against")
+    parser.add_argument(
+        "--server-args",
+        default="",
+        help="Extra arguments for the fake server, e.g. '--latency-median 0.2 --rate-limit-rate 0.01'",
+    )
+    args = parser.parse_args()
+
+    fake_port, service_port = free_port(), free_port()
+    fake_server = start_process(
+        ["-m", "benchmarks.fake_openai_server", "--port", str(fake_port), *args.server_args.split()],
+        dict(os.environ),
+        f"http://127.0.0.1:{fake_port}/docs",
+    )
+
+    results: Dict[str, List[dict]] = {}
+    print(f"{'backend':>13} {'conc':>6} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'hits':>7} {'errors':>6}")
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            for backend in args.backends:
+                env = {
+                    **os.environ,
+                    "OPENAI_API_KEY": "fake",
+                    "OPENAI_BASE_URL": f"http://127.0.0.1:{fake_port}/v1",
+                    **backend_env(backend, workdir, args.redis_url),
+                }
+                # The service logs every request, keep that out of the report
+                log = open(os.path.join(workdir, f"service-{backend}.log"), "w")
+                service = start_process(
+                    ["-m", "uvicorn", "app.main:app", "--port", str(service_port), "--log-level", "warning"],
+                    env,
+                    f"http://127.0.0.1:{service_port}/health",
+                    stdout=log,
+                )
+                try:
+                    results[backend] = []
+                    for concurrency in args.concurrency:
+                        result = asyncio.run(
+                            run_level(
+                                f"http://127.0.0.1:{service_port}",
+                                concurrency,
+                                args.requests,
+                                args.distinct,
+                                args.seed,
+                            )
+                        )
+                        results[backend].append(result)
+                        print(format_row(backend, result))
+                finally:
+                    stop_process(service)
+                    log.close()
+    finally:
+        stop_process(fake_server)
+
+    output = args.output or os.path.join(
+        tempfile.gettempdir(), f"load_test-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({"args": vars(args), "created_at": time.time(), "results": results}, f, indent=2)
+    print(f"\nSaved results to {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Measure the requests/sec of `/v1/rewrite` under different logging setups.
+
+Each setup runs the app in a fresh process, as the logging configuration is
+read on import, and sends cache-hit rewrites to it in-process through httpx's
+ASGI transport, so only the app and its logging are measured. The setups
+range from logging off to the former synchronous DEBUG logging to stdout.
+
+With `--slow-stdout`, stdout is read by a deliberately slow consumer, like a
+log shipper that falls behind, to show how much each setup stalls the event
+loop when stdout backs up.
+
+Run with: python -m benchmarks.logging_overhead [--requests 5000] [--concurrency 16] [--repeat 3] [--slow-stdout]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from typing import Dict
+
+SETUPS: Dict[str, Dict[str, str]] = {
+    "off": {"LOG_LEVEL": "CRITICAL"},
+    "sync debug text": {"LOG_LEVEL": "DEBUG", "LOG_ASYNC": "false"},
+    "async debug text": {"LOG_LEVEL": "DEBUG"},
+    "async info text": {"LOG_LEVEL": "INFO"},
+    "async info json": {"LOG_LEVEL": "INFO", "LOG_FORMAT": "json"},
+    "async info json 1%": {"LOG_LEVEL": "INFO", "LOG_FORMAT": "json", "LOG_SAMPLE_RATES": "/v1/rewrite=0.01"},
+}
+
+
+async def measure(requests: int, concurrency: int) -> float:
+    """Requests/sec of cache-hit rewrites sent from `concurrency` concurrent clients."""
+    import httpx
+
+    from app.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        payload = {"text": "Logging benchmark text", "style": "formal"}
+        await client.post("/v1/rewrite", json=payload)
+        remaining = iter(range(requests))
+
+        async def worker():
+            for _ in remaining:
+                await client.post("/v1/rewrite", json=payload)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return requests / (time.perf_counter() - start)
+
+
+def _drain_slowly(stream, chunk_size: int = 4096, delay: float = 0.002) -> None:
+    while stream.read(chunk_size):
+        time.sleep(delay)
+
+
+def run_setup(settings: Dict[str, str], args: argparse.Namespace) -> float:
+    env = {
+        **os.environ,
+        "OPENAI_API_KEY": "",
+        "REDIS_URL": "",
+        "CACHE_SQLITE_PATH": "",
+        "CACHE_SHARED_MEMORY_PATH": "",
+        "SERVER_TIMING_ENABLED": "false",
+        **settings,
+    }
+    process = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.logging_overhead", "--worker",
+         "--requests", str(args.requests), "--concurrency", str(args.concurrency)],
+        env=env,
+        stdout=subprocess.PIPE if args.slow_stdout else subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+    )
+    drain = None
+    if args.slow_stdout:
+        drain = threading.Thread(target=_drain_slowly, args=(process.stdout,))
+        drain.start()
+    stderr = process.stderr.read()
+    process.wait()
+    if drain is not None:
+        drain.join()
+    if process.returncode != 0:
+        raise RuntimeError(stderr.decode())
+    # The worker reports its result as the last line of stderr
+    return json.loads(stderr.decode().strip().splitlines()[-1])["rps"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per setup, the best one counts")
+    parser.add_argument("--slow-stdout", action="store_true", help="Read stdout with a slow consumer")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        rps = asyncio.run(measure(args.requests, args.concurrency))
+        print(json.dumps({"rps": rps}), file=sys.stderr)
+        return
+
+    print(f"requests: {args.requests}, concurrency: {args.concurrency}, slow stdout: {args.slow_stdout}")
+    baseline = None
+    for name, settings in SETUPS.items():
+        rps = max(run_setup(settings, args) for _ in range(args.repeat))
+        baseline = baseline or rps
+        print(f"{name:>20} {rps:>9.1f} req/s {rps / baseline - 1:>+8.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Compare the hit rate of the in-memory cache modes at a fixed memory budget.
+
+The workload draws texts from a Zipf-like popularity distribution, with sizes
+spread up to the 5000 character limit. An entry-bounded cache must be sized
+for the largest possible entry to stay within the budget, while the
+byte-bounded modes fit as many entries as the budget allows.
+
+Run with: python -m benchmarks.memory_cache_hit_rate [budget_bytes] [requests]
+"""
+
+import asyncio
+import random
+import sys
+import time
+
+from app.cache.memory_cache import InMemoryCache
+
+WORDS = (
+    "the service rewrites plain text into different styles using a language model "
+    "and caches every result so that identical requests are served without calling "
+    "the model again while popular texts are requested many times a day"
+).split()
+
+MAX_TEXT_LENGTH = 5000
+# Worst case size of an entry, allowing for multi-byte characters and overhead
+MAX_ENTRY_BYTES = MAX_TEXT_LENGTH * 2
+
+
+def make_text(rng: random.Random) -> str:
+    length = min(int(rng.paretovariate(1.2) * 200), MAX_TEXT_LENGTH)
+    words = []
+    while sum(len(word) + 1 for word in words) < length:
+        words.append(rng.choice(WORDS))
+    return " ".join(words)[:length]
+
+
+def make_workload(requests: int, distinct: int, seed: int = 42):
+    rng = random.Random(seed)
+    texts = [make_text(rng) for _ in range(distinct)]
+    weights = [1 / (rank + 1) for rank in range(distinct)]
+    keys = rng.choices(range(distinct), weights=weights, k=requests)
+    return texts, keys
+
+
+async def run(cache: InMemoryCache, texts, keys):
+    hits = 0
+    start = time.perf_counter()
+    for index in keys:
+        key = f"{index:064d}"
+        if await cache.get(key) is not None:
+            hits += 1
+        else:
+            await cache.set(key, texts[index])
+    elapsed = time.perf_counter() - start
+    return hits / len(keys), elapsed / len(keys)
+
+
+def main() -> None:
+    budget = int(sys.argv[1]) if len(sys.argv) > 1 else 4 * 1024 * 1024
+    requests = int(sys.argv[2]) if len(sys.argv) > 2 else 200_000
+    texts, keys = make_workload(requests, distinct=50_000)
+
+    caches = {
+        "entry-bounded": InMemoryCache(maxsize=budget // MAX_ENTRY_BYTES),
+        "byte-bounded": InMemoryCache(max_bytes=budget),
+        "byte-bounded+zlib": InMemoryCache(max_bytes=budget, compress_threshold=256),
+    }
+
+    print(f"budget: {budget} bytes, requests: {requests}")
+    for name, cache in caches.items():
+        hit_rate, per_request = asyncio.run(run(cache, texts, keys))
+        print(
+            f"{name:<20} hit rate {hit_rate:6.1%}  entries {len(cache._cache):>6}  "
+            f"{per_request * 1e6:6.2f} us/request"
+        )
+
+
+if __name__ == "__main__":
+    main()
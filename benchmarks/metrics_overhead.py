@@ -0,0 +1,67 @@
+"""Measure the cost of the Prometheus instrumentation on the cache-hit path.
+
+Set PROMETHEUS_MULTIPROC_DIR to measure it in multiprocess mode, or see
+benchmarks.multiprocess_metrics_overhead to compare both modes.
+
+Run with: python -m benchmarks.metrics_overhead [iterations]
+"""
+
+import asyncio
+import sys
+import time
+
+from app.cache.memory_cache import InMemoryCache
+from app.llm_adapter.mock_adapter import MockLLMAdapter
+from app.metrics.prometheus_metrics import CACHE_HITS, CACHE_LATENCY, REQUEST_LATENCY
+from app.model.enums import StyleEnum
+from app.service.rewrite_service import RewriteService
+
+
+async def time_cache_hits(service: RewriteService, iterations: int) -> float:
+    """Average seconds per cache-hit rewrite, including its instrumentation."""
+    await service.rewrite("Benchmark text", StyleEnum.FORMAL)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        with REQUEST_LATENCY.labels(style="formal", adapter="mock").time():
+            await service.rewrite("Benchmark text", StyleEnum.FORMAL)
+    return (time.perf_counter() - start) / iterations
+
+
+def time_instrumentation(iterations: int) -> float:
+    """Average seconds spent on the metric updates of one cache-hit request."""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        with REQUEST_LATENCY.labels(style="formal", adapter="mock").time():
+            with CACHE_LATENCY.labels(
+                operation="get", style="formal", adapter="mock"
+            ).time():
+                pass
+            CACHE_HITS.inc()
+    return (time.perf_counter() - start) / iterations
+
+
+def time_increment(iterations: int) -> float:
+    """Average seconds per counter increment."""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        CACHE_HITS.inc()
+    return (time.perf_counter() - start) / iterations
+
+
+def main() -> None:
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    service = RewriteService(MockLLMAdapter(), InMemoryCache())
+
+    per_request = asyncio.run(time_cache_hits(service, iterations))
+    per_instrumentation = time_instrumentation(iterations)
+    per_increment = time_increment(iterations)
+
+    print(f"iterations:                  {iterations}")
+    print(f"cache-hit request:           {per_request * 1e6:.2f} us")
+    print(f"instrumentation per request: {per_instrumentation * 1e6:.2f} us")
+    print(f"instrumentation share:       {per_instrumentation / per_request:.1%}")
+    print(f"counter increment:           {per_increment * 1e6:.2f} us")
+
+
+if __name__ == "__main__":
+    main()
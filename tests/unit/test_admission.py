@@ -0,0 +1,195 @@
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.cache.memory_cache import InMemoryCache
+from app.exception.custom_exceptions import (
+    CircuitOpenError,
+    LLMError,
+    LLMRateLimitError,
+    ServiceOverloadedError,
+)
+from app.llm_adapter.base import LLMAdapter
+from app.model.enums import StyleEnum
+from app.service.admission import (
+    AdmissionController,
+    CircuitBreaker,
+    CircuitState,
+    Priority,
+)
+from app.service.rewrite_service import RewriteService
+
+
+@pytest.mark.asyncio
+async def test_admission_caps_in_flight_calls():
+    """Test that calls beyond the cap wait for a slot and excess calls are rejected."""
+    admission = AdmissionController(max_in_flight=1, max_queue=1, queue_timeout=1)
+    release = asyncio.Event()
+
+    async def hold_slot():
+        async with admission.slot():
+            await release.wait()
+
+    holder = asyncio.create_task(hold_slot())
+    queued = asyncio.create_task(hold_slot())
+    await asyncio.sleep(0)
+
+    assert admission.in_flight == 1
+    assert admission.queued == 1
+
+    # The queue is full
+    with pytest.raises(ServiceOverloadedError):
+        async with admission.slot():
+            pass
+
+    release.set()
+    await asyncio.gather(holder, queued)
+    assert admission.in_flight == 0
+    assert admission.queued == 0
+
+
+@pytest.mark.asyncio
+async def test_admission_queue_timeout():
+    """Test that a call waiting longer than the queue timeout is rejected."""
+    admission = AdmissionController(max_in_flight=1, max_queue=10, queue_timeout=0.05)
+
+    async with admission.slot():
+        with pytest.raises(ServiceOverloadedError):
+            async with admission.slot():
+                pass
+
+    assert admission.queued == 0
+    # The slot is free again once the holder is done
+    async with admission.slot():
+        assert admission.in_flight == 1
+
+
+@pytest.mark.asyncio
+async def test_admission_prefers_interactive_calls():
+    """Test that a queued interactive call is admitted before earlier background calls."""
+    admission = AdmissionController(max_in_flight=1, max_queue=10, queue_timeout=1)
+    order = []
+
+    async def call(name, priority):
+        async with admission.slot(priority):
+            order.append(name)
+
+    async with admission.slot():
+        tasks = [
+            asyncio.create_task(call("background1", Priority.BACKGROUND)),
+            asyncio.create_task(call("background2", Priority.BACKGROUND)),
+            asyncio.create_task(call("interactive", Priority.INTERACTIVE)),
+        ]
+        await asyncio.sleep(0)
+        assert admission.queued == 3
+
+    await asyncio.gather(*tasks)
+    assert order == ["interactive", "background1", "background2"]
+    assert admission.in_flight == 0
+
+
+async def _fail():
+    raise LLMError("boom")
+
+
+@pytest.mark.asyncio
+async def test_circuit_breaker_opens_and_recovers():
+    """Test that the breaker opens on failures and closes after a successful probe."""
+    breaker = CircuitBreaker(failure_rate_threshold=0.5, min_calls=4, cooldown=0.05)
+
+    for _ in range(4):
+        with pytest.raises(LLMError):
+            async with breaker.guard():
+                await _fail()
+
+    assert breaker.state == CircuitState.OPEN
+    with pytest.raises(CircuitOpenError):
+        async with breaker.guard():
+            pass
+
+    await asyncio.sleep(0.06)
+
+    async with breaker.guard():
+        assert breaker.state == CircuitState.HALF_OPEN
+
+    assert breaker.state == CircuitState.CLOSED
+
+
+@pytest.mark.asyncio
+async def test_circuit_breaker_opens_on_slow_calls():
+    """Test that calls slower than the latency threshold count as failures."""
+    breaker = CircuitBreaker(latency_threshold=0.01, min_calls=2)
+
+    for _ in range(2):
+        async with breaker.guard():
+            await asyncio.sleep(0.02)
+
+    assert breaker.state == CircuitState.OPEN
+
+
+@pytest.mark.asyncio
+async def test_circuit_breaker_cancelled_probe_lets_next_call_probe():
+    """Test that a cancelled probe leaves the breaker half open, so the next call is the probe."""
+    breaker = CircuitBreaker(min_calls=2, cooldown=0.05)
+    for _ in range(2):
+        with pytest.raises(LLMError):
+            async with breaker.guard():
+                await _fail()
+    await asyncio.sleep(0.06)
+
+    async def probe():
+        async with breaker.guard():
+            await asyncio.sleep(10)
+
+    task = asyncio.create_task(probe())
+    await asyncio.sleep(0)
+    assert breaker.state == CircuitState.HALF_OPEN
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert breaker.state == CircuitState.HALF_OPEN
+    breaker.check()
+
+    async with breaker.guard():
+        pass
+    assert breaker.state == CircuitState.CLOSED
+
+
+@pytest.mark.asyncio
+async def test_circuit_breaker_ignores_rate_limits():
+    """Test that rate limited calls never open the breaker, as the adapter itself is healthy."""
+    breaker = CircuitBreaker(min_calls=2)
+    for _ in range(5):
+        with pytest.raises(LLMRateLimitError):
+            async with breaker.guard():
+                raise LLMRateLimitError("Rate limit budget exhausted")
+
+    assert breaker.state == CircuitState.CLOSED
+    breaker.check()
+
+
+@pytest.mark.asyncio
+async def test_cache_hits_served_while_circuit_open():
+    """Test that an open breaker rejects LLM calls but not cache hits."""
+    adapter = AsyncMock(spec=LLMAdapter)
+    adapter.rewrite.side_effect = LLMError("boom")
+    cache = InMemoryCache()
+    await cache.set(cache.generate_key("cached", StyleEnum.FORMAL), "Cached rewrite")
+    service = RewriteService(
+        adapter, cache, circuit_breaker=CircuitBreaker(min_calls=2, cooldown=60)
+    )
+
+    for text in ["one", "two"]:
+        with pytest.raises(LLMError):
+            await service.rewrite(text, StyleEnum.FORMAL)
+
+    with pytest.raises(CircuitOpenError) as exc_info:
+        await service.rewrite("three", StyleEnum.FORMAL)
+    assert exc_info.value.status_code == 503
+    assert exc_info.value.retry_after > 1
+
+    result = await service.rewrite("cached", StyleEnum.FORMAL)
+    assert result.rewritten_text == "Cached rewrite"
+    assert adapter.rewrite.call_count == 2
@@ -1,3 +1,5 @@
+import json
+
 import pytest
 from fastapi.testclient import TestClient
 
@@ -64,3 +66,153 @@ def test_rewrite_endpoint_invalid_style(client):
     assert response.status_code == 400
     error_response = response.json()
     assert "Style must be one of: " in error_response["error"]["message"]
+
+
+def test_rewrite_endpoint_malformed_body(client):
+    """Test that bodies that are not a JSON rewrite request return 422."""
+    for content in (b"{not json", b'{"style": "formal"}', b"[1]"):
+        response = client.post(
+            "/v1/rewrite", content=content, headers={"Content-Type": "application/json"}
+        )
+
+        assert response.status_code == 422
+        assert response.json()["detail"][0]["loc"][0] == "body"
+
+    assert client.post("/v1/rewrite", content=b'{"text": "Hi"}').status_code == 422
+
+
+@pytest.mark.parametrize(
+    "content, error",
+    [
+        (
+            b'{"text": 1, "style": "formal"}',
+            {"type": "string_type", "loc": ["body", "text"], "msg": "Input should be a valid string", "input": 1},
+        ),
+        (
+            b'{"text": "Hi", "style": null}',
+            {"type": "string_type", "loc": ["body", "style"], "msg": "Input should be a valid string", "input": None},
+        ),
+        (b"null", {"type": "missing", "loc": ["body"], "msg": "Field required", "input": None}),
+        (
+            b'"text"',
+            {
+                "type": "model_attributes_type",
+                "loc": ["body"],
+                "msg": "Input should be a valid dictionary or object to extract fields from",
+                "input": "text",
+            },
+        ),
+        (
+            b"{bad",
+            {
+                "type": "json_invalid",
+                "loc": ["body", 1],
+                "msg": "JSON decode error",
+                "input": {},
+                "ctx": {"error": "Expecting property name enclosed in double quotes"},
+            },
+        ),
+    ],
+)
+def test_rewrite_endpoint_invalid_body_errors(client, content, error):
+    """Test that invalid bodies get the same validation errors as FastAPI's own body parsing."""
+    response = client.post("/v1/rewrite", content=content, headers={"Content-Type": "application/json"})
+
+    assert response.status_code == 422
+    assert response.json() == {"detail": [error]}
+
+
+def test_rewrite_batch_endpoint(client):
+    """Test that batch results come back in input order with per-item errors."""
+    payload = {
+        "items": [
+            {"text": "Hello world", "style": "pirate"},
+            {"text": "", "style": "formal"},
+            {"text": "Good day"},
+        ]
+    }
+
+    response = client.post("/v1/rewrite/batch", json=payload)
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+
+    assert len(results) == 3
+    assert results[0]["result"]["original_text"] == "Hello world"
+    assert results[0]["result"]["style"] == "pirate"
+    assert results[1]["error"]["message"] == "Text cannot be empty"
+    assert results[1]["result"] is None
+    assert results[2]["result"]["style"] == "formal"
+
+
+def test_rewrite_batch_endpoint_empty(client):
+    """Test that an empty batch returns 400."""
+    response = client.post("/v1/rewrite/batch", json={"items": []})
+
+    assert response.status_code == 400
+    assert response.json()["error"]["message"] == "Batch must contain at least one item"
+
+
+def test_rewrite_stream_endpoint(client):
+    """Test that the streaming endpoint sends the rewrite as Server-Sent Events."""
+    payload = {"text": "Hello streaming world", "style": "pirate"}
+
+    response = client.post("/v1/rewrite/stream", json=payload)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+
+    events = [event for event in response.text.split("\n\n") if event]
+    deltas = [json.loads(event.removeprefix("data: "))["delta"] for event in events[:-1]]
+
+    assert "".join(deltas) == "[*pirate*] Hello streaming world [*pirate*]"
+    assert events[-1].startswith("event: done")
+
+
+def test_rewrite_stream_endpoint_empty_text(client):
+    """Test that validation errors are returned before the stream starts."""
+    response = client.post("/v1/rewrite/stream", json={"text": "", "style": "formal"})
+
+    assert response.status_code == 400
+    assert response.json()["error"]["message"] == "Text cannot be empty"
+
+
+def test_metrics_endpoint_exposes_latency_histograms(client):
+    """Test that rewrite requests are reflected in the latency histograms."""
+    client.post("/v1/rewrite", json={"text": "Hello metrics", "style": "haiku"})
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert 'rewrite_request_duration_seconds_count{adapter="mock",style="haiku"}' in response.text
+    assert 'rewrite_llm_request_duration_seconds_count{adapter="mock",style="haiku"}' in response.text
+    assert "rewrite_requests_in_flight" in response.text
+
+
+def test_rewrite_endpoint_server_timing(client):
+    """Test that rewrite responses report their spans in a Server-Timing header."""
+    response = client.post("/v1/rewrite", json={"text": "Hello timing", "style": "pirate"})
+
+    assert response.status_code == 200
+    spans = dict(
+        entry.split(";dur=") for entry in response.headers["Server-Timing"].split(", ")
+    )
+    assert {"parse", "cache_key", "cache_get", "llm", "cache_set", "total"} <= spans.keys()
+    assert float(spans["total"]) >= float(spans["llm"])
+    assert "Server-Timing" not in client.get("/health").headers
+
+
+def test_profile_endpoint_guarded_by_token(client, monkeypatch):
+    """Test that the profiler is hidden without a token, and returns folded stacks with it."""
+    monkeypatch.setattr("app.main.PROFILING_TOKEN", None)
+    assert client.get("/debug/profile?seconds=0.05").status_code == 404
+
+    monkeypatch.setattr("app.main.PROFILING_TOKEN", "secret")
+    assert client.get("/debug/profile?seconds=0.05").status_code == 403
+
+    response = client.get(
+        "/debug/profile?seconds=0.05", headers={"Authorization": "Bearer secret"}
+    )
+    assert response.status_code == 200
+    stack, count = response.text.splitlines()[0].rsplit(" ", 1)
+    assert int(count) > 0 and ";" in stack
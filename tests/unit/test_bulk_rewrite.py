@@ -0,0 +1,93 @@
+import argparse
+import json
+
+import pytest
+
+from app.cache.memory_cache import InMemoryCache
+from app.cli import bulk_rewrite as bulk_rewrite_cli
+from app.cli.bulk_rewrite import bulk_rewrite
+from app.llm_adapter.mock_adapter import MockLLMAdapter
+from app.service.rewrite_service import RewriteService
+
+
+def _write_input(path, records):
+    path.write_text("".join(json.dumps(record) + "\n" for record in records))
+
+
+@pytest.mark.asyncio
+async def test_bulk_rewrite_writes_results_in_order(tmp_path):
+    """Test that every record gets a result or an error, in input order."""
+    input_path, output_path = tmp_path / "input.jsonl", tmp_path / "output.jsonl"
+    _write_input(
+        input_path,
+        [{"text": f"Text {i}", "style": "pirate"} for i in range(20)]
+        + [{"text": "", "style": "formal"}, {"text": "Text 0", "style": "pirate"}],
+    )
+    service = RewriteService(MockLLMAdapter(), InMemoryCache())
+
+    summary = await bulk_rewrite(service, str(input_path), str(output_path), concurrency=3)
+
+    results = [json.loads(line) for line in output_path.read_text().splitlines()]
+    assert [r["original_text"] for r in results[:20]] == [f"Text {i}" for i in range(20)]
+    assert results[20] == {"error": {"message": "Text cannot be empty"}}
+    assert results[21]["rewritten_text"] == "[*pirate*] Text 0 [*pirate*]"
+
+    assert summary.records == 22
+    assert summary.errors == 1
+    assert summary.cache_hits == 1
+    assert not (tmp_path / "output.jsonl.checkpoint").exists()
+
+
+@pytest.mark.asyncio
+async def test_bulk_rewrite_resumes_from_checkpoint(tmp_path):
+    """Test that an interrupted run resumes after the last checkpointed record."""
+    input_path, output_path = tmp_path / "input.jsonl", tmp_path / "output.jsonl"
+    _write_input(input_path, [{"text": f"Text {i}", "style": "haiku"} for i in range(5)])
+
+    # Simulate a run interrupted after checkpointing two records and writing part of a third
+    done = "".join(
+        json.dumps({"original_text": f"Text {i}", "rewritten_text": "done", "style": "haiku"}) + "\n"
+        for i in range(2)
+    )
+    output_path.write_text(done + '{"original_te')
+    (tmp_path / "output.jsonl.checkpoint").write_text(
+        json.dumps({"lines_done": 2, "output_offset": len(done)})
+    )
+    service = RewriteService(MockLLMAdapter(), InMemoryCache())
+
+    summary = await bulk_rewrite(service, str(input_path), str(output_path))
+
+    results = [json.loads(line) for line in output_path.read_text().splitlines()]
+    assert [r["original_text"] for r in results] == [f"Text {i}" for i in range(5)]
+    assert [r["rewritten_text"] for r in results[:2]] == ["done", "done"]
+    assert summary.records == 3
+    assert summary.skipped == 2
+
+
+class _LifecycleAdapter(MockLLMAdapter):
+    def __init__(self):
+        self.events = []
+
+    async def start(self):
+        self.events.append("start")
+
+    async def close(self):
+        self.events.append("close")
+
+
+@pytest.mark.asyncio
+async def test_bulk_rewrite_cli_starts_and_closes_adapter(tmp_path, monkeypatch):
+    """Test that the CLI opens the LLM adapter before the run and closes it afterwards."""
+    input_path, output_path = tmp_path / "input.jsonl", tmp_path / "output.jsonl"
+    _write_input(input_path, [{"text": "Text", "style": "pirate"}])
+    adapter = _LifecycleAdapter()
+    monkeypatch.setattr(bulk_rewrite_cli, "get_llm_adapter", lambda: adapter)
+    monkeypatch.setattr(bulk_rewrite_cli, "get_cache", InMemoryCache)
+    args = argparse.Namespace(
+        input=str(input_path), output=str(output_path), concurrency=1, checkpoint=None, checkpoint_every=100
+    )
+
+    await bulk_rewrite_cli._main(args)
+
+    assert adapter.events == ["start", "close"]
+    assert output_path.read_text().count("\n") == 1
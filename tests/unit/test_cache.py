@@ -1,6 +1,16 @@
+import asyncio
+import threading
+from unittest.mock import AsyncMock
+
+import fakeredis
 import pytest
 
 from app.cache.memory_cache import InMemoryCache
+from app.cache.redis_cache import RedisCache
+from app.cache.shared_memory_cache import SharedMemoryCache
+from app.cache.sqlite_cache import SqliteCache
+from app.cache.tiered_cache import TieredCache
+from app.metrics.prometheus_metrics import cache_registry
 
 
 @pytest.mark.asyncio
@@ -37,3 +47,330 @@ async def test_memory_cache_lru():
     # key2 and key4 should still be in cache
     assert await cache.get("key2") == "value2"
     assert await cache.get("key4") == "value4"
+
+
+@pytest.mark.asyncio
+async def test_memory_cache_ttl():
+    """Test that entries set with a TTL expire."""
+    cache = InMemoryCache()
+
+    await cache.set("key1", "value1", ttl=0.05)
+    await cache.set("key2", "value2")
+    assert await cache.get("key1") == "value1"
+
+    await asyncio.sleep(0.1)
+
+    assert await cache.get("key1") is None
+    assert await cache.get("key2") == "value2"
+
+
+@pytest.fixture
+def redis_server():
+    """Create an in-process Redis stand-in."""
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture
+def redis_cache(redis_server):
+    """Create a Redis cache backed by the in-process Redis stand-in."""
+    client = fakeredis.FakeAsyncRedis(server=redis_server, decode_responses=True)
+    return RedisCache("redis://localhost", client=client, failure_backoff=0.05)
+
+
+@pytest.mark.asyncio
+async def test_redis_cache_get_set(redis_cache):
+    """Test single and bulk reads and writes against Redis."""
+    assert await redis_cache.get("key1") is None
+
+    await redis_cache.set("key1", "value1")
+    await redis_cache.set_many({"key2": "value2", "key3": "value3"})
+
+    assert await redis_cache.get("key1") == "value1"
+    assert await redis_cache.get_many(["key1", "missing", "key3"]) == [
+        "value1",
+        None,
+        "value3",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_redis_cache_ttl(redis_cache):
+    """Test that entries set with a TTL expire in Redis."""
+    await redis_cache.set("key1", "value1", ttl=0.05)
+    await redis_cache.set_many({"key2": "value2"}, ttl=0.05)
+
+    await asyncio.sleep(0.1)
+
+    assert await redis_cache.get_many(["key1", "key2"]) == [None, None]
+
+
+@pytest.mark.asyncio
+async def test_redis_cache_add_and_delete(redis_cache):
+    """Test set-if-absent semantics used for cross-worker locks."""
+    assert await redis_cache.add("lock", "1", ttl=10) is True
+    assert await redis_cache.add("lock", "2", ttl=10) is False
+
+    await redis_cache.delete("lock")
+
+    assert await redis_cache.add("lock", "3", ttl=10) is True
+
+
+@pytest.mark.asyncio
+async def test_redis_cache_fails_open(redis_server, redis_cache):
+    """Test that an unavailable Redis behaves like a cache miss."""
+    await redis_cache.set("key1", "value1")
+    redis_server.connected = False
+
+    assert await redis_cache.get("key1") is None
+    assert await redis_cache.get_many(["key1", "key2"]) == [None, None]
+    await redis_cache.set("key2", "value2")
+
+    # Once the backoff expires the cache is used again
+    redis_server.connected = True
+    await asyncio.sleep(0.1)
+    assert await redis_cache.get("key1") == "value1"
+
+
+@pytest.mark.asyncio
+async def test_sqlite_cache_reads_batch_being_flushed(tmp_path):
+    """Test that values stay readable while the flush writing them is in progress."""
+    cache = SqliteCache(str(tmp_path / "cache.db"), flush_interval=60)
+    write, committing = cache._write, threading.Event()
+
+    def slow_write(*args):
+        committing.wait()
+        write(*args)
+
+    cache._write = slow_write
+    await cache.set("key1", "value1")
+    flush = asyncio.create_task(cache.flush())
+    await asyncio.sleep(0.01)
+
+    assert not cache._pending
+    assert await cache.get("key1") == "value1"
+
+    committing.set()
+    await flush
+    assert await cache.get("key1") == "value1"
+    await cache.close()
+
+
+@pytest.mark.asyncio
+async def test_tiered_cache_read_through_and_backfill():
+    """Test that L2 hits are backfilled into L1 and writes go to both tiers."""
+    l1, l2 = InMemoryCache(), InMemoryCache()
+    cache = TieredCache(l2, l1=l1, l1_ttl=0.05)
+
+    await l2.set("key1", "value1")
+    assert await l1.get("key1") is None
+
+    # L2 hit backfills L1
+    assert await cache.get("key1") == "value1"
+    assert await l1.get("key1") == "value1"
+
+    # Writes go through to both tiers
+    await cache.set("key2", "value2")
+    assert await l1.get("key2") == "value2"
+    assert await l2.get("key2") == "value2"
+
+    # L1 entries expire after the short L1 TTL, L2 entries remain
+    await asyncio.sleep(0.1)
+    assert await l1.get("key2") is None
+    assert await cache.get("key2") == "value2"
+
+
+@pytest.mark.asyncio
+async def test_tiered_cache_get_many():
+    """Test that bulk reads only go to L2 for the L1 misses."""
+    l1 = InMemoryCache()
+    l2 = AsyncMock(spec=InMemoryCache)
+    l2.get_many.return_value = ["value2", None]
+    cache = TieredCache(l2, l1=l1)
+
+    await l1.set("key1", "value1")
+
+    assert await cache.get_many(["key1", "key2", "key3"]) == ["value1", "value2", None]
+    l2.get_many.assert_called_once_with(["key2", "key3"])
+    assert await l1.get("key2") == "value2"
+
+
+@pytest.mark.asyncio
+async def test_tiered_cache_keeps_lock_keys_out_of_l1():
+    """Test that a lock released by another worker is not served from L1."""
+    l1, l2 = InMemoryCache(), InMemoryCache()
+    cache = TieredCache(l2, l1=l1)
+
+    assert await cache.add("lock:key1", "1")
+    assert await cache.get("lock:key1") == "1"
+    await cache.set("ratelimit:requests", "3")
+    assert await cache.get_many(["lock:key1", "ratelimit:requests"]) == ["1", "3"]
+    assert await l1.get_many(["lock:key1", "ratelimit:requests"]) == [None, None]
+
+    # Released by the holder in another worker
+    await l2.delete("lock:key1")
+    assert await cache.get("lock:key1") is None
+
+
+@pytest.mark.asyncio
+async def test_tiered_cache_soft_ttl_keeps_stale_markers_out_of_l1():
+    """Test that soft expiry is kept with the L1 value, without stale_at: entries or lookups."""
+    l1, l2 = InMemoryCache(), InMemoryCache()
+    cache = TieredCache(l2, l1=l1)
+    await cache.set_entry("stale", "old", soft_ttl=0.05)
+    await cache.set_entry("fresh", "new", soft_ttl=60)
+    await asyncio.sleep(0.06)
+
+    def lookups(result):
+        value = cache_registry.get_sample_value("rewrite_cache_tier_lookups_total", {"result": result})
+        return value or 0
+
+    before = {result: lookups(result) for result in ("l1_hit", "l2_hit", "miss")}
+    assert await cache.get_entries(["stale", "fresh", "missing"]) == [
+        ("old", False),
+        ("new", True),
+        (None, True),
+    ]
+    assert {result: lookups(result) - before[result] for result in before} == {
+        "l1_hit": 2,
+        "l2_hit": 0,
+        "miss": 1,
+    }
+    assert len(l1._cache) == 2
+
+    # Backfilled from L2 with its freshness
+    other = TieredCache(l2, l1=InMemoryCache())
+    assert await other.get_entries(["stale", "fresh"]) == [("old", False), ("new", True)]
+    assert await other.l1.get_entries(["stale", "fresh"]) == [("old", False), ("new", True)]
+
+
+@pytest.mark.asyncio
+async def test_sqlite_cache_persists_across_restarts(tmp_path):
+    """Test that buffered writes are flushed and survive reopening the database."""
+    path = str(tmp_path / "cache.db")
+    cache = SqliteCache(path, flush_interval=60)
+
+    await cache.set("key1", "value1")
+    await cache.set_many({"key2": "value2"}, ttl=60)
+
+    # Pending writes are visible before they are flushed
+    assert await cache.get_many(["key1", "key2", "key3"]) == ["value1", "value2", None]
+    await cache.close()
+
+    reopened = SqliteCache(path)
+    assert await reopened.get_many(["key1", "key2"]) == ["value1", "value2"]
+    await reopened.close()
+
+
+@pytest.mark.asyncio
+async def test_sqlite_cache_ttl_and_eviction(tmp_path):
+    """Test expiry and that the least recently read entries are evicted first."""
+    cache = SqliteCache(str(tmp_path / "cache.db"), max_entries=2, flush_batch_size=1)
+
+    await cache.set("expiring", "value", ttl=0.05)
+    await asyncio.sleep(0.1)
+    assert await cache.get("expiring") is None
+
+    await cache.set("key1", "value1")
+    await asyncio.sleep(0.01)
+    await cache.set("key2", "value2")
+    await asyncio.sleep(0.01)
+    # Reading key1 makes key2 the least recently used entry
+    assert await cache.get("key1") == "value1"
+    await cache.flush()
+    await cache.set("key3", "value3")
+
+    assert await cache.get_many(["key1", "key2", "key3"]) == ["value1", None, "value3"]
+    await cache.close()
+
+
+@pytest.mark.asyncio
+async def test_sqlite_cache_add_incr_delete(tmp_path):
+    """Test the atomic operations used for locks and counters."""
+    cache = SqliteCache(str(tmp_path / "cache.db"))
+
+    assert await cache.add("lock", "1", ttl=10) is True
+    assert await cache.add("lock", "2", ttl=10) is False
+    await cache.delete("lock")
+    assert await cache.add("lock", "3") is True
+
+    assert await cache.incr("counter", 2) == 2
+    assert await cache.incr("counter", 3) == 5
+    await cache.close()
+
+
+@pytest.mark.asyncio
+async def test_memory_cache_byte_budget():
+    """Test that a byte-bounded cache evicts by size rather than entry count."""
+    cache = InMemoryCache(max_bytes=3000)
+
+    await cache.set("small1", "x" * 100)
+    await cache.set("small2", "x" * 100)
+    assert cache.currsize <= 3000
+
+    # A large value evicts the least recently used entries to fit the budget
+    await cache.set("large", "y" * 2500)
+    assert await cache.get("large") == "y" * 2500
+    assert await cache.get("small1") is None
+    assert cache.currsize <= 3000
+
+    # Values that can never fit are not cached
+    await cache.set("huge", "z" * 5000)
+    assert await cache.get("huge") is None
+    assert await cache.get("large") == "y" * 2500
+
+
+@pytest.mark.asyncio
+async def test_memory_cache_compression():
+    """Test that compressed values round-trip and take less of the byte budget."""
+    plain = InMemoryCache(max_bytes=100_000)
+    compressed = InMemoryCache(max_bytes=100_000, compress_threshold=256)
+    value = "The quick brown fox jumps over the lazy dog. " * 100
+
+    await plain.set("key", value)
+    await compressed.set("key", value)
+    await compressed.set("short", "Short value")
+
+    assert await compressed.get("key") == value
+    assert await compressed.get("short") == "Short value"
+    assert compressed.currsize < plain.currsize / 5
+
+
+@pytest.mark.asyncio
+async def test_cache_soft_ttl(tmp_path):
+    """Test that entries turn stale after their soft TTL, natively and through the generic fallback."""
+    sqlite_cache = SqliteCache(str(tmp_path / "cache.db"))
+    shared_memory_cache = SharedMemoryCache(str(tmp_path / "cache.shm"), max_entries=64)
+    for cache in [InMemoryCache(), sqlite_cache, shared_memory_cache]:
+        await cache.set_entry("stale", "old", soft_ttl=0.05)
+        await cache.set_entry("fresh", "new", soft_ttl=60)
+        await cache.set("plain", "value")
+
+        await asyncio.sleep(0.06)
+
+        assert await cache.get_entries(["stale", "fresh", "plain", "missing"]) == [
+            ("old", False),
+            ("new", True),
+            ("value", True),
+            (None, True),
+        ]
+        assert await cache.get("stale") == "old"
+    await sqlite_cache.close()
+    await shared_memory_cache.close()
+
+
+@pytest.mark.asyncio
+async def test_bounded_caches_never_evict_pinned_keys(tmp_path):
+    """Test that rewrite traffic filling a bounded cache never evicts pinned job keys."""
+    sqlite_cache = SqliteCache(str(tmp_path / "cache.db"), max_entries=2, flush_batch_size=1)
+    shared_memory_cache = SharedMemoryCache(str(tmp_path / "cache.shm"), max_entries=4, ways=4)
+    for cache in [InMemoryCache(maxsize=2), InMemoryCache(max_bytes=1000), sqlite_cache, shared_memory_cache]:
+        await cache.set("job:1", "queued")
+        for i in range(10):
+            await cache.set(f"key{i}", "x" * 100)
+            await asyncio.sleep(0.001)
+
+        assert await cache.get("job:1") == "queued"
+        assert await cache.get("key9") is not None
+        assert await cache.get("key0") is None
+    await sqlite_cache.close()
+    await shared_memory_cache.close()
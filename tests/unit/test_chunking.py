@@ -0,0 +1,48 @@
+import random
+
+from app.service.chunking import split_into_chunks
+
+
+def _text(sentences):
+    return " ".join(sentences)
+
+
+def _sentences(rng, count):
+    words = "alpha beta gamma delta epsilon zeta eta theta iota kappa".split()
+    return [
+        " ".join(rng.choice(words) for _ in range(rng.randint(4, 16))).capitalize()
+        + rng.choice([".", "!", "?", '."'])
+        for _ in range(count)
+    ]
+
+
+def test_split_into_chunks_round_trips():
+    """Test that chunks end on sentence or paragraph boundaries and join back into the text."""
+    rng = random.Random(7)
+    text = _text(_sentences(rng, 30)) + "\n\n" + _text(_sentences(rng, 30))
+
+    chunks = split_into_chunks(text, 300)
+
+    assert "".join(chunk + separator for chunk, separator in chunks) == text
+    assert len(chunks) > 1
+    assert all(chunk[-1] in '.!?"' for chunk, _ in chunks)
+    assert any(separator == "\n\n" for _, separator in chunks)
+
+
+def test_split_into_chunks_keeps_long_sentences_whole():
+    """Test that a sentence longer than the chunk size is not cut."""
+    assert split_into_chunks("x" * 50 + ". Short.", 10) == [("x" * 50 + ".", " "), ("Short.", "")]
+
+
+def test_split_into_chunks_edit_keeps_other_chunks():
+    """Test that editing a sentence leaves the chunks before and after it unchanged."""
+    rng = random.Random(11)
+    sentences = _sentences(rng, 60)
+    original = split_into_chunks(_text(sentences), 400)
+
+    sentences[30] = "An edited sentence sits in the middle."
+    edited = split_into_chunks(_text(sentences), 400)
+
+    changed = [chunk for chunk in edited if chunk not in original]
+    assert len(changed) <= 2
+    assert edited[0] == original[0] and edited[-1] == original[-1]
@@ -0,0 +1,94 @@
+import asyncio
+
+import pytest
+
+from app.exception.custom_exceptions import LLMError
+from app.llm_adapter.base import LLMAdapter
+from app.llm_adapter.hedging import HedgingAdapter
+from app.model.enums import StyleEnum
+
+
+class SlowAdapter(LLMAdapter):
+    """Adapter answering after a fixed delay, optionally failing."""
+
+    def __init__(self, answer: str, delay: float, fail: bool = False):
+        self.answer = answer
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+        self.cancelled = 0
+
+    async def rewrite(self, text: str, style: StyleEnum) -> str:
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.fail:
+            raise LLMError("boom")
+        return self.answer
+
+
+@pytest.mark.asyncio
+async def test_hedging_takes_first_success_and_cancels_loser():
+    """Test that a slow primary is hedged, the faster answer wins and the loser is cancelled."""
+    primary = SlowAdapter("primary", delay=1.0)
+    secondary = SlowAdapter("secondary", delay=0.01)
+    adapter = HedgingAdapter({"a": primary, "b": secondary}, default_hedge_delay=0.02)
+
+    assert await adapter.rewrite("Hello", StyleEnum.FORMAL) == "secondary"
+    await asyncio.sleep(0)
+    assert primary.cancelled == 1
+    # The measured secondary is now preferred over the primary's assumed latency
+    assert adapter._ranked() == ["b", "a"]
+
+
+@pytest.mark.asyncio
+async def test_hedging_demotes_backend_that_turned_slow():
+    """Test that cancelled slow calls count towards the latency of their backend."""
+    primary = SlowAdapter("primary", delay=0.001)
+    secondary = SlowAdapter("secondary", delay=0.005)
+    adapter = HedgingAdapter(
+        {"a": primary, "b": secondary}, default_hedge_delay=0.02, ewma_alpha=0.5
+    )
+    for _ in range(3):
+        await adapter.rewrite("Hello", StyleEnum.FORMAL)
+
+    primary.delay = 1.0
+    for _ in range(3):
+        assert await adapter.rewrite("Hello", StyleEnum.FORMAL) == "secondary"
+
+    # The primary's hedged calls were cut short, but still show it is slower now
+    assert adapter._ranked() == ["b", "a"]
+    assert adapter.stats["a"].latency > adapter.stats["b"].latency
+
+
+@pytest.mark.asyncio
+async def test_hedging_rate_is_capped():
+    """Test that hedges stop once the hedge budget is spent."""
+    backends = {"a": SlowAdapter("a", delay=0.03), "b": SlowAdapter("b", delay=0.03)}
+    adapter = HedgingAdapter(
+        backends, default_hedge_delay=0.01, max_hedge_rate=0.0, max_hedge_burst=2
+    )
+
+    for _ in range(4):
+        await adapter.rewrite("Hello", StyleEnum.FORMAL)
+
+    # One call per rewrite, plus the two hedges the budget allowed
+    assert sum(backend.calls for backend in backends.values()) == 6
+
+
+@pytest.mark.asyncio
+async def test_hedging_fails_over_and_raises_primary_error_when_all_fail():
+    """Test that a failed primary falls over to the next backend, and its error is kept if all fail."""
+    secondary = SlowAdapter("secondary", delay=0.01)
+    adapter = HedgingAdapter(
+        {"a": SlowAdapter("a", delay=0, fail=True), "b": secondary}, default_hedge_delay=1
+    )
+    assert await adapter.rewrite("Hello", StyleEnum.FORMAL) == "secondary"
+    assert adapter.stats["a"].error_rate > 0
+
+    secondary.fail = True
+    with pytest.raises(LLMError):
+        await adapter.rewrite("Hello", StyleEnum.FORMAL)
@@ -0,0 +1,143 @@
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.cache.memory_cache import InMemoryCache
+from app.exception.custom_exceptions import (
+    LLMError,
+    LLMRateLimitError,
+    ServiceOverloadedError,
+)
+from app.llm_adapter.base import LLMAdapter
+from app.main import app
+from app.model.enums import StyleEnum
+from app.service.job_queue import RewriteJobQueue
+from app.service.rewrite_service import RewriteService
+
+
+async def _wait_for_status(queue, job_id, status):
+    for _ in range(100):
+        job = await queue.get(job_id)
+        if job.status == status:
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"Job {job_id} never reached status {status}")
+
+
+@pytest.mark.asyncio
+async def test_job_queue_runs_higher_priority_first():
+    """Test that queued jobs run by priority and store their results in the cache."""
+    adapter = AsyncMock(spec=LLMAdapter)
+    adapter.name = "mock"
+    order = []
+
+    async def rewrite(text, style):
+        order.append(text)
+        return f"Rewritten {text}"
+
+    adapter.rewrite.side_effect = rewrite
+    queue = RewriteJobQueue(RewriteService(adapter, InMemoryCache()), workers=1)
+
+    low = await queue.submit("low", StyleEnum.FORMAL, priority=0)
+    high = await queue.submit("high", StyleEnum.FORMAL, priority=5)
+    assert low.status == "queued"
+    assert (await queue.get(low.job_id)).status == "queued"
+
+    queue.start()
+    job = await _wait_for_status(queue, low.job_id, "done")
+    await queue.stop()
+
+    assert order == ["high", "low"]
+    assert job.result.rewritten_text == "Rewritten low"
+    assert (await queue.get(high.job_id)).result.rewritten_text == "Rewritten high"
+
+
+@pytest.mark.asyncio
+async def test_job_queue_retries_rejected_jobs():
+    """Test that rate limited jobs are requeued and failed jobs record an error."""
+    adapter = AsyncMock(spec=LLMAdapter)
+    adapter.name = "mock"
+    adapter.rewrite.side_effect = [
+        LLMRateLimitError(),
+        "Rewritten text",
+        LLMError("boom"),
+    ]
+    queue = RewriteJobQueue(
+        RewriteService(adapter, InMemoryCache()), workers=1, retry_delay=0.01
+    )
+    queue.start()
+
+    retried = await queue.submit("retried", StyleEnum.FORMAL)
+    job = await _wait_for_status(queue, retried.job_id, "done")
+    assert job.result.rewritten_text == "Rewritten text"
+
+    failed = await queue.submit("failed", StyleEnum.FORMAL)
+    job = await _wait_for_status(queue, failed.job_id, "failed")
+    assert job.error.message == "Internal server error"
+    await queue.stop()
+
+
+@pytest.mark.asyncio
+async def test_job_queue_rejects_when_full():
+    """Test that submitting beyond the queue bound is rejected."""
+    queue = RewriteJobQueue(
+        RewriteService(AsyncMock(spec=LLMAdapter), InMemoryCache()), max_queue=1
+    )
+    await queue.submit("one", StyleEnum.FORMAL)
+
+    with pytest.raises(ServiceOverloadedError):
+        await queue.submit("two", StyleEnum.FORMAL)
+
+
+@pytest.mark.asyncio
+async def test_job_queue_states_survive_cache_evictions():
+    """Test that rewrite traffic filling the service's cache does not evict job states."""
+    cache = InMemoryCache(maxsize=2)
+    queue = RewriteJobQueue(RewriteService(AsyncMock(spec=LLMAdapter), cache))
+    job = await queue.submit("Queued text", StyleEnum.FORMAL)
+
+    for i in range(10):
+        await cache.set(f"rewrite{i}", "value")
+
+    assert (await queue.get(job.job_id)).status == "queued"
+
+
+@pytest.mark.asyncio
+async def test_job_queue_states_shared_between_workers():
+    """Test that a worker sharing the cache can answer polls for jobs another worker runs."""
+    adapter = AsyncMock(spec=LLMAdapter)
+    adapter.name = "mock"
+    adapter.rewrite.return_value = "Rewritten"
+    cache = InMemoryCache()
+    queue = RewriteJobQueue(RewriteService(adapter, cache))
+    other_worker = RewriteJobQueue(RewriteService(adapter, cache))
+
+    job = await queue.submit("Shared text", StyleEnum.FORMAL)
+    assert (await other_worker.get(job.job_id)).status == "queued"
+
+    queue.start()
+    try:
+        done = await _wait_for_status(other_worker, job.job_id, "done")
+    finally:
+        await queue.stop()
+    assert done.result.rewritten_text == "Rewritten"
+
+
+def test_rewrite_job_endpoints():
+    """Test submitting a job over HTTP and polling it until it is done."""
+    with TestClient(app) as client:
+        response = client.post("/v1/rewrite/jobs", json={"text": "Job text", "style": "pirate"})
+        assert response.status_code == 202
+        job_id = response.json()["job_id"]
+
+        for _ in range(100):
+            job = client.get(f"/v1/rewrite/jobs/{job_id}").json()
+            if job["status"] == "done":
+                break
+
+        assert job["status"] == "done"
+        assert job["result"]["style"] == "pirate"
+
+        assert client.get("/v1/rewrite/jobs/unknown").status_code == 404
@@ -0,0 +1,79 @@
+import contextvars
+import json
+import logging
+import queue
+
+from app.config import logging as log_config
+
+
+def _record(level: int, msg: str, *args, **extra) -> logging.LogRecord:
+    record = logging.LogRecord("app.test", level, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_json_formatter_includes_route_and_extra_fields():
+    """Test that JSON lines hold the message, the route and the fields passed with `extra`."""
+    record = _record(logging.INFO, "Rewrote %d texts", 3, spans_ms={"llm": 1.5})
+    record.route = "/v1/rewrite"
+
+    entry = json.loads(log_config.JsonFormatter().format(record))
+
+    assert entry["message"] == "Rewrote 3 texts"
+    assert entry["level"] == "INFO"
+    assert entry["route"] == "/v1/rewrite"
+    assert entry["spans_ms"] == {"llm": 1.5}
+
+
+def test_sampling_filter_drops_info_lines_of_unsampled_routes(monkeypatch):
+    """Test that only warnings and errors of requests left out of the sample are kept."""
+    monkeypatch.setattr(log_config, "LOG_SAMPLE_RATES", {"/v1/rewrite": 0.0, "/v1/rewrite/jobs": 1.0})
+    sampling = log_config.SamplingFilter()
+
+    def kept(route: str, level: int) -> bool:
+        def run():
+            log_config.start_request_logging(route)
+            return sampling.filter(_record(level, "message"))
+
+        # Each request has its own context
+        return contextvars.copy_context().run(run)
+
+    assert not kept("/v1/rewrite", logging.INFO)
+    assert not kept("/v1/rewrite/batch", logging.DEBUG)
+    assert kept("/v1/rewrite", logging.WARNING)
+    assert kept("/v1/rewrite/jobs/123", logging.INFO)
+    assert kept("/health", logging.INFO)
+    # Outside of a request every record is kept
+    assert sampling.filter(_record(logging.INFO, "message"))
+
+
+def test_queue_handler_defers_formatting():
+    """Test that records are queued unformatted, and are dropped once the queue is full."""
+    log_queue = queue.Queue(1)
+    handler = log_config._DeferredQueueHandler(log_queue)
+    handler.setFormatter(logging.Formatter("%(levelname)s %(message)s"))
+    record = _record(logging.INFO, "Items: %d", 2)
+
+    handler.handle(record)
+
+    queued = log_queue.get_nowait()
+    assert queued is record
+    assert queued.msg == "Items: %d"
+    assert queued.args == (2,)
+    assert not hasattr(queued, "message")
+    # The listener's formatter merges the arguments
+    assert log_config.TextFormatter("%(message)s").format(queued) == "Items: 2"
+
+    # A full queue drops records instead of blocking
+    handler.handle(_record(logging.INFO, "first"))
+    handler.handle(_record(logging.INFO, "second"))
+    assert handler.dropped == 1
+
+
+def test_setup_logger_levels_by_prefix(monkeypatch):
+    """Test that LOG_LEVELS overrides the level of the loggers under a name prefix."""
+    monkeypatch.setattr(log_config, "LOG_LEVEL", "WARNING")
+    monkeypatch.setattr(log_config, "LOG_LEVELS", {"tests.verbose": "DEBUG"})
+
+    assert log_config.setup_logger("tests.verbose.module").level == logging.DEBUG
+    assert log_config.setup_logger("tests.quiet.module").level == logging.WARNING
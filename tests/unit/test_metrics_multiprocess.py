@@ -0,0 +1,57 @@
+import os
+import re
+import subprocess
+import sys
+
+import pytest
+
+# prometheus_client picks multiprocess mode on import, so every worker is its own process
+WORKER = """
+import os, sys
+from app.metrics.prometheus_metrics import CACHE_HITS, REQUESTS_IN_FLIGHT, mark_process_dead
+CACHE_HITS.inc(int(sys.argv[1]))
+REQUESTS_IN_FLIGHT.labels(endpoint="rewrite").inc()
+if sys.argv[2] == "shutdown":
+    mark_process_dead(os.getpid())
+"""
+
+SCRAPE = """
+from app.metrics.prometheus_metrics import cleanup_dead_processes, get_metrics
+if __import__("sys").argv[1] == "cleanup":
+    cleanup_dead_processes()
+print(get_metrics().decode())
+"""
+
+
+def _run(script: str, multiproc_dir: str, *args: str) -> str:
+    env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": multiproc_dir}
+    return subprocess.run(
+        [sys.executable, "-c", script, *args], env=env, capture_output=True, text=True, check=True
+    ).stdout
+
+
+def _sample(metrics: str, name: str) -> float:
+    match = re.search(rf"^{re.escape(name)} (\S+)$", metrics, re.MULTILINE)
+    return float(match.group(1)) if match else 0.0
+
+
+@pytest.fixture
+def multiproc_dir(tmp_path):
+    _run(WORKER, str(tmp_path), "2", "shutdown")
+    _run(WORKER, str(tmp_path), "3", "crash")
+    return str(tmp_path)
+
+
+def test_counters_are_summed_across_workers(multiproc_dir):
+    """Test that a scrape reports the counters of every worker, including exited ones."""
+    metrics = _run(SCRAPE, multiproc_dir, "")
+    assert _sample(metrics, "rewrite_cache_hits_total") == 5
+
+
+def test_live_gauges_of_exited_workers_are_dropped(multiproc_dir):
+    """Test that only workers still running count towards live gauges."""
+    in_flight = 'rewrite_requests_in_flight{endpoint="rewrite"}'
+    # The worker that shut down cleanly is already gone, the crashed one until cleanup
+    assert _sample(_run(SCRAPE, multiproc_dir, ""), in_flight) == 1
+    assert _sample(_run(SCRAPE, multiproc_dir, "cleanup"), in_flight) == 0
+    assert _sample(_run(SCRAPE, multiproc_dir, "cleanup"), "rewrite_cache_hits_total") == 5
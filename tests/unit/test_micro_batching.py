@@ -0,0 +1,151 @@
+import asyncio
+import json
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.exception.custom_exceptions import LLMBatchParseError, LLMError
+from app.llm_adapter import get_llm_adapter
+from app.llm_adapter.base import LLMAdapter
+from app.llm_adapter.micro_batching import MicroBatchingAdapter
+from app.llm_adapter.mock_adapter import MockLLMAdapter
+from app.metrics.prometheus_metrics import cache_registry
+from app.llm_adapter.openai_adapter import OpenAIAdapter
+from app.model.enums import StyleEnum
+
+
+def _batching_adapter(**kwargs):
+    adapter = AsyncMock(spec=LLMAdapter)
+    adapter.name = "mock"
+    adapter.supports_batching = True
+    adapter.rewrite.side_effect = lambda text, style: f"single {text}"
+    adapter.rewrite_many.side_effect = lambda texts, style: [f"batched {t}" for t in texts]
+    return adapter, MicroBatchingAdapter(adapter, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_micro_batching_packs_concurrent_calls_by_style():
+    """Test that concurrent same-style rewrites share one call and styles are not mixed."""
+    adapter, batching = _batching_adapter(max_batch_size=3, max_wait=0.05)
+
+    results = await asyncio.gather(
+        batching.rewrite("one", StyleEnum.FORMAL),
+        batching.rewrite("two", StyleEnum.FORMAL),
+        batching.rewrite("three", StyleEnum.FORMAL),
+        batching.rewrite("four", StyleEnum.FORMAL),
+        batching.rewrite("ahoy", StyleEnum.PIRATE),
+    )
+
+    assert results == [
+        "batched one",
+        "batched two",
+        "batched three",
+        "single four",
+        "single ahoy",
+    ]
+    adapter.rewrite_many.assert_awaited_once_with(["one", "two", "three"], StyleEnum.FORMAL)
+    assert adapter.rewrite.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_micro_batching_respects_token_budget():
+    """Test that a batch is sent early once it would exceed the token budget."""
+    adapter, batching = _batching_adapter(max_batch_tokens=10)
+
+    await asyncio.gather(
+        batching.rewrite("a" * 20, StyleEnum.FORMAL),
+        batching.rewrite("b" * 20, StyleEnum.FORMAL),
+    )
+
+    adapter.rewrite_many.assert_not_called()
+    assert adapter.rewrite.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_micro_batching_falls_back_to_individual_calls():
+    """Test that an unparseable batch is retried per text and errors reach each caller."""
+    adapter, batching = _batching_adapter()
+    adapter.rewrite_many.side_effect = LLMBatchParseError()
+
+    results = await asyncio.gather(
+        batching.rewrite("one", StyleEnum.FORMAL),
+        batching.rewrite("two", StyleEnum.FORMAL),
+    )
+    assert results == ["single one", "single two"]
+
+    adapter.rewrite_many.side_effect = LLMError("boom")
+    results = await asyncio.gather(
+        batching.rewrite("one", StyleEnum.FORMAL),
+        batching.rewrite("two", StyleEnum.FORMAL),
+        return_exceptions=True,
+    )
+    assert all(isinstance(result, LLMError) for result in results)
+
+
+def _openai_adapter(content, finish_reason="stop"):
+    adapter = OpenAIAdapter("test-key")
+    completion = MagicMock()
+    completion.choices[0].message.content = content
+    completion.choices[0].finish_reason = finish_reason
+    completion.usage.total_tokens = 100
+    raw_response = MagicMock(headers={})
+    raw_response.parse.return_value = completion
+    adapter.client = MagicMock()
+    adapter.client.chat.completions.with_raw_response.create = AsyncMock(
+        return_value=raw_response
+    )
+    return adapter
+
+
+@pytest.mark.asyncio
+async def test_micro_batching_counts_no_savings_without_native_batching():
+    """Test that batches answered with one call per text are not counted as saved calls."""
+    batching = MicroBatchingAdapter(MockLLMAdapter(), max_batch_size=3, max_wait=0.05)
+
+    def saved():
+        return cache_registry.get_sample_value("rewrite_llm_calls_saved_total", {"adapter": "mock"}) or 0
+
+    before = saved()
+    await asyncio.gather(*(batching.rewrite(text, StyleEnum.FORMAL) for text in ("a", "b", "c")))
+
+    assert saved() == before
+
+
+def test_micro_batching_skipped_for_adapters_that_cannot_batch(monkeypatch):
+    """Test that the factory does not micro-batch an adapter without native batching."""
+    monkeypatch.setenv("LLM_MICRO_BATCHING", "true")
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    get_llm_adapter.cache_clear()
+    try:
+        assert isinstance(get_llm_adapter(), MockLLMAdapter)
+    finally:
+        get_llm_adapter.cache_clear()
+
+
+@pytest.mark.asyncio
+async def test_openai_rewrite_many_parses_json_output():
+    """Test that the OpenAI adapter packs texts as JSON and splits the rewrites back out."""
+    adapter = _openai_adapter(json.dumps({"rewrites": [" Ahoy! ", "Arrr"]}))
+
+    assert await adapter.rewrite_many(["Hello", "Yes"], StyleEnum.PIRATE) == ["Ahoy!", "Arrr"]
+
+    kwargs = adapter.client.chat.completions.with_raw_response.create.call_args.kwargs
+    assert kwargs["response_format"] == {"type": "json_object"}
+    assert '["Hello", "Yes"]' in kwargs["messages"][1]["content"]
+
+
+@pytest.mark.parametrize(
+    "content,finish_reason",
+    [
+        ("not json", "stop"),
+        (json.dumps({"rewrites": ["only one"]}), "stop"),
+        (json.dumps({"rewrites": ["one", "two"]}), "length"),
+    ],
+)
+@pytest.mark.asyncio
+async def test_openai_rewrite_many_rejects_unparseable_output(content, finish_reason):
+    """Test that malformed, short or truncated batched output raises LLMBatchParseError."""
+    adapter = _openai_adapter(content, finish_reason)
+
+    with pytest.raises(LLMBatchParseError):
+        await adapter.rewrite_many(["Hello", "Yes"], StyleEnum.PIRATE)
@@ -0,0 +1,51 @@
+import httpx
+import pytest
+
+from app.llm_adapter.openai_adapter import OpenAIAdapter, OpenAIConfig
+
+
+@pytest.fixture
+def api_requests(monkeypatch):
+    """Route the adapter's HTTP client to a stub API, recording the requests it gets."""
+    received = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        received.append(request)
+        return httpx.Response(404)
+
+    class StubClient(httpx.AsyncClient):
+        def __init__(self, **kwargs):
+            super().__init__(transport=httpx.MockTransport(handler), **kwargs)
+
+    monkeypatch.setattr(httpx, "AsyncClient", StubClient)
+    return received
+
+
+@pytest.mark.asyncio
+async def test_openai_adapter_warms_connections_and_closes(api_requests):
+    """Test that startup sends one request per warmed connection, and any response counts."""
+    config = OpenAIConfig(base_url="http://llm.test/v1", warmup_connections=3, timeout=7, connect_timeout=2)
+    adapter = OpenAIAdapter("test-key", config)
+
+    await adapter.start()
+
+    assert [str(request.url) for request in api_requests] == ["http://llm.test/v1/models"] * 3
+    assert api_requests[0].headers["Authorization"] == "Bearer test-key"
+    assert (adapter.client.timeout.connect, adapter.client.timeout.read) == (2, 7)
+
+    await adapter.close()
+    assert adapter.client.is_closed()
+    # A closed client is replaced when the app starts again
+    await adapter.start()
+    assert not adapter.client.is_closed()
+    await adapter.close()
+
+
+@pytest.mark.asyncio
+async def test_openai_adapter_warm_up_failures_do_not_fail_startup():
+    """Test that an unreachable API only leaves the pool cold."""
+    config = OpenAIConfig(base_url="http://127.0.0.1:9/v1", warmup_connections=2, connect_timeout=1)
+    adapter = OpenAIAdapter("test-key", config)
+
+    await adapter.start()
+    await adapter.close()
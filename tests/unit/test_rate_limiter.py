@@ -0,0 +1,144 @@
+import asyncio
+import time
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from openai import RateLimitError
+
+from app.cache.memory_cache import InMemoryCache
+from app.exception.custom_exceptions import LLMRateLimitError
+from app.llm_adapter.openai_adapter import OpenAIAdapter, OpenAIConfig
+from app.llm_adapter.rate_limiter import (
+    AdaptiveRateLimiter,
+    SharedRateBudget,
+    call_priority,
+    parse_duration,
+    retry_after,
+)
+from app.model.enums import StyleEnum
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [("1s", 1.0), ("6m0s", 360.0), ("20ms", 0.02), ("1h2m3.5s", 3723.5), ("2", 2.0), ("", None)],
+)
+def test_parse_duration(value, expected):
+    """Test parsing of the rate limit reset durations used in OpenAI headers."""
+    assert parse_duration(value) == expected
+
+
+def test_retry_after_prefers_milliseconds():
+    """Test that retry-after-ms takes precedence over retry-after."""
+    assert retry_after({"retry-after": "2", "retry-after-ms": "150"}) == 0.15
+    assert retry_after({"retry-after": "2"}) == 2.0
+    assert retry_after({}) is None
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_queues_callers():
+    """Test that callers wait for the bucket to refill instead of exceeding it."""
+    # 600 requests/min is 10 requests per second
+    limiter = AdaptiveRateLimiter(requests_per_minute=600, tokens_per_minute=10**6)
+    limiter.requests.tokens = 1
+
+    start = time.monotonic()
+    await asyncio.gather(*(limiter.acquire(1) for _ in range(3)))
+
+    # The first call goes through at once, the next two wait ~0.1s each
+    assert time.monotonic() - start >= 0.18
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_serves_higher_priority_first():
+    """Test that an interactive call overtakes background calls already queued at the limiter."""
+    # 1200 requests/min is 20 requests per second
+    limiter = AdaptiveRateLimiter(requests_per_minute=1200, tokens_per_minute=10**6)
+    limiter.requests.tokens = 0
+    order = []
+
+    async def call(name, priority):
+        with call_priority(priority):
+            await limiter.acquire(1)
+        order.append(name)
+
+    background = [asyncio.create_task(call(f"background{i}", 1)) for i in range(3)]
+    await asyncio.sleep(0.01)
+    await call("interactive", 0)
+    await asyncio.gather(*background)
+
+    assert order == ["interactive", "background0", "background1", "background2"]
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_learns_limits_from_headers():
+    """Test that the remaining budget reported by the server is honoured."""
+    limiter = AdaptiveRateLimiter(requests_per_minute=600, tokens_per_minute=1000, max_wait=0.5)
+
+    limiter.update_from_headers(
+        {"x-ratelimit-limit-tokens": "60000", "x-ratelimit-remaining-tokens": "0"}
+    )
+
+    assert limiter.tokens.capacity == 60000
+    # 60000 tokens/min refill 1000 tokens per second
+    assert limiter._wait_time(500) == pytest.approx(0.5, abs=0.01)
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_fails_fast_beyond_max_wait():
+    """Test that a request which would wait too long is rejected at once."""
+    limiter = AdaptiveRateLimiter(max_wait=0.1)
+    limiter.block_for(10)
+
+    with pytest.raises(LLMRateLimitError):
+        await limiter.acquire(1)
+
+
+@pytest.mark.asyncio
+async def test_shared_rate_budget():
+    """Test that the budget shared through the cache is enforced per minute window."""
+    budget = SharedRateBudget(InMemoryCache(), requests_per_minute=2, tokens_per_minute=1000)
+
+    assert await budget.wait_time(10) == 0
+    assert await budget.wait_time(10) == 0
+    assert 0 < await budget.wait_time(10) <= 60
+
+
+@pytest.mark.asyncio
+async def test_shared_rate_budget_rejections_use_no_budget():
+    """Test that rejected reservations are rolled back, leaving room for smaller calls."""
+    budget = SharedRateBudget(InMemoryCache(), requests_per_minute=10, tokens_per_minute=100)
+
+    assert await budget.wait_time(60) == 0
+    for _ in range(5):
+        assert await budget.wait_time(60) > 0
+
+    assert await budget.wait_time(40) == 0
+
+
+@pytest.mark.asyncio
+async def test_openai_adapter_honours_retry_after():
+    """Test that a 429 with Retry-After pauses callers and is retried."""
+    adapter = OpenAIAdapter("test-key", OpenAIConfig(retry_delay=0.01))
+
+    rate_limit_response = MagicMock(status_code=429, headers={"retry-after-ms": "50"})
+    completion = MagicMock()
+    completion.choices[0].message.content = " Ahoy! "
+    completion.usage.total_tokens = 100
+    raw_response = MagicMock(headers={})
+    raw_response.parse.return_value = completion
+
+    create = AsyncMock(
+        side_effect=[
+            RateLimitError("rate limited", response=rate_limit_response, body=None),
+            raw_response,
+        ]
+    )
+    adapter.client = MagicMock()
+    adapter.client.chat.completions.with_raw_response.create = create
+
+    start = time.monotonic()
+    result = await adapter.rewrite("Hello", StyleEnum.PIRATE)
+
+    assert result == "Ahoy!"
+    assert create.call_count == 2
+    assert time.monotonic() - start >= 0.05
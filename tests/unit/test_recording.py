@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+
+from app.exception.custom_exceptions import LLMError
+from app.llm_adapter.mock_adapter import MockLLMAdapter
+from app.llm_adapter.recording import RecordingAdapter, ReplayAdapter
+from app.model.enums import StyleEnum
+
+
+@pytest.mark.asyncio
+async def test_record_and_replay(tmp_path):
+    """Test that recorded responses are replayed by text, style and model parameters."""
+    path = str(tmp_path / "trace.log")
+    recorder = RecordingAdapter(MockLLMAdapter(), path)
+    await recorder.rewrite("Hello", StyleEnum.PIRATE)
+    await recorder.rewrite("Hello", StyleEnum.FORMAL)
+    chunks = [chunk async for chunk in recorder.rewrite_stream("Streamed", StyleEnum.HAIKU)]
+    await recorder.close()
+
+    replay = ReplayAdapter(path, latency_scale=0)
+    assert len(replay) == 3
+    assert await replay.rewrite("Hello", StyleEnum.PIRATE) == "[*pirate*] Hello [*pirate*]"
+    assert await replay.rewrite("Hello", StyleEnum.FORMAL) == "[*formal*] Hello [*formal*]"
+    assert await replay.rewrite("Streamed", StyleEnum.HAIKU) == "".join(chunks)
+
+    with pytest.raises(LLMError):
+        await replay.rewrite("Unknown", StyleEnum.PIRATE)
+    # Responses recorded with other model parameters don't match
+    with pytest.raises(LLMError):
+        await ReplayAdapter(path, params={"model": "other"}).rewrite("Hello", StyleEnum.PIRATE)
+
+
+@pytest.mark.asyncio
+async def test_replay_falls_back_and_skips_partial_records(tmp_path):
+    """Test that a truncated last record is ignored and misses use the fallback adapter."""
+    path = str(tmp_path / "trace.log")
+    recorder = RecordingAdapter(MockLLMAdapter(), path)
+    await recorder.rewrite("Hello", StyleEnum.PIRATE)
+    await recorder.close()
+    with open(path, "a") as f:
+        f.write("0" * 32 + '\t{"style":"pira')
+
+    replay = ReplayAdapter(path, latency_scale=0, fallback=MockLLMAdapter())
+    assert len(replay) == 1
+    assert await replay.rewrite("Other", StyleEnum.FORMAL) == "[*formal*] Other [*formal*]"
+
+    # Recording again starts on a new line
+    recorder = RecordingAdapter(MockLLMAdapter(), path)
+    await recorder.rewrite("Again", StyleEnum.HAIKU)
+    await recorder.close()
+    replay = ReplayAdapter(path, latency_scale=0)
+    assert await replay.rewrite("Again", StyleEnum.HAIKU) == "[*haiku*] Again [*haiku*]"
+
+
+@pytest.mark.asyncio
+async def test_replay_uses_params_recorded_in_trace(tmp_path):
+    """Test that a trace replays without model parameters given, using those it was recorded with."""
+    path = str(tmp_path / "trace.log")
+
+    class RecordedModelAdapter(MockLLMAdapter):
+        params = {"model": "recorded"}
+
+    recorder = RecordingAdapter(RecordedModelAdapter(), path)
+    await recorder.rewrite("Hello", StyleEnum.PIRATE)
+    await recorder.close()
+
+    replay = ReplayAdapter(path, latency_scale=0)
+    assert replay.params == {"model": "recorded"}
+    assert await replay.rewrite("Hello", StyleEnum.PIRATE) == "[*pirate*] Hello [*pirate*]"
+
+
+def test_trace_mode_requires_trace_path(monkeypatch):
+    """Test that recording or replaying without LLM_TRACE_PATH fails with a clear error."""
+    from app.llm_adapter import get_llm_adapter
+
+    monkeypatch.setenv("LLM_TRACE_MODE", "replay")
+    monkeypatch.delenv("LLM_TRACE_PATH", raising=False)
+    get_llm_adapter.cache_clear()
+    try:
+        with pytest.raises(ValueError, match="LLM_TRACE_PATH"):
+            get_llm_adapter()
+    finally:
+        get_llm_adapter.cache_clear()
+
+
+@pytest.mark.asyncio
+async def test_recording_writes_queued_records_on_close(tmp_path):
+    """Test that records written by the background thread are all in the trace once closed."""
+    path = str(tmp_path / "trace.log")
+    recorder = RecordingAdapter(MockLLMAdapter(), path)
+    await asyncio.gather(*(recorder.rewrite(f"Text {i}", StyleEnum.FORMAL) for i in range(50)))
+    await recorder.close()
+
+    replay = ReplayAdapter(path, latency_scale=0)
+    assert len(replay) == 50
+    assert await replay.rewrite("Text 49", StyleEnum.FORMAL) == "[*formal*] Text 49 [*formal*]"
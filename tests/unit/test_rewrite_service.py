@@ -1,10 +1,14 @@
 # tests/unit/test_rewrite_service.py
+import asyncio
 from unittest.mock import AsyncMock
 
 import pytest
 
 from app.cache.base import Cache
+from app.cache.memory_cache import InMemoryCache
+from app.exception.custom_exceptions import LLMError
 from app.llm_adapter.base import LLMAdapter
+from app.llm_adapter.mock_adapter import MockLLMAdapter
 from app.model.models import RewriteResponse, StyleEnum
 from app.service.rewrite_service import RewriteService
 
@@ -75,3 +79,221 @@ async def test_rewrite_cache_miss(rewrite_service, mock_cache, mock_llm_adapter)
     mock_cache.set.assert_called_once_with("test_cache_key", rewritten_text)
 
     mock_llm_adapter.rewrite.assert_called_once_with(text, style)
+
+
+@pytest.mark.asyncio
+async def test_rewrite_coalesces_concurrent_misses(mock_llm_adapter):
+    """Test that concurrent identical misses result in a single LLM call."""
+    release = asyncio.Event()
+
+    async def slow_rewrite(text, style):
+        await release.wait()
+        return "Ahoy, world!"
+
+    mock_llm_adapter.rewrite.side_effect = slow_rewrite
+    service = RewriteService(mock_llm_adapter, InMemoryCache())
+
+    tasks = [
+        asyncio.create_task(service.rewrite("Hello world", StyleEnum.PIRATE))
+        for _ in range(10)
+    ]
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(*tasks)
+
+    assert all(result.rewritten_text == "Ahoy, world!" for result in results)
+    mock_llm_adapter.rewrite.assert_called_once_with("Hello world", StyleEnum.PIRATE)
+
+
+@pytest.mark.asyncio
+async def test_rewrite_coalesced_failure_propagates(mock_llm_adapter):
+    """Test that a failure of the shared LLM call is raised to every waiting caller."""
+    release = asyncio.Event()
+
+    async def failing_rewrite(text, style):
+        await release.wait()
+        raise LLMError("boom")
+
+    mock_llm_adapter.rewrite.side_effect = failing_rewrite
+    service = RewriteService(mock_llm_adapter, InMemoryCache())
+
+    tasks = [
+        asyncio.create_task(service.rewrite("Hello world", StyleEnum.PIRATE))
+        for _ in range(3)
+    ]
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+
+    assert all(isinstance(result, LLMError) for result in results)
+    mock_llm_adapter.rewrite.assert_called_once()
+
+    # The failed call is not remembered, the next request retries
+    mock_llm_adapter.rewrite.side_effect = None
+    mock_llm_adapter.rewrite.return_value = "Ahoy, world!"
+    result = await service.rewrite("Hello world", StyleEnum.PIRATE)
+    assert result.rewritten_text == "Ahoy, world!"
+
+
+@pytest.mark.asyncio
+async def test_rewrite_waits_for_lock_holder_in_other_worker(mock_llm_adapter):
+    """Test that a worker finding the cache lock taken waits for the holder's result."""
+    cache = InMemoryCache()
+    service = RewriteService(
+        mock_llm_adapter, cache, coalesce_across_workers=True, lock_poll_interval=0.01
+    )
+    cache_key = cache.generate_key("Hello world", StyleEnum.PIRATE)
+
+    # Simulate another worker holding the lock and publishing its result later
+    await cache.add(f"lock:{cache_key}", "1")
+
+    async def publish():
+        await asyncio.sleep(0.05)
+        await cache.set(cache_key, "Ahoy, world!")
+        await cache.delete(f"lock:{cache_key}")
+
+    publisher = asyncio.create_task(publish())
+    result = await service.rewrite("Hello world", StyleEnum.PIRATE)
+    await publisher
+
+    assert result.rewritten_text == "Ahoy, world!"
+    mock_llm_adapter.rewrite.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_rewrite_batch(mock_llm_adapter):
+    """Test that a batch dedupes items, reads hits at once and isolates failures."""
+    cache = InMemoryCache()
+    await cache.set(cache.generate_key("cached", StyleEnum.PIRATE), "Ahoy, cached!")
+
+    async def rewrite(text, style):
+        if text == "broken":
+            raise LLMError("boom")
+        return f"Ahoy, {text}!"
+
+    mock_llm_adapter.rewrite.side_effect = rewrite
+    service = RewriteService(mock_llm_adapter, cache, batch_concurrency=2)
+
+    results = await service.rewrite_batch(
+        [
+            ("hello", StyleEnum.PIRATE),
+            ("cached", StyleEnum.PIRATE),
+            ("broken", StyleEnum.PIRATE),
+            ("hello", StyleEnum.PIRATE),
+        ]
+    )
+
+    assert [r.rewritten_text for r in results if isinstance(r, RewriteResponse)] == [
+        "Ahoy, hello!",
+        "Ahoy, cached!",
+        "Ahoy, hello!",
+    ]
+    assert isinstance(results[2], LLMError)
+
+    # Duplicates and cache hits don't call the LLM adapter
+    assert mock_llm_adapter.rewrite.call_count == 2
+    assert await cache.get(cache.generate_key("hello", StyleEnum.PIRATE)) == "Ahoy, hello!"
+
+
+@pytest.mark.asyncio
+async def test_rewrite_stream_caches_on_completion(mock_llm_adapter):
+    """Test that a streamed rewrite is cached only once the stream completes."""
+
+    async def rewrite_stream(text, style):
+        for chunk in ["Ahoy, ", "world!"]:
+            yield chunk
+
+    mock_llm_adapter.rewrite_stream = rewrite_stream
+    cache = InMemoryCache()
+    service = RewriteService(mock_llm_adapter, cache)
+    cache_key = cache.generate_key("Hello world", StyleEnum.PIRATE)
+
+    # An abandoned stream does not populate the cache
+    stream = service.rewrite_stream("Hello world", StyleEnum.PIRATE)
+    assert await anext(stream) == "Ahoy, "
+    await stream.aclose()
+    assert await cache.get(cache_key) is None
+
+    chunks = [chunk async for chunk in service.rewrite_stream("Hello world", StyleEnum.PIRATE)]
+    assert chunks == ["Ahoy, ", "world!"]
+    assert await cache.get(cache_key) == "Ahoy, world!"
+
+    # A cache hit is streamed as a single chunk
+    chunks = [chunk async for chunk in service.rewrite_stream("Hello world", StyleEnum.PIRATE)]
+    assert chunks == ["Ahoy, world!"]
+
+
+@pytest.mark.asyncio
+async def test_rewrite_serves_stale_and_refreshes_once(mock_llm_adapter):
+    """Test that stale hits are served at once while a single background refresh runs."""
+    cache = InMemoryCache()
+    service = RewriteService(mock_llm_adapter, cache, soft_ttl=60)
+    key = cache.generate_key("Hello", StyleEnum.FORMAL)
+    await cache.set_entry(key, "Old rewrite", soft_ttl=0)
+
+    refresh_started = asyncio.Event()
+    release = asyncio.Event()
+
+    async def slow_rewrite(text, style):
+        refresh_started.set()
+        await release.wait()
+        return "New rewrite"
+
+    mock_llm_adapter.rewrite.side_effect = slow_rewrite
+
+    results = await asyncio.gather(
+        *(service.rewrite("Hello", StyleEnum.FORMAL) for _ in range(5))
+    )
+    assert {result.rewritten_text for result in results} == {"Old rewrite"}
+
+    await refresh_started.wait()
+    release.set()
+    while service._refreshes:
+        await asyncio.sleep(0.01)
+
+    assert mock_llm_adapter.rewrite.await_count == 1
+    assert await cache.get_entries([key]) == [("New rewrite", True)]
+    result = await service.rewrite("Hello", StyleEnum.FORMAL)
+    assert result.rewritten_text == "New rewrite"
+
+
+@pytest.mark.asyncio
+async def test_rewrite_chunked_only_rewrites_edited_chunks():
+    """Test that long texts are rewritten in chunks, and an edit misses only its own chunk."""
+    adapter = MockLLMAdapter()
+    adapter.rewrite = AsyncMock(side_effect=adapter.rewrite)
+    service = RewriteService(adapter, InMemoryCache(), chunk_max_chars=100)
+    paragraphs = [
+        "The first paragraph has a sentence. It has a second one too.",
+        "The second paragraph is here. It also has two sentences.",
+        "The third paragraph closes the text. Its last sentence ends here.",
+    ]
+    text = "\n\n".join(paragraphs)
+
+    result = await service.rewrite(text, StyleEnum.FORMAL)
+
+    assert result.original_text == text
+    assert result.rewritten_text.split("\n\n") == [
+        f"[*formal*] {paragraph} [*formal*]" for paragraph in paragraphs
+    ]
+    assert adapter.rewrite.await_count == 3
+
+    adapter.rewrite.reset_mock()
+    edited = text.replace("second paragraph", "middle paragraph")
+    result = await service.rewrite(edited, StyleEnum.FORMAL)
+
+    assert "[*formal*] The middle paragraph is here." in result.rewritten_text
+    adapter.rewrite.assert_awaited_once_with(
+        "The middle paragraph is here. It also has two sentences.", StyleEnum.FORMAL
+    )
+
+
+@pytest.mark.asyncio
+async def test_rewrite_chunking_skips_excluded_styles(mock_llm_adapter):
+    """Test that styles opted out of chunking get the whole text in one call."""
+    service = RewriteService(mock_llm_adapter, InMemoryCache(), chunk_max_chars=20)
+    text = "A first sentence here. A second sentence here."
+
+    await service.rewrite(text, StyleEnum.HAIKU)
+
+    mock_llm_adapter.rewrite.assert_called_once_with(text, StyleEnum.HAIKU)
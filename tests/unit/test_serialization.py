@@ -0,0 +1,32 @@
+import json
+
+import pytest
+
+from app.model import serialization
+from app.model.enums import StyleEnum
+from app.model.models import BatchRewriteItemResult, ErrorDetail, RewriteResponse
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_dumps_matches_pydantic_serialization(monkeypatch, use_orjson):
+    """Test that constructed models encode like pydantic would, with and without orjson."""
+    if not use_orjson:
+        monkeypatch.setattr(serialization, "orjson", None)
+    results = [
+        BatchRewriteItemResult(
+            result=RewriteResponse.model_construct(
+                original_text="Café ✓", rewritten_text='"Quoted"\\n', style=StyleEnum.HAIKU
+            )
+        ),
+        BatchRewriteItemResult(error=ErrorDetail(message="Internal server error")),
+    ]
+
+    encoded = serialization.dumps({"results": results})
+
+    assert json.loads(encoded) == {"results": [item.model_dump(mode="json") for item in results]}
+
+
+def test_dumps_rejects_unknown_types():
+    """Test that objects that are neither JSON types nor models are not encoded."""
+    with pytest.raises(TypeError):
+        serialization.dumps({"value": object()})
@@ -0,0 +1,109 @@
+import asyncio
+import multiprocessing
+
+import pytest
+
+from app.cache.shared_memory_cache import SharedMemoryCache
+
+# Workers run in fresh processes, like uvicorn workers, so they share nothing but the file
+_spawn = multiprocessing.get_context("spawn")
+
+
+def _increment(path: str, times: int) -> None:
+    async def run():
+        cache = SharedMemoryCache(path, max_entries=64)
+        for _ in range(times):
+            await cache.incr("counter")
+        await cache.close()
+
+    asyncio.run(run())
+
+
+def _add(path: str, worker: int, results) -> None:
+    async def run():
+        cache = SharedMemoryCache(path, max_entries=64)
+        results.put((worker, await cache.add("lock", str(worker))))
+        await cache.close()
+
+    asyncio.run(run())
+
+
+def _set(path: str, key: str, value: str) -> None:
+    async def run():
+        cache = SharedMemoryCache(path, max_entries=64)
+        await cache.set(key, value)
+        await cache.close()
+
+    asyncio.run(run())
+
+
+def _run_workers(target, args_list) -> None:
+    processes = [_spawn.Process(target=target, args=args) for args in args_list]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(timeout=60)
+        assert process.exitcode == 0
+
+
+@pytest.mark.asyncio
+async def test_shared_memory_cache_is_shared_between_processes(tmp_path):
+    """Test that values written by one process are read by another."""
+    path = str(tmp_path / "cache.shm")
+    _run_workers(_set, [(path, "key", "written by another process")])
+
+    cache = SharedMemoryCache(path, max_entries=64)
+    assert await cache.get("key") == "written by another process"
+    await cache.close()
+
+
+@pytest.mark.asyncio
+async def test_shared_memory_cache_incr_and_add_are_atomic_across_processes(tmp_path):
+    """Test that concurrent increments are not lost and only one process wins an add."""
+    path = str(tmp_path / "cache.shm")
+    _run_workers(_increment, [(path, 200)] * 4)
+
+    results = _spawn.Queue()
+    _run_workers(_add, [(path, worker, results) for worker in range(4)])
+    wins = [worker for worker, added in (results.get() for _ in range(4)) if added]
+
+    cache = SharedMemoryCache(path, max_entries=64)
+    assert await cache.get("counter") == "800"
+    assert len(wins) == 1
+    assert await cache.get("lock") == str(wins[0])
+    await cache.close()
+
+
+@pytest.mark.asyncio
+async def test_shared_memory_cache_bounded_with_lru_eviction(tmp_path):
+    """Test that the table never grows past its slots and evicts the least recently used entries."""
+    cache = SharedMemoryCache(str(tmp_path / "cache.shm"), max_entries=4, ways=4)
+    for i in range(4):
+        await cache.set(f"key{i}", f"value{i}")
+    await cache.get("key0")
+    await cache.set("key4", "value4")
+
+    assert await cache.get("key1") is None
+    assert await cache.get("key0") == "value0"
+    assert len([entry async for entry in cache.scan()]) == cache.capacity == 4
+    await cache.close()
+
+
+@pytest.mark.asyncio
+async def test_shared_memory_cache_large_values_ttl_and_delete(tmp_path):
+    """Test compression of large values, skipping of oversized ones, expiry and deletion."""
+    cache = SharedMemoryCache(str(tmp_path / "cache.shm"), max_entries=8, slot_bytes=256)
+    await cache.set("compressible", "a" * 1000)
+    await cache.set("oversized", "".join(chr(0x4E00 + i) for i in range(1000)))
+    await cache.set("short-lived", "value", ttl=0.05)
+    await cache.set("deleted", "value")
+    await cache.delete("deleted")
+    await asyncio.sleep(0.06)
+
+    assert await cache.get_many(["compressible", "oversized", "short-lived", "deleted"]) == [
+        "a" * 1000,
+        None,
+        None,
+        None,
+    ]
+    await cache.close()
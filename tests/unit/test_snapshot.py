@@ -0,0 +1,94 @@
+import asyncio
+
+import fakeredis
+import pytest
+from fastapi.testclient import TestClient
+
+from app.cache.memory_cache import InMemoryCache
+from app.cache.redis_cache import RedisCache
+from app.cache.snapshot import export_snapshot, load_snapshot
+from app.cache.sqlite_cache import SqliteCache
+from app.main import app
+from app.model.enums import StyleEnum
+
+
+def _key(i: int) -> str:
+    return f"{i:064x}"
+
+
+@pytest.mark.asyncio
+async def test_snapshot_round_trip_hottest_first(tmp_path):
+    """Test that a snapshot loads the most hit entries first, up to the cache capacity."""
+    path = str(tmp_path / "snapshot.jsonl.gz")
+    source = InMemoryCache()
+    for i in range(5):
+        await source.set(_key(i), f"value{i}")
+    # Make key 3 the hottest, then key 1
+    for _ in range(3):
+        await source.get(_key(3))
+    await source.get(_key(1))
+    # Bookkeeping keys are not part of the snapshot
+    await source.add(f"lock:{_key(0)}", "1")
+
+    assert await export_snapshot(source, path) == 5
+
+    target = InMemoryCache(maxsize=2)
+    assert await load_snapshot(target, path) == 2
+    assert await target.get_many([_key(3), _key(1), _key(0)]) == ["value3", "value1", None]
+
+
+@pytest.mark.asyncio
+async def test_snapshot_into_byte_bounded_cache_keeps_hottest(tmp_path):
+    """Test that a cache without an entry capacity evicts the coldest entries while loading."""
+    path = str(tmp_path / "snapshot.jsonl.gz")
+    source = InMemoryCache()
+    for i in range(10):
+        await source.set(_key(i), "x" * 100)
+        # Key 9 is the hottest, key 0 the coldest
+        for _ in range(i):
+            await source.get(_key(i))
+    await export_snapshot(source, path)
+
+    # Room for about 4 entries
+    target = InMemoryCache(max_bytes=1500)
+    assert target.capacity is None
+    assert await load_snapshot(target, path, batch_size=3) == 10
+    assert await target.get(_key(9)) is not None
+    assert await target.get(_key(0)) is None
+
+
+@pytest.mark.asyncio
+async def test_snapshot_from_redis_into_sqlite(tmp_path):
+    """Test exporting from Redis and loading into a persistent SQLite cache."""
+    path = str(tmp_path / "snapshot.jsonl.gz")
+    redis_cache = RedisCache(
+        "redis://localhost", client=fakeredis.FakeAsyncRedis(decode_responses=True)
+    )
+    await redis_cache.set_many({_key(i): f"value{i}" for i in range(1200)})
+
+    assert await export_snapshot(redis_cache, path) == 1200
+
+    sqlite_cache = SqliteCache(str(tmp_path / "cache.db"))
+    assert await load_snapshot(sqlite_cache, path, batch_size=500) == 1200
+    assert await sqlite_cache.get(_key(1199)) == "value1199"
+    assert len([entry async for entry in sqlite_cache.scan(batch_size=500)]) == 1200
+    await sqlite_cache.close()
+
+
+def test_startup_loads_snapshot(tmp_path, monkeypatch):
+    """Test that the app loads the configured snapshot on startup."""
+    path = str(tmp_path / "snapshot.jsonl.gz")
+    cache = InMemoryCache()
+    key = cache.generate_key("Warm text", StyleEnum.FORMAL)
+
+    async def write_snapshot():
+        await cache.set(key, "Warm rewrite")
+        await export_snapshot(cache, path)
+
+    asyncio.run(write_snapshot())
+    monkeypatch.setenv("CACHE_SNAPSHOT_PATH", path)
+
+    with TestClient(app) as client:
+        response = client.post("/v1/rewrite", json={"text": "Warm text", "style": "formal"})
+
+    assert response.json()["rewritten_text"] == "Warm rewrite"